@@ -0,0 +1,373 @@
+"""
+================================================================================
+PARALLEL BOOTSTRAP ERROR BARS
+================================================================================
+Error bars are usually computed from raw replicates at each x position: the
+mean and its standard error, or a bootstrap confidence interval. Resampling
+one position at a time in a Python loop (np.random.choice, then the
+statistic, 10^4 times) takes minutes for 10^4 positions, far longer than
+the plot.
+
+bootstrap_errors() computes them for all positions at once:
+    - positions are grouped by number of replicates (NaN = missing) and
+      split into batches of a few MB: each batch is resampled with one
+      array of indices, so the statistic runs on a (positions, resamples,
+      replicates) block; the mean reduces to one matrix product, and the
+      median to two gathers from the sorted replicates
+    - batches run on a process pool; each has its own seed spawned from one
+      np.random.SeedSequence, so the result depends on the seed only, not
+      on the number of workers
+    - mean, SEM, bootstrap standard error and percentile or BCa (bias-
+      corrected and accelerated) intervals for every position
+    - ErrorEstimate.yerr() is the yerr argument of ax.errorbar (asymmetric
+      [lower, upper] distances for intervals)
+
+USAGE:
+    from bootstrap_errors import bootstrap_errors
+    est = bootstrap_errors(replicates, seed=1)   # (positions, replicates)
+    ax.errorbar(x, est.value, yerr=est.yerr(), fmt='o', capsize=5)
+
+    BCa intervals of the median, ragged replicates (list of 1-D arrays):
+    est = bootstrap_errors(runs, statistic='median', method='bca', seed=1)
+    ax.errorbar(x, est.value, yerr=est.yerr('sem'))   # Or the SEM
+
+    Time for 10^4 positions x 10^4 resamples:
+    python bootstrap_errors.py
+================================================================================
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from scipy.special import ndtr as _norm_cdf, ndtri as _norm_ppf
+except ImportError:   # Same values from the standard library, slower
+    from statistics import NormalDist
+    _norm_cdf = np.vectorize(NormalDist().cdf, otypes=[float])
+    _norm_ppf = np.vectorize(NormalDist().inv_cdf, otypes=[float])
+
+DEFAULT_BATCH_MB = 32.0
+STATISTICS = {'mean': np.mean, 'median': np.median}
+_last_stats = {}
+
+
+def stats():
+    """Return size, time, throughput and seed of the last call."""
+    return dict(_last_stats)
+
+
+# ============================================================================
+# REPLICATES
+# ============================================================================
+
+def _groups(replicates):
+    """
+    {n: (position indices, (positions, n) block)} of the finite replicates
+    of each position, for a 2-D array (NaN = missing) or a list of arrays.
+    """
+    if isinstance(replicates, np.ndarray) and replicates.ndim == 2:
+        rows = replicates.astype(float, copy=False)
+        if np.isfinite(rows).all():
+            return {rows.shape[1]: (np.arange(len(rows)), rows)}
+    rows = [np.asarray(row, dtype=float).ravel() for row in replicates]
+    rows = [row[np.isfinite(row)] for row in rows]
+    counts = np.array([len(row) for row in rows], dtype=np.intp)
+    groups = {}
+    for n in np.unique(counts):
+        index = np.flatnonzero(counts == n)
+        groups[int(n)] = (index, np.array([rows[i] for i in index]).reshape(
+            len(index), n))
+    return groups
+
+
+def _tasks(groups, n_resamples, shared_draws, batch_mb):
+    """(position indices, block) batches of about *batch_mb* of resamples."""
+    tasks = []
+    for n, (index, block) in sorted(groups.items()):
+        # Mean with shared draws: (P, B) results; else (P, B, n) resamples
+        per_position = n_resamples * 8 * (1 if shared_draws else max(n, 1))
+        size = max(int(batch_mb * 2**20 // per_position), 1)
+        for start in range(0, len(index), size):
+            tasks.append((index[start:start + size],
+                          block[start:start + size]))
+    return tasks
+
+
+# ============================================================================
+# RESAMPLING (one batch, in a worker process)
+# ============================================================================
+
+def _resample(block, statistic, n_resamples, rng, shared_draws, batch_mb):
+    """(P, B) bootstrap statistics of the P rows of *block*."""
+    P, n = block.shape
+    out = np.empty((P, n_resamples))
+    if shared_draws and statistic is np.mean:
+        # Counts of each replicate in each resample: means by one matmul
+        draws = rng.integers(0, n, (n_resamples, n), dtype=np.intp)
+        draws += n * np.arange(n_resamples)[:, None]
+        weights = np.bincount(draws.ravel(), minlength=n_resamples * n)
+        np.matmul(block, weights.reshape(n_resamples, n).T / n, out=out)
+        return out
+    if shared_draws and statistic is np.median:
+        # Sorted draws index the sorted rows in order: the middle draws
+        # give the median of every resample, without sorting resamples
+        ordered = np.sort(block, axis=1)
+        draws = np.sort(rng.integers(0, n, (n_resamples, n),
+                                     dtype=np.intp), axis=1)
+        np.add(ordered[:, draws[:, (n - 1) // 2]],
+               ordered[:, draws[:, n // 2]], out=out)
+        out *= 0.5
+        return out
+    # Resamples in chunks of about batch_mb: (P, b, n) gathered values
+    step = max(int(batch_mb * 2**20 // (P * n * 8)), 1)
+    for start in range(0, n_resamples, step):
+        b = min(step, n_resamples - start)
+        if shared_draws:
+            values = block[:, rng.integers(0, n, (b, n), dtype=np.intp)]
+        else:
+            draws = rng.integers(0, n, (P, b, n), dtype=np.intp)
+            values = np.take_along_axis(block[:, None, :], draws, axis=2)
+        out[:, start:start + b] = statistic(values, axis=-1)
+    return out
+
+
+def _jackknife(block, statistic):
+    """(P, n) leave-one-out statistics of the rows of *block*."""
+    P, n = block.shape
+    if statistic is np.mean:
+        return (block.sum(axis=1, keepdims=True) - block) / (n - 1)
+    k = np.arange(n - 1)
+    keep = k + (k >= np.arange(n)[:, None])   # Row i: all indices but i
+    return statistic(block[:, keep], axis=-1)
+
+
+def _quantiles(sorted_boot, q):
+    """Row-wise linear-interpolated quantiles q (one per row)."""
+    position = np.clip(q, 0.0, 1.0) * (sorted_boot.shape[1] - 1)
+    low = np.floor(position).astype(np.intp)
+    high = np.minimum(low + 1, sorted_boot.shape[1] - 1)
+    rows = np.arange(len(sorted_boot))
+    fraction = position - low
+    return (sorted_boot[rows, low] * (1.0 - fraction) +
+            sorted_boot[rows, high] * fraction)
+
+
+def _bootstrap_task(block, statistic, n_resamples, confidence, method,
+                    seed, shared_draws, batch_mb):
+    """Value, bootstrap SE, low and high of every row of one batch."""
+    P, n = block.shape
+    value = statistic(block, axis=-1) if n else np.full(P, np.nan)
+    if n < 2:
+        nan = np.full(P, np.nan)
+        return value, nan, nan, nan
+    rng = np.random.default_rng(seed)
+    boot = _resample(block, statistic, n_resamples, rng, shared_draws,
+                     batch_mb)
+    boot_se = boot.std(axis=1, ddof=1)
+    tail = (1.0 - confidence) / 2.0
+    q = np.array([tail, 1.0 - tail])[:, None] * np.ones(P)
+    if method == 'bca':
+        # Bias from the fraction of resamples below the estimate,
+        # acceleration from the skewness of the jackknife statistics
+        below = (boot < value[:, None]).mean(axis=1)
+        z0 = _norm_ppf(np.clip(below, 0.5 / n_resamples,
+                               1.0 - 0.5 / n_resamples))
+        jack = _jackknife(block, statistic)
+        d = jack.mean(axis=1, keepdims=True) - jack
+        num = (d**3).sum(axis=1)
+        den = 6.0 * (d**2).sum(axis=1)**1.5
+        a = np.divide(num, den, out=np.zeros(P), where=den > 0)
+        z = _norm_ppf(q[:, 0])[:, None]
+        q = _norm_cdf(z0 + (z0 + z) / (1.0 - a * (z0 + z)))
+    boot.sort(axis=1)
+    return value, boot_se, _quantiles(boot, q[0]), _quantiles(boot, q[1])
+
+
+# ============================================================================
+# RESULT
+# ============================================================================
+
+class ErrorEstimate:
+    """
+    Statistic, standard errors and confidence interval at every position.
+
+    Attributes
+    ----------
+    value : statistic of the replicates (mean, median, ...)
+    mean, sem : mean and standard error of the mean (std(ddof=1) / sqrt(n))
+    n : number of finite replicates
+    boot_se : standard deviation of the bootstrap statistics
+    low, high : confidence interval (NaN with fewer than two replicates)
+    """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __len__(self):
+        return len(self.value)
+
+    def yerr(self, kind='ci'):
+        """
+        yerr of ax.errorbar: 'ci' gives the (2, N) distances to the interval
+        ends, 'sem' the standard error of the mean, 'se' the bootstrap one.
+        """
+        if kind == 'ci':
+            return np.array([self.value - self.low, self.high - self.value])
+        if kind == 'sem':
+            return self.sem
+        if kind == 'se':
+            return self.boot_se
+        raise ValueError("kind must be 'ci', 'sem' or 'se'.")
+
+
+# ============================================================================
+# BOOTSTRAP
+# ============================================================================
+
+def bootstrap_errors(replicates, statistic='mean', *, n_resamples=10_000,
+                     confidence=0.95, method='percentile', seed=None,
+                     workers=None, shared_draws=True,
+                     batch_mb=DEFAULT_BATCH_MB, verbose=False):
+    """
+    Bootstrap error estimates of the replicates at each x position.
+
+    Parameters
+    ----------
+    replicates : 2-D array or sequence of 1-D arrays
+        Row i holds the replicates at position i; NaN marks missing ones
+        (rows may have different lengths).
+    statistic : 'mean', 'median' or callable
+        Callable of (values, axis=-1), vectorized over leading axes, e.g.
+        np.std; with executor processes it must be picklable.
+    n_resamples : int
+    confidence : float
+        Coverage of the interval (0.95: 2.5th to 97.5th percentile).
+    method : {'percentile', 'bca'}
+        Percentile interval, or bias-corrected and accelerated (better
+        coverage for skewed statistics; one extra jackknife per position).
+    seed : int or np.random.SeedSequence, optional
+        Seed of the whole computation (stats()['seed'] gives the one used).
+    workers : int, optional
+        Processes (default: all cores; 1 runs in this process).
+    shared_draws : bool
+        Draw one set of resample indices per batch, shared by its positions
+        (each position's bootstrap distribution is unchanged; the mean
+        becomes a matrix product). False draws every position separately.
+    batch_mb : float
+        Size of the resamples of one batch.
+    verbose : bool
+        Print the throughput.
+
+    Returns
+    -------
+    ErrorEstimate
+    """
+    start_time = time.perf_counter()
+    if method not in ('percentile', 'bca'):
+        raise ValueError("method must be 'percentile' or 'bca'.")
+    if not 0.0 < confidence < 1.0:
+        raise ValueError('confidence must be between 0 and 1.')
+    if isinstance(statistic, str):
+        if statistic not in STATISTICS:
+            raise ValueError(f"statistic must be one of {list(STATISTICS)} "
+                             "or a function of (values, axis).")
+        statistic = STATISTICS[statistic]
+    groups = _groups(replicates)
+    n_positions = sum(len(index) for index, _ in groups.values())
+    tasks = _tasks(groups, n_resamples, shared_draws, batch_mb)
+    seed_seq = (seed if isinstance(seed, np.random.SeedSequence)
+                else np.random.SeedSequence(seed))
+    seeds = seed_seq.spawn(len(tasks))
+    workers = min(max(workers or os.cpu_count() or 1, 1), max(len(tasks), 1))
+
+    arguments = [(block, statistic, n_resamples, confidence, method, s,
+                  shared_draws, batch_mb) for (_, block), s in
+                 zip(tasks, seeds)]
+    if workers == 1:
+        results = [_bootstrap_task(*a) for a in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_bootstrap_task, *zip(*arguments)))
+
+    fields = {name: np.full(n_positions, np.nan) for name in
+              ('value', 'mean', 'sem', 'boot_se', 'low', 'high')}
+    fields['n'] = np.zeros(n_positions, dtype=np.intp)
+    for n, (index, block) in groups.items():
+        fields['n'][index] = n
+        if n:
+            fields['mean'][index] = block.mean(axis=1)
+        if n > 1:
+            fields['sem'][index] = block.std(axis=1, ddof=1) / np.sqrt(n)
+    for (index, _), result in zip(tasks, results):
+        for name, values in zip(('value', 'boot_se', 'low', 'high'), result):
+            fields[name][index] = values
+
+    seconds = time.perf_counter() - start_time
+    resamples = n_positions * n_resamples
+    _last_stats.clear()
+    _last_stats.update(positions=n_positions, resamples=resamples,
+                       seconds=seconds,
+                       resamples_per_s=resamples / max(seconds, 1e-9),
+                       tasks=len(tasks), workers=workers,
+                       seed=seed_seq.entropy)
+    if verbose:
+        print(f'Bootstrapped {n_positions} positions x {n_resamples} '
+              f'resamples in {seconds:.2f} s ({len(tasks)} batches, '
+              f'{workers} process(es))')
+    return ErrorEstimate(confidence=confidence, method=method, **fields)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _loop_percentile(rows, n_resamples, confidence, rng):
+    """One position at a time, the usual way."""
+    tail = 100 * (1.0 - confidence) / 2.0
+    intervals = []
+    for row in rows:
+        boot = [rng.choice(row, len(row)).mean() for _ in range(n_resamples)]
+        intervals.append(np.percentile(boot, [tail, 100 - tail]))
+    return np.array(intervals)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    n_rep = 20
+
+    print('Coverage of the true mean (1000 positions, skewed data, '
+          f'{n_rep} replicates, 2000 resamples, nominal 95%):')
+    data = rng.exponential(1.0, (1000, n_rep))
+    for method in ('percentile', 'bca'):
+        est = bootstrap_errors(data, method=method, n_resamples=2000, seed=1)
+        covered = np.mean((est.low <= 1.0) & (1.0 <= est.high))
+        print(f'  {method:10s} {100 * covered:.1f}%')
+    median = bootstrap_errors(data, 'median', method='bca', n_resamples=2000,
+                              seed=1, workers=1)
+    again = bootstrap_errors(data, 'median', method='bca', n_resamples=2000,
+                             seed=1, workers=2)
+    assert np.array_equal(median.low, again.low)
+    print('  same intervals with 1 and 2 processes for the same seed')
+
+    n_resamples = 10_000
+    rows = rng.normal(5.0, 2.0, (20, n_rep))
+    start = time.perf_counter()
+    loop = _loop_percentile(rows, n_resamples, 0.95, rng)
+    per_position = (time.perf_counter() - start) / len(rows)
+    est = bootstrap_errors(rows, seed=2)
+    assert np.allclose(loop, np.c_[est.low, est.high], atol=0.1)
+
+    print(f'10^4 positions x 10^4 resamples, {n_rep} replicates each:')
+    print(f'  loop with np.random.choice: {per_position * 1e4:7.1f} s '
+          '(extrapolated)')
+    data = rng.normal(5.0, 2.0, (10_000, n_rep))
+    for statistic, method in (('mean', 'percentile'), ('mean', 'bca'),
+                              ('median', 'percentile')):
+        bootstrap_errors(data, statistic, method=method, seed=3)
+        s = stats()
+        print(f'  {statistic + " " + method:27s} {s["seconds"]:7.1f} s '
+              f'({s["resamples_per_s"] / 1e6:.0f} M resamples/s, '
+              f'{s["workers"]} process(es))')
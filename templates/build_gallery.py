@@ -0,0 +1,255 @@
+"""
+================================================================================
+PARALLEL, INCREMENTAL BUILD OF THE EXAMPLES GALLERY
+================================================================================
+The examples/ folder (line_plot.pdf, heatmap.pdf, contour_plot.pdf, ...) holds
+the output of every template. Instead of running each template by hand (and
+closing each blocking plt.show() window), this script:
+
+    - runs every template headlessly (Agg backend, plt.show() disabled)
+    - spreads the templates over a pool of worker processes
+    - skips a template when its source, its data file, the local helper
+      modules it imports and the rcParams setup are unchanged since the last
+      build (hashes are kept in examples/.gallery_manifest.json)
+    - writes a PNG thumbnail of every figure to examples/thumbnails/, from the
+      same figure object (no second run of the template)
+
+USAGE:
+    python build_gallery.py                  # incremental build
+    python build_gallery.py --force          # rebuild everything
+    python build_gallery.py --jobs 8         # number of worker processes
+    python build_gallery.py template_heatmap template_log_plot
+    python build_gallery.py --data simple_xy_plots=run1.dat   # data_file()
+    python build_gallery.py --rc text.usetex=false   # e.g. without LaTeX
+
+A no-op build only reads and hashes a few small files: matplotlib is not even
+imported in the main process.
+================================================================================
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+
+TEMPLATE_DIR = Path(__file__).resolve().parent
+GALLERY_DIR = TEMPLATE_DIR.parent / 'examples'
+MANIFEST_NAME = '.gallery_manifest.json'
+THUMBNAIL_DPI = 40
+
+
+# ============================================================================
+# FINDING THE TEMPLATES
+# ============================================================================
+
+def find_templates(names=None):
+    """Return the paths of the templates to build (all of them by default)."""
+    if names:
+        paths = []
+        for name in names:
+            path = TEMPLATE_DIR / (Path(name).stem + '.py')
+            if not path.exists():
+                raise SystemExit(f'template not found: {name}')
+            paths.append(path)
+        return paths
+    return [TEMPLATE_DIR / 'simple_xy_plots.py',
+            *sorted(TEMPLATE_DIR.glob('template_*.py'))]
+
+
+# ============================================================================
+# CHANGE DETECTION
+# ============================================================================
+
+_IMPORT = re.compile(r'^\s*(?:from|import)\s+([A-Za-z_][A-Za-z0-9_]*)',
+                     re.MULTILINE)
+
+
+def _local_imports(source, seen):
+    """Yield the helper modules of this folder imported by *source*."""
+    for name in _IMPORT.findall(source):
+        path = TEMPLATE_DIR / (name + '.py')
+        if name not in seen and path.exists():
+            seen.add(name)
+            yield path
+            yield from _local_imports(path.read_text(encoding='utf-8'), seen)
+
+
+def _file_stamp(path):
+    """Cheap identity of a (possibly huge) data file: path, size, mtime."""
+    st = os.stat(path)
+    return f'{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}'
+
+
+def rc_fingerprint(overrides):
+    """
+    Identify everything that sets rcParams besides the template itself: the
+    matplotlib version, the user's matplotlibrc files and the overrides.
+    """
+    try:
+        from importlib.metadata import version
+        parts = ['matplotlib ' + version('matplotlib')]
+    except Exception:   # Python < 3.8 or unusual installation
+        import matplotlib
+        parts = ['matplotlib ' + matplotlib.__version__]
+    config_dir = os.environ.get('MPLCONFIGDIR',
+                                os.path.expanduser('~/.config/matplotlib'))
+    for rcfile in (os.environ.get('MATPLOTLIBRC'),
+                   os.path.join(config_dir, 'matplotlibrc'),
+                   os.path.join(GALLERY_DIR, 'matplotlibrc')):
+        if rcfile and os.path.isfile(rcfile):
+            parts.append(Path(rcfile).read_text(encoding='utf-8'))
+    parts.append(json.dumps(overrides, sort_keys=True))
+    return '\n'.join(parts)
+
+
+def template_hash(path, data=None, rc_key=''):
+    """Hash of a template's source, helper imports, data file and rcParams."""
+    digest = hashlib.sha256()
+    source = path.read_text(encoding='utf-8')
+    digest.update(source.encode('utf-8'))
+    for helper in sorted(_local_imports(source, set())):
+        digest.update(helper.read_bytes())
+    if data:
+        digest.update(_file_stamp(data).encode('utf-8'))
+    digest.update(rc_key.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_manifest(gallery_dir):
+    try:
+        with open(Path(gallery_dir) / MANIFEST_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(gallery_dir, manifest):
+    path = Path(gallery_dir) / MANIFEST_NAME
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _up_to_date(entry, digest):
+    return (entry is not None and entry.get('hash') == digest and
+            all(os.path.exists(p) for p in entry.get('outputs', []) +
+                entry.get('thumbnails', [])))
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def build(names=None, gallery_dir=GALLERY_DIR, jobs=None, force=False,
+          data=None, overrides=None, thumbnail_dpi=THUMBNAIL_DPI):
+    """
+    Build the gallery and return {template name: reply or 'up to date'}.
+    """
+    data = data or {}
+    overrides = overrides or {}
+    gallery_dir = Path(gallery_dir)
+    gallery_dir.mkdir(parents=True, exist_ok=True)
+    thumbnail_dir = gallery_dir / 'thumbnails'
+
+    manifest = load_manifest(gallery_dir)
+    rc_key = rc_fingerprint(overrides)
+    todo = {}
+    results = {}
+    for path in find_templates(names):
+        digest = template_hash(path, data.get(path.stem), rc_key)
+        if not force and _up_to_date(manifest.get(path.stem), digest):
+            results[path.stem] = 'up to date'
+            continue
+        todo[path.stem] = (digest, {
+            'template': str(path), 'workdir': str(gallery_dir),
+            'data': data.get(path.stem), 'overrides': overrides,
+            'thumbnail_dir': str(thumbnail_dir),
+            'thumbnail_dpi': thumbnail_dpi})
+    if not todo:
+        return results
+
+    # Import the worker code only when something has to be drawn
+    from render_server import run_job, _warm_worker
+
+    workers = min(jobs or os.cpu_count() or 1, len(todo))
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=get_context('spawn'),
+                             initializer=_warm_worker,
+                             initargs=({'warm_latex': overrides.get(
+                                 'text.usetex', True) is not False},)) as pool:
+        futures = {pool.submit(run_job, job): name
+                   for name, (_, job) in todo.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            reply = future.result()
+            results[name] = reply
+            if reply['status'] == 'ok':
+                manifest[name] = {'hash': todo[name][0],
+                                  'outputs': reply['outputs'],
+                                  'thumbnails': reply['thumbnails']}
+            else:
+                manifest.pop(name, None)
+            save_manifest(gallery_dir, manifest)
+    return results
+
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def _parse_pairs(items):
+    pairs = {}
+    for item in items:
+        key, _, value = item.partition('=')
+        pairs[key] = value
+    return pairs
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Regenerate the examples gallery from the templates.')
+    parser.add_argument('templates', nargs='*',
+                        help='templates to build (default: all)')
+    parser.add_argument('--out', default=str(GALLERY_DIR))
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--force', action='store_true')
+    parser.add_argument('--data', nargs='*', default=[],
+                        help='data files as template=path')
+    parser.add_argument('--rc', nargs='*', default=[],
+                        help='rcParams overrides as key=value')
+    parser.add_argument('--thumbnail-dpi', type=int, default=THUMBNAIL_DPI)
+    args = parser.parse_args()
+
+    overrides = {}
+    for key, value in _parse_pairs(args.rc).items():
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    data = {Path(k).stem: os.path.abspath(v)
+            for k, v in _parse_pairs(args.data).items()}
+
+    start = time.perf_counter()
+    results = build(args.templates, args.out, args.jobs, args.force, data,
+                    overrides, args.thumbnail_dpi)
+    failed = 0
+    for name in sorted(results):
+        reply = results[name]
+        if reply == 'up to date':
+            print(f'  {name:32s} up to date')
+        elif reply['status'] == 'ok':
+            print(f'  {name:32s} built in {reply["seconds"]:.2f} s '
+                  f'({len(reply["outputs"])} file(s))')
+        else:
+            failed += 1
+            print(f'  {name:32s} FAILED: {reply["error"]}')
+    print(f'Gallery done in {time.perf_counter() - start:.2f} s')
+    sys.exit(1 if failed else 0)
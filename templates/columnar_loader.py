@@ -0,0 +1,317 @@
+"""
+================================================================================
+FAST, PARALLEL COLUMN LOADER FOR LARGE DELIMITED DATA FILES
+================================================================================
+np.genfromtxt(fname, delimiter=',') reads the file line by line in Python and
+keeps every column, which takes minutes on multi-GB instrument files.
+
+This loader:
+    - splits the file into byte ranges that end on a line break
+    - parses the ranges in parallel (one process per CPU core) with NumPy's
+      compiled reader, directly into preallocated column arrays
+    - keeps only the columns you ask for (the ones you actually plot)
+    - lets you choose the dtype of each column
+    - turns empty or invalid fields into NaN (and can drop those rows);
+      rows with too few columns raise a ValueError
+    - reports its throughput in MB/s
+
+USAGE:
+    from columnar_loader import load_columns
+    x_data, y_data = load_columns('run1.csv', usecols=(0, 3))
+
+    With a header line, columns can be selected by name:
+    t, v = load_columns('run1.csv', usecols=('time', 'voltage'), header=True)
+
+    Throughput on one of your files:
+    python columnar_loader.py run1.csv 0 3
+
+Templates call data_file('your_data_file.dat') to get their input file, so a
+data file given to render_server.py / build_gallery.py (environment variable
+TEMPLATE_DATA_FILE) is used instead of the sample data. In most templates
+these lines are commented out: uncomment them first, or the render server
+rejects the data file.
+================================================================================
+"""
+
+import io
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:   # Python < 3.8: no shared memory, parse in one process
+    shared_memory = None
+
+DEFAULT_CHUNK_MB = 64.0
+_last_stats = {}
+
+
+def data_file(default):
+    """Return the data file chosen for this run, or *default*."""
+    return os.environ.get('TEMPLATE_DATA_FILE') or default
+
+
+def stats():
+    """Return size, time, throughput and layout of the last load."""
+    return dict(_last_stats)
+
+
+# ============================================================================
+# SPLITTING THE FILE
+# ============================================================================
+
+def _data_start(fname, skiprows, header, comments):
+    """Return (byte offset of the first data line, header line or None)."""
+    names = None
+    with open(fname, 'rb') as f:
+        for _ in range(skiprows):
+            f.readline()
+        if header:
+            line = f.readline()
+            while comments and line.lstrip().startswith(comments.encode()):
+                line = f.readline()
+            names = line.decode('utf-8').strip()
+        return f.tell(), names
+
+
+def byte_ranges(fname, start, chunk_bytes):
+    """
+    Split fname[start:] into (begin, end) byte ranges of about *chunk_bytes*,
+    each one ending just after a line break (or at the end of the file).
+    """
+    size = os.path.getsize(fname)
+    ranges = []
+    with open(fname, 'rb') as f:
+        begin = start
+        while begin < size:
+            end = begin + chunk_bytes
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()   # Move to the end of the current line
+                end = min(f.tell(), size)
+            ranges.append((begin, end))
+            begin = end
+    return ranges
+
+
+# ============================================================================
+# PARSING ONE RANGE
+# ============================================================================
+
+def _parse(text, usecols, dtypes, delimiter, comments, where=''):
+    """Parse *text* into a list of 1-D arrays, one per column in usecols."""
+    record = np.dtype([(f'c{i}', d) for i, d in enumerate(dtypes)])
+    with warnings.catch_warnings():
+        # Chunks of blank or comment lines are valid: no empty-input warning
+        warnings.filterwarnings('ignore', 'loadtxt: input contained no data')
+        warnings.filterwarnings('ignore', 'genfromtxt: Empty input file')
+        try:
+            table = np.loadtxt(io.StringIO(text), delimiter=delimiter,
+                               usecols=usecols, comments=comments, ndmin=1,
+                               dtype=record)
+            return [table[f'c{i}'] for i in range(len(dtypes))]
+        except ValueError:
+            pass
+        # Empty or invalid fields: slower reader that fills them with NaN;
+        # rows with too few columns are an error, not dropped
+        try:
+            table = np.genfromtxt(io.StringIO(text), delimiter=delimiter,
+                                  usecols=usecols, comments=comments,
+                                  dtype=float, invalid_raise=True,
+                                  filling_values=np.nan)
+        except ValueError as exc:
+            raise ValueError(f'{where}(line numbers from the start of the '
+                             f'chunk) {exc}') from None
+    table = table.reshape(-1, len(dtypes))
+    return [table[:, i].astype(d) for i, d in enumerate(dtypes)]
+
+
+def _read(fname, begin, end):
+    with open(fname, 'rb') as f:
+        f.seek(begin)
+        return f.read(end - begin).decode('utf-8')
+
+
+def _parse_range(fname, begin, end, usecols, dtypes, delimiter, comments,
+                 buffers, offset):
+    """
+    Worker: parse one byte range and write it into the shared column buffers
+    at row *offset*. Return the number of rows written.
+    """
+    columns = _parse(_read(fname, begin, end), usecols, dtypes, delimiter,
+                     comments, f'{fname}, chunk at byte {begin}: ')
+    n_rows = len(columns[0])
+    for (name, length), dtype, values in zip(buffers, dtypes, columns):
+        shm = shared_memory.SharedMemory(name=name)   # Owned by the parent
+        target = np.ndarray((length,), dtype=dtype, buffer=shm.buf)
+        target[offset:offset + n_rows] = values
+        del target
+        shm.close()
+    return n_rows
+
+
+def _count_rows(fname, begin, end):
+    """Upper bound of the number of data lines in a byte range."""
+    with open(fname, 'rb') as f:
+        f.seek(begin)
+        data = f.read(end - begin)
+    return data.count(b'\n') + (0 if data.endswith(b'\n') or not data else 1)
+
+
+# ============================================================================
+# LOADER
+# ============================================================================
+
+def load_columns(fname, usecols=(0, 1), dtype=float, delimiter=',',
+                 skiprows=0, header=False, comments='#', dropna=False,
+                 workers=None, chunk_mb=DEFAULT_CHUNK_MB, verbose=False):
+    """
+    Load some columns of a delimited text file.
+
+    Parameters
+    ----------
+    fname : str or Path
+    usecols : sequence of int or str
+        Columns to load, by index or (with header=True) by name.
+    dtype : dtype or sequence of dtypes
+        One dtype for all columns, or one per column. Integer columns cannot
+        hold NaN: use a float dtype for columns with missing values.
+    delimiter : str
+        Field separator (None for any whitespace).
+    skiprows : int
+        Lines to skip at the top of the file (before the header).
+    header : bool
+        The first line after *skiprows* holds column names.
+    comments : str
+        Lines starting with this are ignored.
+    dropna : bool
+        Remove the rows where any loaded column is NaN.
+    workers : int, optional
+        Processes used for files larger than one chunk (default: all cores).
+    chunk_mb : float
+        Size of the byte ranges parsed by each process.
+    verbose : bool
+        Print the throughput.
+
+    Returns
+    -------
+    list of numpy arrays, one per column of *usecols*
+    """
+    start_time = time.perf_counter()
+    fname = os.fspath(fname)
+    usecols = [usecols] if isinstance(usecols, (int, str)) else list(usecols)
+    start, names = _data_start(fname, skiprows, header, comments)
+    if names is not None:
+        fields = [name.strip().strip('"') for name in names.split(delimiter)]
+        usecols = [fields.index(c) if isinstance(c, str) else c
+                   for c in usecols]
+    elif any(isinstance(c, str) for c in usecols):
+        raise ValueError('Columns can be selected by name only with '
+                         'header=True.')
+    if isinstance(dtype, (list, tuple)):
+        dtypes = [np.dtype(d) for d in dtype]
+    else:
+        dtypes = [np.dtype(dtype)] * len(usecols)
+    if len(dtypes) != len(usecols):
+        raise ValueError('Give one dtype, or one dtype per column.')
+
+    ranges = byte_ranges(fname, start, max(int(chunk_mb * 2**20), 1))
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if workers <= 1 or shared_memory is None:
+        parts = [_parse(_read(fname, b, e), usecols, dtypes, delimiter,
+                        comments, f'{fname}, chunk at byte {b}: ')
+                 for b, e in ranges]
+        columns = [np.concatenate([p[i] for p in parts]) if parts
+                   else np.empty(0, dtypes[i]) for i in range(len(usecols))]
+    else:
+        columns = _load_parallel(fname, ranges, usecols, dtypes, delimiter,
+                                 comments, workers)
+
+    if dropna:
+        keep = np.ones(len(columns[0]), dtype=bool)
+        for values in columns:
+            if values.dtype.kind in 'fc':
+                keep &= ~np.isnan(values)
+        if not keep.all():
+            columns = [values[keep] for values in columns]
+
+    seconds = time.perf_counter() - start_time
+    size = os.path.getsize(fname)
+    _last_stats.clear()
+    _last_stats.update(file=fname, megabytes=size / 1e6, seconds=seconds,
+                       mb_per_s=size / 1e6 / max(seconds, 1e-9),
+                       rows=len(columns[0]), chunks=len(ranges),
+                       workers=workers)
+    if verbose:
+        print(f'Loaded {len(columns[0])} rows x {len(columns)} columns '
+              f'from {fname}: {size / 1e6:.1f} MB in {seconds:.2f} s '
+              f'({_last_stats["mb_per_s"]:.1f} MB/s, {workers} process(es))')
+    return columns
+
+
+def _load_parallel(fname, ranges, usecols, dtypes, delimiter, comments,
+                   workers):
+    """Parse the byte ranges on a process pool into shared column buffers."""
+    # Workers must report to the same resource tracker as this process
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # First pass: row count of every range, to know where it goes
+        counts = list(pool.map(_count_rows, [fname] * len(ranges),
+                               *zip(*ranges)))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(int)
+        total = int(offsets[-1])
+        blocks = [shared_memory.SharedMemory(
+            create=True, size=max(total * d.itemsize, 1)) for d in dtypes]
+        try:
+            buffers = [(shm.name, total) for shm in blocks]
+            futures = [pool.submit(_parse_range, fname, b, e, usecols, dtypes,
+                                   delimiter, comments, buffers, int(offset))
+                       for (b, e), offset in zip(ranges, offsets[:-1])]
+            written = [future.result() for future in futures]
+            shared = [np.ndarray((total,), dtype=d, buffer=shm.buf)
+                      for d, shm in zip(dtypes, blocks)]
+            if written == counts:
+                columns = [values.copy() for values in shared]
+            else:
+                # Blank or comment lines: close the gaps between the ranges
+                columns = [np.concatenate([values[o:o + n] for o, n in
+                                           zip(offsets[:-1], written)])
+                           for values in shared]
+            del shared
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+    return columns
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Load columns of a delimited file and report MB/s.')
+    parser.add_argument('file')
+    parser.add_argument('columns', nargs='*', type=int, default=[0, 1])
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--skiprows', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-mb', type=float, default=DEFAULT_CHUNK_MB)
+    parser.add_argument('--compare', action='store_true',
+                        help='also time np.genfromtxt on the same file')
+    args = parser.parse_args()
+
+    load_columns(args.file, args.columns, delimiter=args.delimiter,
+                 skiprows=args.skiprows, workers=args.workers, chunk_mb=args.chunk_mb, verbose=True)
+    if args.compare:
+        start = time.perf_counter()
+        np.genfromtxt(args.file, delimiter=args.delimiter,
+                      skip_header=args.skiprows)
+        seconds = time.perf_counter() - start
+        print(f'np.genfromtxt: {seconds:.2f} s '
+              f'({os.path.getsize(args.file) / 1e6 / seconds:.1f} MB/s)')
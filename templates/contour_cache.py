@@ -0,0 +1,345 @@
+"""
+================================================================================
+SHARED CONTOUR GEOMETRY CACHE
+================================================================================
+ax.contourf and ax.contour each run marching squares over Z from scratch:
+the contour template traces the same field twice (filled bands, then lines
+for clabel), the heatmap template once more for its overlay, and every
+re-run of a template to adjust colors or fonts traces everything again.
+
+This module traces each line level and each filled band of a field once.
+A field (x, y, Z) is identified by a fingerprint of its bytes; its
+geometry is memoized per line level and per filled band, so every artist
+drawn from the same field reuses what an earlier one computed:
+    - cached_contourf / cached_contour return ordinary QuadContourSets
+      (colorbar, clabel, extend, colors, linestyles all work as usual)
+    - the most recent fields are kept in memory (LRU, max_fields)
+    - with a cache folder, the geometry is also saved to disk (one .npz
+      per field), so a re-styled figure does not recompute it
+
+USAGE:
+    from contour_cache import cached_contourf, cached_contour
+    contourf = cached_contourf(ax, X, Y, Z, levels=levels, cmap='coolwarm',
+                               extend='both')
+    contours = cached_contour(ax, X, Y, Z, levels=levels[::2], colors='k')
+    ax.clabel(contours, inline=True, fmt='%0.1f')
+
+    Geometry on disk (or set CONTOUR_CACHE_DIR):
+    from contour_cache import ContourCache
+    cache = ContourCache(cache_dir='~/.cache/contour_cache')
+    contourf = cached_contourf(ax, X, Y, Z, levels=levels, cache=cache)
+
+    Timing of a cold, warm and on-disk run:
+    python contour_cache.py
+
+NOTES:
+    - Measured on a noisy 2000 x 2000 field (contourf with 15 levels and
+      two line overlays): 3.7 s with matplotlib, 3.2 s cold, 0.3 s from
+      memory, 0.4 s from disk.
+    - Geometry files are uncompressed and can be large for noisy data
+      (about 100 MB for the field above); clear the folder when needed.
+    - Lines and filled bands are traced separately: a line level is shared
+      by every contour of that level, a band by every contourf with the
+      same two bounds. On a cold run, contourf and contour of the same Z
+      still trace it twice, as matplotlib does (the 3.7 s -> 3.2 s above
+      is the second line overlay); the filled and line geometry are only
+      reused on a repeat run or from disk.
+================================================================================
+"""
+
+import collections
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_MAX_FIELDS = 8
+
+
+# ============================================================================
+# GEOMETRY OF ONE FIELD
+# ============================================================================
+
+def fingerprint(x, y, z, algorithm, corner_mask):
+    """Hex digest identifying the field and the contouring settings."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{algorithm}:{corner_mask}'.encode())
+    for array in (x, y, z):
+        array = np.ma.asarray(array)
+        digest.update(f'{array.shape}{array.dtype}'.encode())
+        digest.update(np.ascontiguousarray(array.data).data)
+        if array.mask is not np.ma.nomask:
+            digest.update(np.packbits(np.ma.getmaskarray(array)).data)
+    return digest.hexdigest()
+
+
+class FieldGeometry:
+    """
+    Contour geometry of one field, computed with contourpy on first use of
+    each line level or filled band. Has the create_contour and
+    create_filled_contour methods of a contourpy generator, so a
+    QuadContourSet can draw from it directly.
+    """
+
+    def __init__(self, key, x, y, z, algorithm, corner_mask):
+        self.key = key
+        self.x, self.y = x, y
+        self.z = np.ma.masked_invalid(z, copy=False)
+        self.algorithm = algorithm
+        self.corner_mask = corner_mask
+        self.zmin = float(self.z.min())
+        self.zmax = float(self.z.max())
+        self.mins = [np.min(x), np.min(y)]
+        self.maxs = [np.max(x), np.max(y)]
+        # level or (lower, upper) -> ([vertices], [codes]), one joined path
+        self.lines = {}
+        self.fills = {}
+        self.dirty = False
+        self._generator = None
+        self._lock = threading.Lock()
+
+    def _contourpy(self):
+        if self._generator is None:
+            import contourpy
+            self._generator = contourpy.contour_generator(
+                self.x, self.y, self.z, name=self.algorithm,
+                corner_mask=self.corner_mask,
+                line_type=contourpy.LineType.SeparateCode,
+                fill_type=contourpy.FillType.OuterCode)
+        return self._generator
+
+    @staticmethod
+    def _joined(geometry):
+        # Every piece starts with a MOVETO, so the pieces of one level can
+        # be kept as a single path: QuadContourSet joins them anyway
+        vertices, codes = geometry
+        if len(vertices) <= 1:
+            return list(vertices), list(codes)
+        return [np.concatenate(vertices)], [np.concatenate(codes)]
+
+    def create_contour(self, level):
+        key = float(level)
+        with self._lock:
+            if key not in self.lines:
+                self.lines[key] = self._joined(
+                    self._contourpy().create_contour(key))
+                self.dirty = True
+            return self.lines[key]
+
+    def create_filled_contour(self, lower, upper):
+        key = (float(lower), float(upper))
+        with self._lock:
+            if key not in self.fills:
+                self.fills[key] = self._joined(
+                    self._contourpy().create_filled_contour(*key))
+                self.dirty = True
+            return self.fills[key]
+
+    # ------------------------------------------------------------------
+    # On-disk format: the paths of all levels in flat arrays
+    # ------------------------------------------------------------------
+
+    def save(self, path):
+        """Write all memoized levels and bands to *path* (.npz)."""
+        entries = ([(level, np.nan, geometry)
+                    for level, geometry in self.lines.items()] +
+                   [(lower, upper, geometry)
+                    for (lower, upper), geometry in self.fills.items()])
+        pieces = [(v, c) for _, _, (vs, cs) in entries for v, c in zip(vs, cs)]
+        arrays = dict(
+            lower=np.array([e[0] for e in entries], dtype=float),
+            upper=np.array([e[1] for e in entries], dtype=float),
+            n_pieces=np.array([len(e[2][0]) for e in entries], dtype=np.int64),
+            lengths=np.array([len(v) for v, _ in pieces], dtype=np.int64),
+            points=(np.concatenate([v for v, _ in pieces]) if pieces
+                    else np.empty((0, 2))),
+            codes=(np.concatenate([c for _, c in pieces]) if pieces
+                   else np.empty(0, dtype=np.uint8)))
+        tmp = path.with_name(f'{path.stem}.{os.getpid()}.tmp.npz')
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)   # Atomic: readers never see half a file
+        self.dirty = False
+
+    def load(self, path):
+        """Add the levels and bands stored in *path* (.npz)."""
+        with np.load(path) as data:
+            points, codes = data['points'], data['codes']
+            ends = np.cumsum(data['lengths'])
+            starts = ends - data['lengths']
+            piece = 0
+            for lower, upper, n in zip(data['lower'], data['upper'],
+                                       data['n_pieces']):
+                span = range(piece, piece + n)
+                geometry = ([points[starts[i]:ends[i]] for i in span],
+                            [codes[starts[i]:ends[i]] for i in span])
+                piece += n
+                if np.isnan(upper):
+                    self.lines.setdefault(float(lower), geometry)
+                else:
+                    self.fills.setdefault((float(lower), float(upper)),
+                                          geometry)
+
+
+# ============================================================================
+# CACHE OF FIELDS
+# ============================================================================
+
+class ContourCache:
+    """
+    LRU cache of FieldGeometry, optionally backed by a folder of .npz files.
+
+    Parameters
+    ----------
+    max_fields : int
+        Fields kept in memory (the least recently used are dropped).
+    cache_dir : str or Path, optional
+        Folder for the geometry files. Default: $CONTOUR_CACHE_DIR if set,
+        otherwise memory only.
+    """
+
+    def __init__(self, max_fields=DEFAULT_MAX_FIELDS, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.environ.get('CONTOUR_CACHE_DIR')
+        self.cache_dir = (Path(cache_dir).expanduser()
+                          if cache_dir is not None else None)
+        self.max_fields = max_fields
+        self._fields = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.loads = 0
+
+    def _path(self, key):
+        return self.cache_dir / f'{key}.npz'
+
+    def field(self, x, y, z, algorithm=None, corner_mask=None):
+        """Return the FieldGeometry of (x, y, z), cached or new."""
+        import matplotlib as mpl
+
+        algorithm = algorithm or mpl.rcParams['contour.algorithm']
+        if corner_mask is None:
+            corner_mask = (False if algorithm == 'mpl2005'
+                           else mpl.rcParams['contour.corner_mask'])
+        key = fingerprint(x, y, z, algorithm, corner_mask)
+        with self._lock:
+            if key in self._fields:
+                self.hits += 1
+                self._fields.move_to_end(key)
+                return self._fields[key]
+            self.misses += 1
+            field = FieldGeometry(key, x, y, z, algorithm, corner_mask)
+            if self.cache_dir is not None and self._path(key).exists():
+                field.load(self._path(key))
+                self.loads += 1
+            self._fields[key] = field
+            while len(self._fields) > self.max_fields:
+                self._fields.popitem(last=False)
+            return field
+
+    def flush(self, field):
+        """Save *field* to the cache folder if it has new geometry."""
+        if self.cache_dir is not None and field.dirty:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            field.save(self._path(field.key))
+
+    def clear(self):
+        """Forget all fields in memory (files on disk are kept)."""
+        with self._lock:
+            self._fields.clear()
+
+
+_default_cache = ContourCache()
+
+
+# ============================================================================
+# PLOTTING
+# ============================================================================
+
+def _contour_set_class():
+    from matplotlib.contour import QuadContourSet
+
+    class CachedContourSet(QuadContourSet):
+        """QuadContourSet drawing from a FieldGeometry."""
+
+        def _process_args(self, field, *args, corner_mask=None,
+                          algorithm=None, **kwargs):
+            self._algorithm = field.algorithm
+            self._corner_mask = field.corner_mask
+            self.zmin, self.zmax = field.zmin, field.zmax
+            self._process_contour_level_args(args, field.z.dtype)
+            self._mins, self._maxs = field.mins, field.maxs
+            self._contour_generator = field
+            return kwargs
+
+    return CachedContourSet
+
+
+def _cached(ax, x, y, Z, filled, cache, kwargs):
+    cache = _default_cache if cache is None else cache
+    field = cache.field(np.asarray(x), np.asarray(y), Z,
+                        kwargs.pop('algorithm', None),
+                        kwargs.pop('corner_mask', None))
+    contours = _contour_set_class()(ax, field, filled=filled, **kwargs)
+    ax._request_autoscale_view()
+    cache.flush(field)
+    return contours
+
+
+def cached_contourf(ax, x, y, Z, *, cache=None, **kwargs):
+    """ax.contourf(x, y, Z, **kwargs) with the geometry from *cache*."""
+    return _cached(ax, x, y, Z, True, cache, kwargs)
+
+
+def cached_contour(ax, x, y, Z, *, cache=None, **kwargs):
+    """ax.contour(x, y, Z, **kwargs) with the geometry from *cache*."""
+    return _cached(ax, x, y, Z, False, cache, kwargs)
+
+
+# ============================================================================
+# DEMO: COLD, WARM AND ON-DISK
+# ============================================================================
+
+if __name__ == '__main__':
+    import functools
+    import tempfile
+    import time
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    x = np.linspace(-3, 3, 2000)
+    X, Y = np.meshgrid(x, x, sparse=True)
+    Z = (2.0 * np.exp(-((X - 1)**2 + (Y - 1)**2) / 0.5) +
+         1.5 * np.exp(-((X + 1)**2 + (Y + 1)**2) / 0.8) +
+         0.05 * rng.standard_normal((2000, 2000)))
+    levels = np.linspace(Z.min(), Z.max(), 15)
+
+    def figure(contourf, contour):
+        start = time.perf_counter()
+        fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+        filled = contourf(ax, x, x, Z, levels=levels, cmap='coolwarm',
+                          extend='both')
+        contour(ax, x, x, Z, levels=levels[::2], colors='k')
+        contour(ax, x, x, Z, levels=levels[::2], colors='w',
+                linewidths=0.5)   # A second overlay of the same lines
+        fig.colorbar(filled)
+        plt.close(fig)
+        return time.perf_counter() - start
+
+    def with_cache(cache):
+        return (functools.partial(cached_contourf, cache=cache),
+                functools.partial(cached_contour, cache=cache))
+
+    print('2000 x 2000 field, contourf (15 levels) + 2 x contour (8 levels):')
+    seconds = figure(lambda ax, *a, **k: ax.contourf(*a, **k),
+                     lambda ax, *a, **k: ax.contour(*a, **k))
+    print(f'  matplotlib:            {seconds:6.2f} s')
+    folder = tempfile.mkdtemp()
+    cache = ContourCache(cache_dir=folder)
+    print(f'  cache, cold:           {figure(*with_cache(cache)):6.2f} s')
+    print(f'  cache, warm (memory):  {figure(*with_cache(cache)):6.2f} s')
+    cache = ContourCache(cache_dir=folder)   # New session: disk only
+    seconds = figure(*with_cache(cache))
+    print(f'  cache, from disk:      {seconds:6.2f} s '
+          f'({cache.loads} file loaded)')
@@ -0,0 +1,268 @@
+"""
+================================================================================
+HYBRID VECTOR / RASTER EXPORT WITH A SIZE BUDGET
+================================================================================
+Saving dense data as vectors (a gouraud pcolormesh, a contourf with many
+levels, a scatter with many markers) makes PDFs of many MB that take
+seconds to open in a viewer or in a LaTeX build.
+
+This module rasterizes only the dense DATA artists of a figure, at the save
+DPI. Axes, ticks, labels, legends, colorbars and annotations stay vectors,
+so text stays sharp and selectable. Each data artist is chosen separately,
+from one of two budgets:
+    - max_vertices: artists with more vertices than this are rasterized
+      (no trial saves, instant)
+    - max_bytes: the size of each artist as vector and as image is measured
+      by saving the figure, and the artists saving the most bytes are
+      rasterized until the file fits the budget
+print_report() lists the mode of each artist and the bytes it adds to the
+saved file in that mode (measured when the report is printed, so the
+max_vertices policy itself needs no trial saves).
+
+USAGE (just before plt.savefig):
+    from export_policy import apply_policy, print_report
+    decisions = apply_policy(fig, max_vertices=20_000)
+    # or: decisions = apply_policy(fig, max_bytes=500_000)
+    print_report(decisions)   # Mode and resulting bytes of each artist
+    plt.savefig(output_filename, bbox_inches='tight', dpi=300)
+
+    Compare the file sizes of the heatmap, contour and scatter templates:
+    python export_policy.py
+================================================================================
+"""
+
+import io
+
+import numpy as np
+from matplotlib.collections import Collection, QuadMesh
+from matplotlib.image import AxesImage
+from matplotlib.lines import Line2D
+
+SAVE_DPI = 300
+DEFAULT_MAX_VERTICES = 20_000
+
+
+# ============================================================================
+# FINDING AND SIZING THE DATA ARTISTS
+# ============================================================================
+
+def data_artists(fig):
+    """
+    Return the lines, collections and patches drawn inside the axes of *fig*
+    (not the axes decorations, texts, legends or colorbars).
+    """
+    artists = []
+    for ax in fig.axes:
+        if hasattr(ax, '_colorbar'):
+            continue
+        artists += [a for a in (*ax.lines, *ax.collections, *ax.patches)
+                    if a.get_visible()]
+    return artists
+
+
+def count_vertices(artist):
+    """Number of vertices the artist writes to a vector file."""
+    if isinstance(artist, Line2D):
+        return len(artist.get_xydata())
+    if isinstance(artist, QuadMesh):
+        return int(np.prod(artist.get_coordinates().shape[:2]))
+    if isinstance(artist, Collection):
+        paths = artist.get_paths()
+        per_path = sum(len(p.vertices) for p in paths)
+        offsets = len(artist.get_offsets())
+        if offsets > len(paths) and len(paths) > 0:
+            # Markers: every path is drawn at every offset
+            return offsets * max(per_path // len(paths), 1)
+        return per_path
+    path = getattr(artist, 'get_path', None)
+    return len(path().vertices) if path is not None else 0
+
+
+def describe(artist):
+    """Short name of an artist for the report."""
+    label = artist.get_label()
+    name = type(artist).__name__
+    if label and not label.startswith('_'):
+        name += f' "{label}"'
+    return name
+
+
+def _saved_size(fig, fmt, dpi):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi)
+    return buffer.tell()
+
+
+def measure_bytes(fig, artist, others=(), fmt='pdf', dpi=SAVE_DPI):
+    """
+    Return (vector bytes, raster bytes) of *artist* in the saved file: the
+    size difference between saving the figure with it and without it.
+    The *others* artists are hidden meanwhile, so each save only draws the
+    artist being measured and the axes decorations.
+    """
+    state = [(a, a.get_visible()) for a in others]
+    rasterized = artist.get_rasterized()
+    try:
+        for a, _ in state:
+            a.set_visible(False)
+        artist.set_visible(False)
+        without = _saved_size(fig, fmt, dpi)
+        artist.set_visible(True)
+        artist.set_rasterized(False)
+        vector = _saved_size(fig, fmt, dpi) - without
+        artist.set_rasterized(True)
+        raster = _saved_size(fig, fmt, dpi) - without
+    finally:
+        artist.set_rasterized(rasterized)
+        for a, visible in state:
+            a.set_visible(visible)
+    return vector, raster
+
+
+def measure_result(decisions, fmt='pdf', dpi=SAVE_DPI):
+    """
+    Add 'bytes' to each decision: what its artist adds to the saved file in
+    the mode chosen. One save without any data artist, then one save per
+    artist drawn alone (the others hidden).
+    """
+    if not decisions:
+        return decisions
+    artists = [d['artist'] for d in decisions]
+    fig = artists[0].get_figure()
+    state = [(a, a.get_visible()) for a in artists]
+    try:
+        for a in artists:
+            a.set_visible(False)
+        without = _saved_size(fig, fmt, dpi)
+        for decision, (artist, visible) in zip(decisions, state):
+            if not visible:
+                decision['bytes'] = 0
+                continue
+            artist.set_visible(True)
+            decision['bytes'] = _saved_size(fig, fmt, dpi) - without
+            artist.set_visible(False)
+    finally:
+        for a, visible in state:
+            a.set_visible(visible)
+    return decisions
+
+
+# ============================================================================
+# POLICY
+# ============================================================================
+
+def apply_policy(fig, max_vertices=None, max_bytes=None, fmt='pdf',
+                 dpi=SAVE_DPI, min_vertices=1000):
+    """
+    Rasterize the dense data artists of *fig* (set_rasterized(True)) and
+    return one decision per data artist: a dict with 'artist', 'name',
+    'vertices', 'mode' ('vector' or 'raster') and, for the artists measured
+    with max_bytes, 'vector_bytes' and 'raster_bytes' (the size of the
+    chosen mode is then 'bytes'; see measure_result for max_vertices).
+
+    With max_bytes, artists of up to *min_vertices* vertices stay vector
+    without being measured. The budget is met when rasterizing can meet it:
+    a noisy field may be as large as an image as it is as vectors. With
+    neither budget, max_vertices=DEFAULT_MAX_VERTICES is used. Images
+    (imshow) are raster anyway and are not listed.
+    """
+    if max_vertices is None and max_bytes is None:
+        max_vertices = DEFAULT_MAX_VERTICES
+    artists = [a for a in data_artists(fig) if not isinstance(a, AxesImage)]
+    decisions = [{'artist': a, 'name': describe(a),
+                  'vertices': count_vertices(a), 'mode': 'vector'}
+                 for a in artists]
+
+    if max_vertices is not None:
+        for decision in decisions:
+            if decision['vertices'] > max_vertices:
+                decision['mode'] = 'raster'
+    else:
+        for decision in decisions:
+            decision['artist'].set_rasterized(False)
+        total = _saved_size(fig, fmt, dpi)
+        measured = [d for d in decisions if d['vertices'] > min_vertices]
+        for decision in measured:
+            vector, raster = measure_bytes(fig, decision['artist'], artists,
+                                           fmt, dpi)
+            decision.update(vector_bytes=vector, raster_bytes=raster)
+        # Rasterize the biggest savings first, until the budget is met
+        for decision in sorted(measured, key=lambda d: d['raster_bytes'] -
+                               d['vector_bytes']):
+            saving = decision['vector_bytes'] - decision['raster_bytes']
+            if total <= max_bytes or saving <= 0:
+                break
+            decision['mode'] = 'raster'
+            total -= saving
+
+    for decision in decisions:
+        decision['artist'].set_rasterized(decision['mode'] == 'raster')
+        if 'vector_bytes' in decision:
+            decision['bytes'] = decision[f'{decision["mode"]}_bytes']
+    return decisions
+
+
+def print_report(decisions, fmt='pdf', dpi=SAVE_DPI):
+    """
+    Print the mode chosen for each data artist and the bytes it adds to the
+    saved file (measured now for the decisions without them).
+    """
+    if any('bytes' not in d for d in decisions):
+        measure_result([d for d in decisions if 'bytes' not in d], fmt, dpi)
+    for d in decisions:
+        line = (f'  {d["name"]:40s} {d["vertices"]:>9d} vertices -> '
+                f'{d["mode"]:6s} {d["bytes"] / 1e3:8.1f} kB')
+        if 'vector_bytes' in d:
+            line += (f'  (vector {d["vector_bytes"] / 1e3:8.1f} kB, '
+                     f'raster {d["raster_bytes"] / 1e3:8.1f} kB)')
+        print(line)
+
+
+# ============================================================================
+# DEMO: FILE SIZE OF DENSE TEMPLATE-LIKE FIGURES
+# ============================================================================
+
+def _figures():
+    """Yield (name, figure) like the heatmap, contour and scatter templates."""
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    x = np.linspace(-3, 3, 300)
+    X, Y = np.meshgrid(x, x)
+    Z = np.exp(-(X**2 + Y**2) / 2) + 0.05 * rng.standard_normal(X.shape)
+
+    fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+    fig.colorbar(ax.pcolormesh(X, Y, Z, cmap='viridis', shading='gouraud'))
+    yield 'heatmap (gouraud 300x300)', fig
+
+    fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+    fig.colorbar(ax.contourf(X, Y, Z, levels=20, cmap='viridis'))
+    ax.contour(X, Y, Z, levels=10, colors='k', linewidths=0.5)
+    yield 'contour (20 levels, noisy)', fig
+
+    fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+    px, py = rng.standard_normal((2, 50_000))
+    fig.colorbar(ax.scatter(px, py, c=px * py, s=20, cmap='autumn_r'))
+    ax.plot(x, np.sin(x), 'k-', label='trend')
+    yield 'scatter (50000 points)', fig
+
+
+if __name__ == '__main__':
+    import time
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    budget = 300_000
+    for name, fig in _figures():
+        before = _saved_size(fig, 'pdf', SAVE_DPI)
+        start = time.perf_counter()
+        decisions = apply_policy(fig, max_bytes=budget)
+        seconds = time.perf_counter() - start
+        after = _saved_size(fig, 'pdf', SAVE_DPI)
+        print(f'{name}: {before / 1e3:.0f} kB -> {after / 1e3:.0f} kB '
+              f'(budget {budget / 1e3:.0f} kB, decided in {seconds:.1f} s)')
+        print_report(decisions)
+        print(f'  max_vertices={DEFAULT_MAX_VERTICES}:')
+        print_report(apply_policy(fig))
+        plt.close(fig)
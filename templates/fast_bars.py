@@ -0,0 +1,277 @@
+"""
+================================================================================
+BAR CHARTS AS ONE COLLECTION PER SERIES
+================================================================================
+ax.bar creates one Rectangle patch per bar, each drawn (and written to PDF)
+on its own: grouped or stacked charts over thousands of categories (per-gene
+or per-node metrics) take ~10 s to save at 10^4 bars and minutes at 10^5.
+
+fast_bar() draws a whole series as one PolyCollection:
+    - the rectangles of all bars are computed at once in NumPy (centered or
+      edge-aligned, vertical or horizontal, any bottoms)
+    - one collection per series, the same color/edgecolor/linewidth/alpha/
+      hatch styling as ax.bar (per-bar color lists too)
+    - with one color, 200 bars share each path of the collection: the PDF
+      backend writes one fill-and-stroke per path instead of one per bar
+      (with its color and line state), ~10x faster at 10^5 bars
+    - yerr / xerr are drawn at the bar ends with fast_errorbar (one path for
+      all error bars, ax.bar's error_kw / ecolor / capsize arguments)
+grouped_bars() and stacked_bars() lay out a (series, categories) table:
+offsets of grouped series, and cumulative baselines of stacked ones
+(positive values stacked upwards, negative ones downwards from zero).
+
+USAGE:
+    from fast_bars import fast_bar, grouped_bars, stacked_bars
+    fast_bar(ax, x_pos, values, width=0.6, color='steelblue',
+             edgecolor='black', linewidth=1.5, alpha=0.8, yerr=errors,
+             capsize=5)
+    grouped_bars(ax, x_pos, [values1, values2, values3], width=0.75,
+                 labels=['Group 1', 'Group 2', 'Group 3'],
+                 colors=['steelblue', 'coral', 'lightgreen'],
+                 edgecolor='black', linewidth=1.2)
+    stacked_bars(ax, x_pos, [values1, values2, values3], width=0.6,
+                 labels=[...], colors=[...], edgecolor='black')
+
+    Time and PDF size against ax.bar, 5 to 10^5 bars:
+    python fast_bars.py
+
+NOTES:
+    - x must be numeric (use ax.set_xticks(x_pos, names) for category names).
+    - The result is a PolyCollection (legend entries work as for ax.bar);
+      ax.bar_label needs the BarContainer of ax.bar.
+    - Separate bars look as with ax.bar. Where neighbouring bars or their
+      edges overlap (thousands of bars with thick edges), the edges of the
+      bars sharing a path are drawn after their fills: pack=1 avoids it.
+================================================================================
+"""
+
+import numpy as np
+
+from fast_errorbar import fast_errorbar
+
+PACK = 200   # Bars per path: 1000 vertices, below Agg's 1024 for snapping
+
+
+# ============================================================================
+# GEOMETRY
+# ============================================================================
+
+def bar_vertices(x, height, width=0.8, bottom=0.0, align='center',
+                 orientation='vertical'):
+    """(n, 4, 2) corners of the bars, as ax.bar (or ax.barh) places them."""
+    x, height, width, bottom = np.broadcast_arrays(
+        np.asarray(x, float), np.asarray(height, float),
+        np.asarray(width, float), np.asarray(bottom, float))
+    if align == 'center':
+        left = x - width / 2
+    elif align == 'edge':
+        left = x
+    else:
+        raise ValueError("align must be 'center' or 'edge'.")
+    right = left + width
+    top = bottom + height
+    vertices = np.empty(x.shape + (4, 2))
+    vertices[..., 0] = np.stack([left, left, right, right], axis=-1)
+    vertices[..., 1] = np.stack([bottom, top, top, bottom], axis=-1)
+    if orientation == 'horizontal':
+        vertices = vertices[..., ::-1]
+    elif orientation != 'vertical':
+        raise ValueError("orientation must be 'vertical' or 'horizontal'.")
+    return vertices.reshape(-1, 4, 2)
+
+
+def packed_paths(vertices, pack=PACK):
+    """Vertices and codes of paths holding *pack* closed rectangles each."""
+    closed = np.concatenate([vertices, vertices[:, :1]], axis=1)
+    codes = np.tile(np.array([1, 2, 2, 2, 79], dtype=np.uint8),
+                    (len(vertices), 1))   # MOVETO, 3 x LINETO, CLOSEPOLY
+    return ([closed[i:i + pack].reshape(-1, 2)
+             for i in range(0, len(closed), pack)],
+            [codes[i:i + pack].ravel() for i in range(0, len(codes), pack)])
+
+
+def group_offsets(n_series, width=0.8):
+    """Offsets of the series in a group of total *width*, and bar width."""
+    bar_width = width / n_series
+    return (np.arange(n_series) - (n_series - 1) / 2.0) * bar_width, bar_width
+
+
+def stack_bottoms(values):
+    """
+    Baselines of stacked series, shape of *values* (series, categories):
+    positive values are stacked upwards from zero, negative ones downwards.
+    """
+    values = np.asarray(values, dtype=float)
+    positive = np.where(values > 0, values, 0.0)
+    negative = np.where(values < 0, values, 0.0)
+    above = np.cumsum(positive, axis=0) - positive
+    below = np.cumsum(negative, axis=0) - negative
+    return np.where(values < 0, below, above)
+
+
+# ============================================================================
+# PLOTTING
+# ============================================================================
+
+def fast_bar(ax, x, height, width=0.8, bottom=0.0, *, align='center',
+             orientation='vertical', color=None, edgecolor=None,
+             linewidth=None, alpha=None, label=None, yerr=None, xerr=None,
+             ecolor=None, capsize=None, error_kw=None, zorder=1, pack=PACK,
+             **kwargs):
+    """
+    ax.bar(x, height, width, bottom, ...) as one PolyCollection; with
+    orientation='horizontal', ax.barh(x, height, width, left=bottom).
+    With one face and one edge color, *pack* bars share each path (pack=1:
+    one path per bar). Extra keyword arguments (hatch, linestyle, ...) go
+    to the collection. Returns the PolyCollection.
+    """
+    import matplotlib as mpl
+    from matplotlib.collections import PolyCollection
+
+    x = np.asarray(x, dtype=float)
+    height = np.asarray(height, dtype=float)
+    vertices = bar_vertices(x, height, width, bottom, align, orientation)
+    if color is None:
+        color = kwargs.pop('facecolor', None)
+    if color is None:
+        color = ax._get_patches_for_fill.get_next_color()
+    if edgecolor is None:
+        edgecolor = (mpl.rcParams['patch.edgecolor']
+                     if mpl.rcParams['patch.force_edgecolor'] else 'none')
+    if linewidth is None:
+        linewidth = mpl.rcParams['patch.linewidth']
+    single = mpl.colors.is_color_like(color) and \
+        mpl.colors.is_color_like(edgecolor) and np.ndim(linewidth) == 0
+    bars = PolyCollection([] if single and pack > 1 else vertices,
+                          facecolors=color, edgecolors=edgecolor,
+                          linewidths=linewidth, alpha=alpha, zorder=zorder,
+                          label=label, **kwargs)
+    if single and pack > 1:
+        # Fewer paths: PDF writes one fill-and-stroke per path, not per bar
+        bars.set_verts_and_codes(*packed_paths(vertices, pack))
+    ax.add_collection(bars)
+    # Bars start on their baseline: no margin below it, as with ax.bar
+    base = np.broadcast_to(np.asarray(bottom, float), vertices.shape[:1])
+    sticky = bars.sticky_edges.x if orientation == 'horizontal' \
+        else bars.sticky_edges.y
+    if len(base):
+        sticky.extend([base.min(), base.max()])
+
+    if yerr is not None or xerr is not None:
+        # Error bars at the bar ends (center of the bar width), as ax.bar
+        error_kw = dict(error_kw or {})
+        error_kw.setdefault('ecolor', 'k' if ecolor is None else ecolor)
+        if capsize is not None:
+            error_kw.setdefault('capsize', capsize)
+        corners = vertices[:, 0] + (vertices[:, 2] - vertices[:, 0]) / 2
+        ends = vertices[:, 1] if orientation == 'vertical' else \
+            vertices[:, 2]
+        middle_x = corners[:, 0] if orientation == 'vertical' else ends[:, 0]
+        middle_y = ends[:, 1] if orientation == 'vertical' else corners[:, 1]
+        fast_errorbar(ax, middle_x, middle_y, yerr=yerr, xerr=xerr,
+                      fmt='none', zorder=zorder + 1, **error_kw)
+    # Autoscale once everything is in: the limits cover the error bars
+    ax._request_autoscale_view()
+    return bars
+
+
+def grouped_bars(ax, x, values, width=0.8, *, labels=None, colors=None,
+                 yerr=None, orientation='vertical', **kwargs):
+    """
+    Series of *values* (series, categories) side by side around each x,
+    in a group of total *width*. *labels*, *colors*, *yerr* hold one entry
+    per series (or None); other keyword arguments go to fast_bar.
+    Returns the list of PolyCollections.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    offsets, bar_width = group_offsets(len(values), width)
+    x = np.asarray(x, dtype=float)
+    collections = []
+    for i, (offset, series) in enumerate(zip(offsets, values)):
+        error = None if yerr is None else yerr[i]
+        collections.append(fast_bar(
+            ax, x + offset, series, bar_width, orientation=orientation,
+            label=None if labels is None else labels[i],
+            color=None if colors is None else colors[i],
+            **{'yerr' if orientation == 'vertical' else 'xerr': error},
+            **kwargs))
+    return collections
+
+
+def stacked_bars(ax, x, values, width=0.8, *, labels=None, colors=None,
+                 yerr=None, orientation='vertical', **kwargs):
+    """
+    Series of *values* (series, categories) stacked at each x: each series
+    starts where the previous ones end (stack_bottoms). *labels*, *colors*,
+    *yerr* hold one entry per series (or None). Returns the PolyCollections.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    bottoms = stack_bottoms(values)
+    collections = []
+    for i, (series, bottom) in enumerate(zip(values, bottoms)):
+        error = None if yerr is None else yerr[i]
+        collections.append(fast_bar(
+            ax, x, series, width, bottom, orientation=orientation,
+            label=None if labels is None else labels[i],
+            color=None if colors is None else colors[i],
+            **{'yerr' if orientation == 'vertical' else 'xerr': error},
+            **kwargs))
+    return collections
+
+
+# ============================================================================
+# DEMO: TIME AND FILE SIZE
+# ============================================================================
+
+def _figure(n, fast, stacked=False):
+    """Save a template-like bar chart to PDF; return (seconds, bytes)."""
+    import io
+    import time
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    x = np.arange(n)
+    values = rng.uniform(5, 30, (3, n))
+    errors = rng.uniform(1, 3, (3, n))
+    colors = ['steelblue', 'coral', 'lightgreen']
+    style = dict(edgecolor='black', linewidth=1.2, alpha=0.8)
+
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+    if fast and stacked:
+        stacked_bars(ax, x, values, 0.6, colors=colors, yerr=errors,
+                     capsize=4, **style)
+    elif fast:
+        grouped_bars(ax, x, values, 0.75, colors=colors, yerr=errors,
+                     capsize=4, **style)
+    elif stacked:
+        bottom = np.zeros(n)
+        for series, error, color in zip(values, errors, colors):
+            ax.bar(x, series, 0.6, bottom, color=color, yerr=error,
+                   capsize=4, **style)
+            bottom += series
+    else:
+        for i, (series, error, color) in enumerate(zip(values, errors,
+                                                       colors)):
+            ax.bar(x + (i - 1) * 0.25, series, 0.25, color=color, yerr=error,
+                   capsize=4, **style)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='pdf', dpi=300)
+    plt.close(fig)
+    return time.perf_counter() - start, buffer.tell()
+
+
+if __name__ == '__main__':
+    import matplotlib
+    matplotlib.use('Agg')
+
+    print('Grouped / stacked charts, 3 series with error bars, saved to PDF:')
+    for n in (5, 100, 1000, 10_000, 100_000):
+        for stacked in (False, True):
+            seconds, size = _figure(n, True, stacked)
+            line = (f'  {3 * n:>7d} bars {"stacked" if stacked else "grouped"}'
+                    f': fast_bar {seconds:6.2f} s {size / 1e6:6.2f} MB')
+            if n <= 10_000:
+                seconds, size = _figure(n, False, stacked)
+                line += f'   ax.bar {seconds:6.2f} s {size / 1e6:6.2f} MB'
+            print(line)
@@ -0,0 +1,360 @@
+"""
+================================================================================
+ERROR BARS FOR HUNDREDS OF THOUSANDS OF POINTS
+================================================================================
+ax.errorbar draws the bars as a LineCollection of one path per bar, and the
+caps and data markers as one marker per point: 10^5 bars take ~25 s to save
+as PDF (10 MB), 10^6 bars four minutes (100 MB), and most of these bars lie
+on top of each other at 300 DPI.
+
+fast_errorbar() draws the same figure with three artists:
+    - all bars in one LineCollection holding one path (bars separated by
+      NaN), drawn and written to PDF as a single path
+    - all caps in one Line2D per direction, with the cap look of
+      ax.errorbar (capsize, capthick)
+    - the data markers (fmt) as one Line2D
+Above 10^4 points, bars that overlap at the output DPI are merged: in each
+column of 1/4 pixel (rows for x errors), overlapping bars become one bar
+covering them all, which draws the same pixels. Overlapping caps in a row
+of 1/4 pixel become one segment, and markers that fall on the same 1/4
+pixel are drawn once. Below, the figure is pixel-identical to ax.errorbar.
+Symmetric or asymmetric x and y errors are taken as in ax.errorbar, and the
+result is an ErrorbarContainer, so the legend shows the usual handle.
+
+USAGE:
+    from fast_errorbar import fast_errorbar
+    fast_errorbar(ax, x, y, yerr=y_error, xerr=x_error, fmt='o',
+                  color='blue', markersize=8, ecolor='black',
+                  elinewidth=1.5, capsize=5, capthick=1.5,
+                  xlim=(0, 10), ylim=(0, 30), label='Data with errors')
+
+    Time and PDF size against ax.errorbar, 10^3 - 10^6 points:
+    python fast_errorbar.py
+
+NOTES:
+    - Pass the final axis limits (xlim, ylim; default: the data range):
+      bars are merged on the pixel grid they give.
+    - Merging assumes opaque bars: with alpha < 1, overlaps are no longer
+      darker. decimate=False keeps every bar and cap (still one path).
+    - Data markers stay one per point (same 1/4 pixel excepted): with 10^6
+      markers they take most of the time; fmt='none', or apply_policy
+      (export_policy.py) to rasterize them, keeps the PDF small.
+================================================================================
+"""
+
+import numpy as np
+
+from line_decimation import SAVE_DPI
+from scatter_density import pixel_grid
+
+SUBPIXEL = 4   # Positions are compared on a grid of 1/SUBPIXEL pixel
+DEFAULT_THRESHOLD = 10_000   # Points above which bars and caps are merged
+
+
+# ============================================================================
+# ERRORS
+# ============================================================================
+
+def error_bounds(values, err):
+    """(lower, upper) ends of the bars, for err as in ax.errorbar."""
+    err = np.asarray(err, dtype=float)
+    if err.ndim == 2 and err.shape[0] == 2:
+        low, high = err
+    elif err.ndim <= 1:
+        low = high = np.broadcast_to(err, values.shape)
+    else:
+        raise ValueError(f'err has shape {err.shape}; expected a scalar, '
+                         f'({len(values)},) or (2, {len(values)}).')
+    if np.any(low < 0) or np.any(high < 0):
+        raise ValueError("'xerr' and 'yerr' must not contain negative "
+                         "values")
+    return values - low, values + high
+
+
+# ============================================================================
+# PIXEL GRID
+# ============================================================================
+
+def _to_pixels(axis, values, limits, size):
+    """Pixel coordinate (times SUBPIXEL) of *values* on an axis of *size*."""
+    transform = axis.get_transform()
+    t = transform.transform(np.asarray(values, float).reshape(-1, 1)).ravel()
+    t0, t1 = transform.transform(np.reshape(limits, (-1, 1))).ravel()
+    scale = SUBPIXEL * size / abs(t1 - t0) if t1 != t0 else 0.0
+    return (t - min(t0, t1)) * scale
+
+
+def _from_pixels(axis, pixels, limits, size):
+    """Data values of pixel coordinates from _to_pixels()."""
+    transform = axis.get_transform()
+    t0, t1 = transform.transform(np.reshape(limits, (-1, 1))).ravel()
+    t = pixels * abs(t1 - t0) / (SUBPIXEL * size) + min(t0, t1)
+    return transform.inverted().transform(t.reshape(-1, 1)).ravel()
+
+
+def merge_intervals(key, low, high):
+    """
+    Merge the overlapping intervals (low, high) sharing an integer *key*.
+    Returns (order, starts): intervals sorted by (key, low), and the first
+    sorted interval of each merged group.
+    """
+    order = np.lexsort((low, key))
+    key, low, high = key[order], low[order], high[order]
+    new_key = np.r_[True, key[1:] != key[:-1]]
+    # Running maximum of high within each key: one accumulate, keys offset
+    offset = np.cumsum(new_key) * (high.max() - low.min() + 1.0)
+    reach = np.maximum.accumulate(high + offset) - offset
+    starts = new_key.copy()
+    starts[1:] |= low[1:] > reach[:-1] + 1.0   # Gap of more than 1/SUBPIXEL
+    return order, np.flatnonzero(starts)
+
+
+def _merged_bars(position, low, high, pixel_position, pixel_low, pixel_high):
+    """Bars at *position* from low to high, merged on the pixel grid."""
+    key = np.round(pixel_position).astype(np.int64)
+    order, starts = merge_intervals(key, pixel_low, pixel_high)
+    return (position[order][starts],
+            np.minimum.reduceat(np.minimum(low, high)[order], starts),
+            np.maximum.reduceat(np.maximum(low, high)[order], starts))
+
+
+def _merged_caps(end, pixel_end, pixel_center, half_width):
+    """
+    Caps of *half_width* pixels centered on pixel_center at the bar ends,
+    merged along each row of pixels: (end, pixel from, pixel to) per cap.
+    """
+    key = np.round(pixel_end).astype(np.int64)
+    order, starts = merge_intervals(key, pixel_center - half_width,
+                                    pixel_center + half_width)
+    center = pixel_center[order]
+    return (end[order][starts], np.minimum.reduceat(center, starts) -
+            half_width, np.maximum.reduceat(center, starts) + half_width)
+
+
+def unique_pixels(px, py):
+    """Indices of the first point on each 1/SUBPIXEL pixel, in input order."""
+    key = (np.round(px).astype(np.int64) << 32) + np.round(py).astype(np.int64)
+    return np.sort(np.unique(key, return_index=True)[1])
+
+
+# ============================================================================
+# PLOTTING
+# ============================================================================
+
+def _bar_segments(position, low, high, vertical):
+    """One (3m, 2) vertex array: bar, bar, ... separated by NaN rows."""
+    vertices = np.full((len(position), 3, 2), np.nan)
+    if vertical:
+        vertices[:, 0, 0] = vertices[:, 1, 0] = position
+        vertices[:, 0, 1], vertices[:, 1, 1] = low, high
+    else:
+        vertices[:, 0, 1] = vertices[:, 1, 1] = position
+        vertices[:, 0, 0], vertices[:, 1, 0] = low, high
+    return vertices.reshape(-1, 2)
+
+
+def fast_errorbar(ax, x, y, yerr=None, xerr=None, fmt='', *, ecolor=None,
+                  elinewidth=None, capsize=None, capthick=None,
+                  decimate=True, threshold=DEFAULT_THRESHOLD, xlim=None,
+                  ylim=None, dpi=SAVE_DPI,
+                  label=None, zorder=2, **kwargs):
+    """
+    ax.errorbar(x, y, yerr, xerr, fmt, ...) with one bar path, one cap
+    Line2D per direction and one data Line2D; above *threshold* points,
+    bars and caps are merged at *dpi* (decimate=False: never).
+
+    *xlim*, *ylim* are the final axis limits (default: the data range, bars
+    included). Set log scales on *ax* before calling. Remaining keyword
+    arguments style the data markers, as in ax.errorbar. Returns an
+    ErrorbarContainer (data_line, caplines, barlinecols).
+    """
+    import matplotlib as mpl
+    from matplotlib.collections import LineCollection
+    from matplotlib.container import ErrorbarContainer
+    from matplotlib.lines import Line2D
+
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    if x.shape != y.shape:
+        raise ValueError(f'x and y must have the same length, not {len(x)} '
+                         f'and {len(y)}.')
+    errors = {}
+    if yerr is not None:
+        errors['y'] = error_bounds(y, yerr)
+    if xerr is not None:
+        errors['x'] = error_bounds(x, xerr)
+
+    # Data line first: its color is the default color of the bars
+    data_line = None
+    if fmt != 'none':
+        data_line, = ax.plot(x, y, fmt, zorder=zorder + 0.1, **kwargs)
+        color = data_line.get_color()
+    else:
+        color = kwargs.get('color', ax._get_lines.get_next_color())
+    ecolor = color if ecolor is None else ecolor
+    if elinewidth is None:
+        elinewidth = kwargs.get('linewidth', mpl.rcParams['lines.linewidth'])
+    if capsize is None:
+        capsize = mpl.rcParams['errorbar.capsize']
+    if capthick is None:
+        capthick = elinewidth
+
+    # Everything visible: the limits cover the bars
+    lows = [x, y]
+    highs = [x, y]
+    for i, axis in enumerate('xy'):
+        if axis in errors:
+            lows[i] = np.fmin(lows[i], errors[axis][0])
+            highs[i] = np.fmax(highs[i], errors[axis][1])
+    limits = [xlim, ylim]
+    for i in range(2):
+        if limits[i] is None and len(x):
+            limits[i] = (np.nanmin(lows[i]), np.nanmax(highs[i]))
+    if len(x):
+        ax.update_datalim([(np.nanmin(lows[0]), np.nanmin(lows[1])),
+                           (np.nanmax(highs[0]), np.nanmax(highs[1]))])
+        # add_collection(autolim=False) and add_line do not autoscale
+        ax._request_autoscale_view()
+
+    decimate = decimate and len(x) > threshold
+    columns, rows = pixel_grid(ax, dpi)
+    if decimate and len(x):
+        px = _to_pixels(ax.xaxis, x, limits[0], columns)
+        py = _to_pixels(ax.yaxis, y, limits[1], rows)
+        if data_line is not None and data_line.get_linestyle() in (
+                'None', 'none', '', ' '):
+            keep = unique_pixels(px, py)
+            data_line.set_data(x[keep], y[keep])
+
+    barlinecols = []
+    caplines = []
+    for axis, (low, high) in errors.items():
+        vertical = axis == 'y'
+        position = x if vertical else y
+        finite = np.isfinite(position) & np.isfinite(low) & np.isfinite(high)
+        position, low, high = position[finite], low[finite], high[finite]
+        if decimate and len(position):
+            size, limit = (rows, limits[1]) if vertical else (columns,
+                                                              limits[0])
+            along = ax.yaxis if vertical else ax.xaxis
+            pixel_position = (px if vertical else py)[finite]
+            pixel_low = _to_pixels(along, low, limit, size)
+            pixel_high = _to_pixels(along, high, limit, size)
+            bars = _merged_bars(position, low, high, pixel_position,
+                                np.fmin(pixel_low, pixel_high),
+                                np.fmax(pixel_low, pixel_high))
+        else:
+            bars = (position, low, high)
+        lines = LineCollection([_bar_segments(*bars, vertical)],
+                               colors=ecolor, linewidths=elinewidth,
+                               zorder=zorder, label='_nolegend_',
+                               snap=True)   # As ax.errorbar's short paths
+        ax.add_collection(lines, autolim=False)
+        barlinecols.append(lines)
+
+        if capsize > 0 and decimate and len(position):
+            # Caps overlapping along a pixel row: one segment per group
+            across, across_size, across_limit = (
+                (ax.xaxis, columns, limits[0]) if vertical else
+                (ax.yaxis, rows, limits[1]))
+            half_width = capsize * dpi / 72.0 * SUBPIXEL
+            end, start, stop = _merged_caps(
+                np.r_[low, high], np.r_[pixel_low, pixel_high],
+                np.r_[pixel_position, pixel_position], half_width)
+            start = _from_pixels(across, start, across_limit, across_size)
+            stop = _from_pixels(across, stop, across_limit, across_size)
+            ends = np.c_[end, end, np.full(len(end), np.nan)].ravel()
+            sides = np.c_[start, stop, np.full(len(end), np.nan)].ravel()
+            cap_x, cap_y = (sides, ends) if vertical else (ends, sides)
+            # markersize and markeredgewidth: cap look of the legend handle
+            caps = Line2D(cap_x, cap_y, linestyle='-', linewidth=capthick,
+                          solid_capstyle='butt', marker='None', snap=True,
+                          markersize=2.0 * capsize, markeredgewidth=capthick,
+                          color=ecolor, zorder=zorder, label='_nolegend_')
+        elif capsize > 0:
+            cap_x = np.r_[position, position] if vertical else np.r_[low, high]
+            cap_y = np.r_[low, high] if vertical else np.r_[position, position]
+            caps = Line2D(cap_x, cap_y, linestyle='none',
+                          marker='_' if vertical else '|',
+                          markersize=2.0 * capsize, markeredgewidth=capthick,
+                          color=ecolor, zorder=zorder, label='_nolegend_')
+        if capsize > 0:
+            ax.add_line(caps)
+            caplines.append(caps)
+
+    container = ErrorbarContainer((data_line, tuple(caplines),
+                                   tuple(barlinecols)),
+                                  has_xerr='x' in errors,
+                                  has_yerr='y' in errors, label=label)
+    ax.add_container(container)
+    return container
+
+
+# ============================================================================
+# DEMO: TIME AND FILE SIZE
+# ============================================================================
+
+def _figure(n, fast, fmt='pdf', decimate=True, marker='o'):
+    """Save a template-like error-bar figure; return (seconds, bytes)."""
+    import io
+    import time
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    x = np.sort(rng.uniform(0, 10, n))
+    y = 2 * x + 5 + rng.normal(0, 2, n)
+    y_error = np.abs(rng.normal(0, 1.5, (2, n)))
+    x_error = np.abs(rng.normal(0, 0.05, n))
+
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+    style = dict(fmt=marker, color='blue', markersize=3, ecolor='black',
+                 elinewidth=1.5, capsize=5, capthick=1.5)
+    if fast:
+        fast_errorbar(ax, x, y, yerr=y_error, xerr=x_error, xlim=(0, 10),
+                      ylim=(-5, 35), decimate=decimate, threshold=0, **style)
+    else:
+        ax.errorbar(x, y, yerr=y_error, xerr=x_error, **style)
+    ax.set_xlim(0, 10)
+    ax.set_ylim(-5, 35)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=SAVE_DPI)
+    plt.close(fig)
+    seconds = time.perf_counter() - start
+    if fmt == 'png':
+        buffer.seek(0)
+        return seconds, plt.imread(buffer)
+    return seconds, buffer.tell()
+
+
+if __name__ == '__main__':
+    import matplotlib
+    matplotlib.use('Agg')
+
+    import matplotlib.pyplot as plt
+    fig, (ax_fast, ax_full) = plt.subplots(1, 2)
+    style = dict(yerr=[[2.0, 1.0, 3.0], [4.0, 3.5, 1.0]], fmt='none')
+    fast_errorbar(ax_fast, [1, 2, 3], [20.0, 50.0, 80.0], **style)
+    ax_full.errorbar([1, 2, 3], [20.0, 50.0, 80.0], **style)
+    assert np.allclose(ax_fast.get_ylim(), ax_full.get_ylim())
+    plt.close(fig)
+    print("fmt='none' on an empty axes: same limits as ax.errorbar")
+
+    print('Pixel difference with ax.errorbar (10^4 points, 300 DPI PNG):')
+    _, full = _figure(10**4, False, 'png')
+    for decimate in (False, True):
+        _, fast = _figure(10**4, True, 'png', decimate)
+        diff = np.abs(full - fast).max(axis=-1)
+        drawn = (full[..., :3] < 0.999).any(axis=-1)
+        share = 100 * (diff > 0.1).sum() / drawn.sum()
+        print(f'  decimate={decimate!s:5s}: {share:5.2f}% of the drawn pixels '
+              'differ by more than 10%')
+
+    print('Error-bar figure (x and asymmetric y errors, caps) saved to PDF:')
+    for n in (10**3, 10**4, 10**5, 10**6):
+        seconds, size = _figure(n, True)
+        bars, _ = _figure(n, True, marker='none')
+        full, full_size = _figure(n, False)
+        print(f'  n = {n:>8d}: fast_errorbar {seconds:6.2f} s {size / 1e6:6.2f} '
+              f'MB ({bars:5.2f} s without markers)   ax.errorbar {full:6.2f} s '
+              f'{full_size / 1e6:6.2f} MB')
@@ -0,0 +1,235 @@
+"""
+================================================================================
+BINNED FFT KERNEL DENSITY ESTIMATE
+================================================================================
+scipy.stats.gaussian_kde(data)(x) sums one Gaussian per sample at every
+evaluation point: O(n * m) operations, about 10^11 for a smooth curve of
+10^3 points over 10^8 samples.
+
+FFTKDE computes the same Gaussian KDE in near-linear time:
+    - the samples are spread onto a fine regular grid by linear binning
+      (each sample shares its weight between the two nearest grid points),
+      in chunks, so memory does not grow with the number of samples
+    - the binned counts are convolved with the sampled Gaussian kernel by
+      FFT: O(g log g) for g grid points, independent of n
+    - the bandwidth follows gaussian_kde: Scott's or Silverman's factor
+      (from the effective sample size with weights) times the weighted
+      standard deviation, or a factor / function you give
+    - the density is read at any points by linear interpolation of the grid
+The grid spacing is a small fraction of the bandwidth (default 1/20), so the
+result matches gaussian_kde to about 2e-4 of the peak density.
+
+USAGE:
+    from fft_kde import FFTKDE
+    kde = FFTKDE(data)                      # Same call as gaussian_kde
+    ax.plot(x, kde(x))                      # Probability density
+    ax.plot(kde.grid, kde.density)          # Or on its own fine grid
+
+    Over a count histogram: counts per bin = len(data) * bin width * pdf
+    ax.plot(x, kde(x) * len(data) * bin_width)
+
+    Accuracy against gaussian_kde and time up to 10^8 samples:
+    python fft_kde.py
+================================================================================
+"""
+
+import numpy as np
+
+DEFAULT_POINTS_PER_BANDWIDTH = 20
+DEFAULT_CUT = 3.0        # Grid extends this many bandwidths past the data
+KERNEL_TAIL = 6.0        # Kernel truncated at this many bandwidths
+MAX_GRID = 2**22
+CHUNK = 2**22            # Samples binned at a time
+
+
+# ============================================================================
+# MOMENTS AND BANDWIDTH
+# ============================================================================
+
+def _chunks(data, weights):
+    for start in range(0, len(data), CHUNK):
+        stop = start + CHUNK
+        yield data[start:stop], (None if weights is None
+                                 else weights[start:stop])
+
+
+def weighted_moments(data, weights=None):
+    """(min, max, mean, unbiased variance, effective sample size)."""
+    low, high = np.inf, -np.inf
+    total = total_sq = first = 0.0
+    for x, w in _chunks(data, weights):
+        low, high = min(low, x.min()), max(high, x.max())
+        if w is None:
+            total += len(x)
+            total_sq += len(x)
+            first += x.sum(dtype=np.float64)
+        else:
+            total += w.sum(dtype=np.float64)
+            total_sq += np.dot(w, w)
+            first += np.dot(w, x)
+    mean = first / total
+    second = 0.0
+    for x, w in _chunks(data, weights):
+        deviation = np.subtract(x, mean, dtype=np.float64)
+        second += (np.dot(deviation, deviation) if w is None
+                   else np.dot(w, deviation * deviation))
+    neff = total**2 / total_sq
+    # Same normalization as np.cov(aweights=w), used by gaussian_kde
+    variance = second / total / (1.0 - 1.0 / neff) if neff > 1 else 0.0
+    return low, high, mean, variance, neff
+
+
+def bandwidth_factor(neff, bw_method='scott'):
+    """Scott's or Silverman's factor for a 1-D sample."""
+    if bw_method == 'scott':
+        return neff ** (-1.0 / 5)
+    if bw_method == 'silverman':
+        return (neff * 3.0 / 4.0) ** (-1.0 / 5)
+    raise ValueError("bw_method must be 'scott', 'silverman', a number or "
+                     "a function of the FFTKDE.")
+
+
+# ============================================================================
+# BINNING AND CONVOLUTION
+# ============================================================================
+
+def linear_binning(data, low, step, size, weights=None):
+    """Weights of the samples spread linearly onto size grid points."""
+    grid = np.zeros(size)
+    for x, w in _chunks(data, weights):
+        position = (x - low) / step
+        index = np.floor(position).astype(np.intp)
+        np.clip(index, 0, size - 2, out=index)
+        right = position - index
+        left = 1.0 - right
+        if w is not None:
+            left *= w
+            right *= w
+        grid += np.bincount(index, weights=left, minlength=size)
+        grid[1:] += np.bincount(index, weights=right,
+                                minlength=size - 1)[:size - 1]
+    return grid
+
+
+def gaussian_smooth(binned, step, bandwidth):
+    """Convolve the binned weights with a Gaussian kernel, by FFT."""
+    half = int(np.ceil(KERNEL_TAIL * bandwidth / step))
+    offsets = np.arange(-half, half + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth)**2)
+    kernel /= bandwidth * np.sqrt(2 * np.pi)
+    size = len(binned) + len(kernel) - 1
+    n_fft = 1 << int(np.ceil(np.log2(size)))
+    smooth = np.fft.irfft(np.fft.rfft(binned, n_fft) *
+                          np.fft.rfft(kernel, n_fft), n_fft)
+    return smooth[half:half + len(binned)]
+
+
+# ============================================================================
+# ESTIMATOR
+# ============================================================================
+
+class FFTKDE:
+    """
+    Gaussian kernel density estimate of 1-D data, binned and convolved by
+    FFT. Called like scipy.stats.gaussian_kde.
+
+    Parameters
+    ----------
+    dataset : array_like
+        1-D samples.
+    bw_method : 'scott', 'silverman', float or callable
+        Bandwidth factor rule; a float is the factor itself; a callable
+        takes the FFTKDE and returns the factor (as in gaussian_kde).
+    weights : array_like, optional
+        Weight of each sample.
+    points_per_bandwidth : int
+        Grid points per bandwidth (accuracy of the binning).
+    cut : float
+        Bandwidths of grid beyond the smallest and largest sample.
+    """
+
+    def __init__(self, dataset, bw_method='scott', weights=None,
+                 points_per_bandwidth=DEFAULT_POINTS_PER_BANDWIDTH,
+                 cut=DEFAULT_CUT):
+        data = np.asarray(dataset, dtype=float).ravel()
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float).ravel()
+            if len(weights) != len(data):
+                raise ValueError('weights must have one value per sample.')
+        if len(data) < 2:
+            raise ValueError('A KDE needs at least two samples.')
+        low, high, self.mean, variance, self.neff = \
+            weighted_moments(data, weights)
+        self.n = len(data)
+        if callable(bw_method):
+            self.factor = float(bw_method(self))
+        elif np.isscalar(bw_method) and not isinstance(bw_method, str):
+            self.factor = float(bw_method)
+        else:
+            self.factor = bandwidth_factor(self.neff, bw_method)
+        self.bandwidth = self.factor * np.sqrt(variance)
+        if not self.bandwidth > 0:
+            raise ValueError('The data have no spread: bandwidth is zero.')
+
+        # Grid: fine compared with the bandwidth, capped at MAX_GRID points
+        low -= cut * self.bandwidth
+        high += cut * self.bandwidth
+        step = self.bandwidth / points_per_bandwidth
+        size = int(min(np.ceil((high - low) / step) + 1, MAX_GRID))
+        self.grid = np.linspace(low, high, size)
+        step = self.grid[1] - self.grid[0]
+        binned = linear_binning(data, low, step, size, weights)
+        binned /= binned.sum()
+        self.density = gaussian_smooth(binned, step, self.bandwidth)
+
+    def evaluate(self, points):
+        """Density at *points* (zero outside the grid)."""
+        return np.interp(points, self.grid, self.density, left=0.0,
+                         right=0.0)
+
+    __call__ = evaluate
+
+    def scotts_factor(self):
+        return bandwidth_factor(self.neff, 'scott')
+
+    def silverman_factor(self):
+        return bandwidth_factor(self.neff, 'silverman')
+
+
+# ============================================================================
+# ACCURACY AND BENCHMARK
+# ============================================================================
+
+if __name__ == '__main__':
+    import time
+    from scipy.stats import gaussian_kde
+
+    rng = np.random.default_rng(0)
+
+    print('Accuracy against gaussian_kde (max error / peak density):')
+    for n in (50, 1000, 20_000):
+        data = np.r_[rng.normal(0, 1, n // 2), rng.exponential(3, n - n // 2)]
+        weights = rng.uniform(0.5, 2.0, n)
+        x = np.linspace(data.min() - 1, data.max() + 1, 1000)
+        for bw in ('scott', 'silverman', 0.2):
+            for w in (None, weights):
+                exact = gaussian_kde(data, bw, weights=w)(x)
+                error = np.abs(FFTKDE(data, bw, weights=w)(x) - exact).max()
+                print(f'  n={n:<6d} bw_method={bw!s:9s} '
+                      f'{"weighted" if w is not None else "unweighted":10s}'
+                      f' {error / exact.max():.1e}')
+
+    print('Time for a 1000-point curve:')
+    x = np.linspace(-5, 25, 1000)
+    for n in (10**4, 10**5, 10**6, 10**7, 10**8):
+        data = np.r_[rng.normal(0, 1, n // 2), rng.exponential(3, n - n // 2)]
+        start = time.perf_counter()
+        FFTKDE(data)(x)
+        line = (f'  n=10^{int(np.log10(n))}: FFTKDE '
+                f'{time.perf_counter() - start:7.3f} s')
+        if n <= 10**5:
+            start = time.perf_counter()
+            gaussian_kde(data)(x)
+            line += f'   gaussian_kde {time.perf_counter() - start:7.3f} s'
+        print(line)
+        del data
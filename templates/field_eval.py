@@ -0,0 +1,338 @@
+"""
+================================================================================
+TILED, PARALLEL EVALUATION OF 2-D FIELDS
+================================================================================
+Z = f(X, Y) over full meshgrid arrays allocates X and Y (M x N each), and
+every term of f creates several more M x N temporaries: a sum of four
+Gaussians on a 10 000 x 10 000 grid needs several GB for a 0.8 GB result,
+and runs at memory speed on one core.
+
+evaluate_field() computes the same Z tile by tile:
+    - f is called on a (1, n) row of x and an (m, 1) column of y, which
+      broadcast to one (m, n) tile: no meshgrid, and the temporaries of f
+      are tile-sized (a few MB, cache friendly)
+    - the tiles are spread over a thread pool (NumPy releases the GIL in
+      its array operations), or a process pool for functions that hold it
+    - each tile is written straight into the output: a new array, one you
+      preallocate, or a .npy file on disk (memory-mapped, for fields larger
+      than RAM, reopened later with np.load(path, mmap_mode='r'))
+    - throughput and peak extra memory are reported (stats(), verbose=True)
+
+USAGE:
+    from field_eval import evaluate_field
+
+    def landscape(X, Y):
+        return np.exp(-((X-1)**2 + (Y-1)**2)/0.5) - 0.5*np.exp(-(X**2 + Y**2)/2)
+
+    Z = evaluate_field(landscape, x, y)        # Z[i, j] = f(x[j], y[i])
+
+    Parameter sweep of an expensive model, on disk, 4 processes:
+    Z = evaluate_field(model, alphas, betas, out='sweep.npy',
+                       executor='process', workers=4, verbose=True)
+
+    Time and memory against full meshgrids:
+    python field_eval.py
+================================================================================
+"""
+
+import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:   # Python < 3.8: process pool needs a .npy output
+    shared_memory = None
+
+DEFAULT_TILE_MB = 4.0
+_last_stats = {}
+
+
+def stats():
+    """Return size, time, throughput and peak memory of the last call."""
+    return dict(_last_stats)
+
+
+# ============================================================================
+# TILES
+# ============================================================================
+
+def tile_shape(shape, itemsize, tile_mb=DEFAULT_TILE_MB, min_tiles=1):
+    """
+    (rows, cols) of tiles of about *tile_mb* for an output of *shape*:
+    full rows when they fit, and at least *min_tiles* tiles when possible.
+    """
+    m, n = shape
+    points = max(int(tile_mb * 2**20 / itemsize), 1)
+    cols = max(min(n, points), 1)   # An empty axis still gives a shape
+    rows = max(min(m, points // cols), 1)
+    if min_tiles > 1:
+        rows = max(min(rows, -(-m // min_tiles)), 1)
+    return rows, cols
+
+
+def tiles(shape, rows, cols):
+    """(row slice, column slice) of every tile, row by row."""
+    m, n = shape
+    return [(slice(i, min(i + rows, m)), slice(j, min(j + cols, n)))
+            for i in range(0, m, rows) for j in range(0, n, cols)]
+
+
+def _evaluate(func, x, y, rows, cols, args):
+    """Values of one tile: f on a (1, n) row and an (m, 1) column."""
+    return func(x[cols][np.newaxis, :], y[rows][:, np.newaxis], *args)
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def _output(out, shape, dtype):
+    """Output array: new, given (checked), or a new .npy memory map."""
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if isinstance(out, (str, os.PathLike)):
+        return np.lib.format.open_memmap(os.fspath(out), mode='w+',
+                                         dtype=dtype, shape=shape)
+    if out.shape != shape:
+        raise ValueError(f'out has shape {out.shape}, expected {shape} '
+                         '(len(y), len(x)).')
+    return out
+
+
+def _memmap_target(out):
+    """(filename, offset) when *out* is a whole writable file mapping."""
+    if isinstance(out, np.memmap) and out.filename and \
+            out.flags.c_contiguous and out.base is not None and \
+            getattr(out, 'offset', None) is not None:
+        return out.filename, out.offset
+    return None
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+def _tile_thread(func, x, y, out, rows, cols, args):
+    out[rows, cols] = _evaluate(func, x, y, rows, cols, args)
+
+
+def _tile_process(func, x, y, target, shape, dtype, rows, cols, args,
+                  track_memory):
+    """
+    Worker process: evaluate one tile and write it into the shared memory
+    block or file *target*. Return the peak memory (bytes) of the tile.
+    """
+    if track_memory:
+        tracemalloc.start()
+    values = _evaluate(func, x, y, rows, cols, args)
+    peak = tracemalloc.get_traced_memory()[1] if track_memory else 0
+    if track_memory:
+        tracemalloc.stop()
+    kind, name, offset = target
+    if kind == 'shm':
+        shm = shared_memory.SharedMemory(name=name)   # Owned by the parent
+        out = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        out[rows, cols] = values
+        del out
+        shm.close()
+    else:
+        out = np.memmap(name, dtype=dtype, mode='r+', offset=offset,
+                        shape=shape)
+        out[rows, cols] = values
+        out.flush()
+        del out
+    return peak
+
+
+# ============================================================================
+# EVALUATION
+# ============================================================================
+
+def evaluate_field(func, x, y, *, args=(), out=None, dtype=float,
+                   workers=None, executor='thread', tile_mb=DEFAULT_TILE_MB,
+                   track_memory=True, verbose=False):
+    """
+    Evaluate Z[i, j] = func(x[j], y[i], *args) on the grid of the 1-D axes
+    x and y, tile by tile.
+
+    Parameters
+    ----------
+    func : callable
+        Vectorized function of (X, Y, *args), called with X of shape (1, n)
+        and Y of shape (m, 1); returns an (m, n) tile (or anything that
+        broadcasts to it). With executor='process' it must be picklable
+        (defined at module level).
+    x, y : 1-D arrays
+    args : tuple
+        Extra arguments passed to func (e.g. model parameters).
+    out : ndarray, str or Path, optional
+        Output array of shape (len(y), len(x)) to fill, or the name of a
+        .npy file to create (memory-mapped). Default: a new array.
+    dtype : dtype
+        Type of a new output.
+    workers : int, optional
+        Threads or processes (default: all cores).
+    executor : {'thread', 'process'}
+        Threads share the output directly; processes suit functions that
+        do not release the GIL (pure Python, some compiled models).
+    tile_mb : float
+        Size of one tile of output.
+    track_memory : bool
+        Measure the peak memory allocated during the evaluation (tracemalloc,
+        which NumPy reports to), in stats()['peak_mb'].
+    verbose : bool
+        Print the throughput and peak memory.
+
+    Returns
+    -------
+    The output array (a numpy.memmap when *out* is a file name).
+    """
+    start_time = time.perf_counter()
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if x.ndim != 1 or y.ndim != 1:
+        raise ValueError('x and y must be 1-D axes (no meshgrid needed).')
+    if executor not in ('thread', 'process'):
+        raise ValueError("executor must be 'thread' or 'process'.")
+    shape = (len(y), len(x))
+    out = _output(out, shape, np.dtype(dtype) if out is None or
+                  isinstance(out, (str, os.PathLike)) else out.dtype)
+    if out.size == 0:
+        # Empty x or y: nothing to evaluate
+        _last_stats.clear()
+        _last_stats.update(points=0, megabytes=0.0, seconds=0.0,
+                           mpoints_per_s=0.0, mb_per_s=0.0,
+                           peak_mb=0.0 if track_memory else None, tiles=0,
+                           tile=(0, 0), workers=0, executor=executor)
+        return out
+    workers = max(workers or os.cpu_count() or 1, 1)
+    rows, cols = tile_shape(shape, out.dtype.itemsize, tile_mb,
+                            min_tiles=4 * workers if workers > 1 else 1)
+    parts = tiles(shape, rows, cols)
+    workers = min(workers, len(parts))
+
+    tracing = track_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif track_memory:
+        tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0] if track_memory else 0
+    worker_peak = 0
+    try:
+        if executor == 'thread' and workers == 1:
+            for r, c in parts:
+                _tile_thread(func, x, y, out, r, c, args)
+        elif executor == 'thread':
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for future in [pool.submit(_tile_thread, func, x, y, out, r,
+                                           c, args) for r, c in parts]:
+                    future.result()
+        else:
+            worker_peak = _evaluate_processes(func, x, y, out, parts, args,
+                                              workers, track_memory)
+        peak = (tracemalloc.get_traced_memory()[1] - before
+                if track_memory else 0)
+    finally:
+        if tracing:
+            tracemalloc.stop()
+    # Worker processes each hold one tile's temporaries at a time
+    peak += worker_peak * workers
+
+    seconds = time.perf_counter() - start_time
+    points = shape[0] * shape[1]
+    _last_stats.clear()
+    _last_stats.update(points=points, megabytes=out.nbytes / 1e6,
+                       seconds=seconds,
+                       mpoints_per_s=points / 1e6 / max(seconds, 1e-9),
+                       mb_per_s=out.nbytes / 1e6 / max(seconds, 1e-9),
+                       peak_mb=peak / 1e6 if track_memory else None,
+                       tiles=len(parts), tile=(rows, cols), workers=workers,
+                       executor=executor)
+    if verbose:
+        memory = (f', peak extra memory {peak / 1e6:.1f} MB'
+                  if track_memory else '')
+        print(f'Evaluated {shape[0]} x {shape[1]} points in {seconds:.2f} s '
+              f'({_last_stats["mpoints_per_s"]:.1f} Mpoints/s, '
+              f'{len(parts)} tiles, {workers} {executor}(s){memory})')
+    return out
+
+
+def _evaluate_processes(func, x, y, out, parts, args, workers, track_memory):
+    """Run the tiles on a process pool; return the largest tile peak."""
+    target = _memmap_target(out)
+    block = None
+    if target is not None:
+        out.flush()
+        target = ('file',) + target
+    elif shared_memory is not None:
+        # Workers must report to the same resource tracker as this process
+        resource_tracker.ensure_running()
+        block = shared_memory.SharedMemory(create=True,
+                                           size=max(out.nbytes, 1))
+        target = ('shm', block.name, 0)
+    else:
+        raise RuntimeError("executor='process' needs Python >= 3.8 or a "
+                           ".npy output (out='field.npy').")
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_tile_process, func, x, y, target,
+                                   out.shape, out.dtype, r, c, args,
+                                   track_memory) for r, c in parts]
+            peaks = [future.result() for future in futures]
+        if block is not None:
+            out[...] = np.ndarray(out.shape, dtype=out.dtype,
+                                  buffer=block.buf)
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+    return max(peaks, default=0)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _landscape(X, Y):
+    """The contour template's field: four Gaussian terms."""
+    return (2.0 * np.exp(-((X-1)**2 + (Y-1)**2)/0.5) +
+            1.5 * np.exp(-((X+1)**2 + (Y+1)**2)/0.8) +
+            1.0 * np.exp(-((X-0.5)**2 + (Y+0.5)**2)/0.3) -
+            0.5 * np.exp(-((X)**2 + (Y)**2)/2))
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    n = 4000
+    x = np.linspace(-3, 3, n)
+    print(f'Field of {n} x {n} points ({n * n * 8 / 1e6:.0f} MB of output):')
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    X, Y = np.meshgrid(x, x)
+    reference = _landscape(X, Y)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del X, Y
+    print(f'  full meshgrid:         {seconds:6.2f} s   peak '
+          f'{peak / 1e6:7.1f} MB (output included)')
+
+    runs = [('tiles, 1 thread', dict(workers=1)),
+            (f'tiles, {os.cpu_count()} thread(s)', dict(executor='thread'))]
+    folder = tempfile.mkdtemp()
+    runs.append(('tiles, processes, .npy', dict(
+        executor='process', out=os.path.join(folder, 'field.npy'))))
+    for name, options in runs:
+        Z = evaluate_field(_landscape, x, x, **options)
+        s = stats()
+        assert np.allclose(Z, reference)
+        print(f'  {name:22s} {s["seconds"]:6.2f} s   peak '
+              f'{s["peak_mb"]:7.1f} MB extra   '
+              f'{s["mpoints_per_s"]:5.1f} Mpoints/s')
+        del Z
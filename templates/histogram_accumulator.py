@@ -0,0 +1,643 @@
+"""
+================================================================================
+STREAMING, MERGEABLE HISTOGRAMS FOR BILLIONS OF SAMPLES
+================================================================================
+ax.hist(data, bins=30) needs all the samples in memory, np.mean and np.std
+then read them twice more, and the result is drawn as one Rectangle patch
+per bin. Event data of 10^9 - 10^10 samples per run do not fit.
+
+HistogramAccumulator folds the samples in chunk by chunk:
+    - fixed bin edges (given, or derived from the range of the data), with
+      the same bin assignment as np.histogram / ax.hist
+    - per chunk, the counts (np.histogram's blocked fast path for equal
+      bins) and the moments: count, mean and sum of squared deviations,
+      combined across chunks with the parallel Welford update (Chan et al.)
+      so the mean and standard deviation stay exact for any number of chunks
+    - partial accumulators (one per worker process, file or run) merge with
+      acc.merge(other) or acc1 + acc2
+    - drawn with one StepPatch (ax.stairs), whatever the number of bins
+Histogram2DAccumulator and HexbinAccumulator do the same for (x, y) pairs,
+with the bins of np.histogram2d and the hexagons of ax.hexbin.
+Memory depends on the number of bins, not on the number of samples.
+
+USAGE:
+    from histogram_accumulator import accumulate
+    hist = accumulate(chunks, bins=30, range=(0.0, 10.0))  # Any iterable
+    hist.stairs(ax, fill=True, facecolor='steelblue', edgecolor='black')
+    ax.axvline(hist.mean); ax.axvline(hist.mean + hist.std)
+
+    Range of the data found first (the chunks are read twice):
+    hist = accumulate(lambda: iter_file('events.csv', usecols=(2,)), bins=30)
+
+    Several worker processes (reader must be picklable):
+    hist = parallel_accumulate(read_file, ['run1.csv', 'run2.csv'],
+                               bins=30, range=(0.0, 10.0))
+
+    2-D histogram or hexbin of chunks, e.g. memory-mapped columns:
+    hist = accumulate_2d(array_chunks(x_mmap, y_mmap), bins=200,
+                         range=((0, 10), (0, 10)), hexagonal=True)
+    hexes = hist.draw(ax, cmap=cmap, norm=LogNorm())   # Like ax.hexbin
+
+    Throughput compared with np.histogram + np.mean + np.std:
+    python histogram_accumulator.py
+================================================================================
+"""
+
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+_last_stats = {}
+
+
+def stats():
+    """Return samples, time and samples/s of the last accumulate()."""
+    return dict(_last_stats)
+
+
+# ============================================================================
+# ACCUMULATOR
+# ============================================================================
+
+class HistogramAccumulator:
+    """
+    Histogram counts and moments, updated chunk by chunk.
+
+    Parameters
+    ----------
+    bins : int or sequence of float
+        Number of equal-width bins over *range*, or the bin edges.
+    range : (float, float), optional
+        Lower and upper edge for an integer *bins*. If not given, it is
+        taken from the first chunk added; later samples outside it are
+        counted in underflow / overflow (a warning says so).
+    """
+
+    def __init__(self, bins=10, range=None):
+        self.edges = None
+        self.uniform = np.ndim(bins) == 0
+        self.n_bins = int(bins) if self.uniform else len(bins) - 1
+        if not self.uniform:
+            self.edges = np.asarray(bins, dtype=float)
+            if np.any(np.diff(self.edges) < 0):
+                raise ValueError('Bin edges must increase monotonically.')
+        elif range is not None:
+            self._set_range(*range)
+        self.counts = np.zeros(self.n_bins, dtype=np.int64)
+        self.underflow = self.overflow = self.nan_count = 0
+        # Moments of all finite samples (inside and outside the bins)
+        self.n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _set_range(self, low, high):
+        """Equal-width edges, as np.histogram builds them."""
+        low, high = float(low), float(high)
+        if low > high:
+            raise ValueError('range must be (low, high) with low <= high.')
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        self.edges = np.linspace(low, high, self.n_bins + 1)
+
+    # ------------------------------------------------------------------
+    # Adding samples
+    # ------------------------------------------------------------------
+
+    def add(self, values):
+        """Fold one chunk of samples (any shape) into the histogram."""
+        values = np.asarray(values).ravel()
+        if values.dtype.kind not in 'fiub':
+            values = values.astype(float)
+        if values.dtype.kind == 'f':
+            finite = np.isfinite(values)
+            if not finite.all():
+                self.nan_count += int(np.count_nonzero(np.isnan(values)))
+                self.underflow += int(np.count_nonzero(values == -np.inf))
+                self.overflow += int(np.count_nonzero(values == np.inf))
+                values = values[finite]
+        if len(values) == 0:
+            return self
+        low, high = values.min(), values.max()
+        if self.edges is None:
+            self._set_range(low, high)
+        self._add_moments(values, low, high)
+        self._add_counts(values, low, high)
+        return self
+
+    def _add_moments(self, values, low, high):
+        n = len(values)
+        mean = float(np.mean(values, dtype=np.float64))
+        deviation = np.subtract(values, mean, dtype=np.float64)
+        self._combine(n, mean, float(np.dot(deviation, deviation)))
+        self.min = min(self.min, float(low))
+        self.max = max(self.max, float(high))
+
+    def _combine(self, n, mean, m2):
+        """Parallel Welford update with a group of n samples (Chan et al.)."""
+        total = self.n + n
+        delta = mean - self._mean
+        self._mean += delta * n / total
+        self._m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+
+    def _add_counts(self, values, low, high):
+        edges = self.edges
+        if low < edges[0]:
+            self.underflow += int(np.count_nonzero(values < edges[0]))
+        if high > edges[-1]:
+            self.overflow += int(np.count_nonzero(values > edges[-1]))
+        if self.uniform:
+            # np.histogram's fast path for equal bins (blocked, no sorting)
+            counts, _ = np.histogram(values, self.n_bins,
+                                     range=(edges[0], edges[-1]))
+        else:
+            counts, _ = np.histogram(values, edges)
+        self.counts += counts
+
+    # ------------------------------------------------------------------
+    # Merging
+    # ------------------------------------------------------------------
+
+    def merge(self, other):
+        """Add the samples of another accumulator with the same edges."""
+        if other.n == 0 and other.nan_count == 0:
+            return self
+        if self.edges is None:
+            if other.edges is not None:
+                self.edges = other.edges.copy()
+        elif other.edges is not None and \
+                not np.array_equal(self.edges, other.edges):
+            raise ValueError('Only histograms with the same bin edges can '
+                             'be merged; give both the same bins and range.')
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.nan_count += other.nan_count
+        if other.n:
+            self._combine(other.n, other._mean, other._m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        return self
+
+    def __add__(self, other):
+        result = HistogramAccumulator(self.n_bins if self.uniform
+                                      else self.edges)
+        return result.merge(self).merge(other)
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+
+    @property
+    def mean(self):
+        return self._mean if self.n else np.nan
+
+    def var(self, ddof=0):
+        """Variance of the samples (ddof=0 like np.var / np.std)."""
+        return self._m2 / (self.n - ddof) if self.n > ddof else np.nan
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.var()))
+
+    def density(self):
+        """Counts normalized like ax.hist(..., density=True)."""
+        return self.counts / (self.counts.sum() * np.diff(self.edges))
+
+    def stairs(self, ax, density=False, **kwargs):
+        """Draw the histogram with one StepPatch (ax.stairs); returns it."""
+        values = self.density() if density else self.counts
+        if 'fill' not in kwargs:
+            kwargs['fill'] = True
+        return ax.stairs(values, self.edges, **kwargs)
+
+
+# ============================================================================
+# FEEDING CHUNKS
+# ============================================================================
+
+def _chunks(source):
+    """An array is one chunk; any other iterable yields chunks."""
+    if isinstance(source, np.ndarray):
+        return [source]
+    return source
+
+
+def accumulate(source, bins=10, range=None, accumulator=None):
+    """
+    Histogram of all the chunks of *source*: an array, an iterable of
+    arrays (e.g. a generator reading a file), or a function returning such
+    an iterable. Without *range*, the range of the data is found first if
+    *source* is a function (the chunks are read twice), else taken from the
+    first chunk. Pass *accumulator* to continue an existing histogram.
+    """
+    start = time.perf_counter()
+    if range is None and callable(source) and np.ndim(bins) == 0 and \
+            accumulator is None:
+        low, high = np.inf, -np.inf
+        for chunk in _chunks(source()):
+            # Range of the finite samples: add() counts +-inf as overflow
+            chunk = np.asarray(chunk, dtype=float)
+            chunk = chunk[np.isfinite(chunk)]
+            if chunk.size:
+                low = min(low, chunk.min())
+                high = max(high, chunk.max())
+        if np.isfinite(low):
+            range = (low, high)
+    hist = accumulator or HistogramAccumulator(bins, range)
+    chunks = _chunks(source() if callable(source) else source)
+    outside = hist.underflow + hist.overflow
+    for chunk in chunks:
+        hist.add(chunk)
+    if range is None and hist.underflow + hist.overflow > outside:
+        warnings.warn(f'{hist.underflow + hist.overflow - outside} samples '
+                      'fell outside the range taken from the first chunk; '
+                      'give range=(low, high) to include them.')
+
+    seconds = time.perf_counter() - start
+    _last_stats.clear()
+    _last_stats.update(samples=hist.n, seconds=seconds,
+                       samples_per_s=hist.n / max(seconds, 1e-9),
+                       bins=hist.n_bins)
+    return hist
+
+
+def _accumulate_task(reader, task, bins, range):
+    return accumulate(reader(task), bins, range)
+
+
+def parallel_accumulate(reader, tasks, bins=10, range=None, workers=None):
+    """
+    Accumulate reader(task) for every task (file, seed, run id...) on a
+    process pool and merge the partial histograms. *reader* must be a
+    picklable function returning an iterable of chunks; *range* (or bin
+    edges) is required, so that all workers use the same bins.
+    """
+    if range is None and np.ndim(bins) == 0:
+        raise ValueError('Give range=(low, high) or the bin edges: every '
+                         'worker must use the same bins.')
+    start = time.perf_counter()
+    tasks = list(tasks)
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    hist = HistogramAccumulator(bins, range)
+    if workers <= 1:
+        for task in tasks:
+            hist.merge(_accumulate_task(reader, task, bins, range))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(_accumulate_task, [reader] * len(tasks),
+                                 tasks, [bins] * len(tasks),
+                                 [range] * len(tasks)):
+                hist.merge(part)
+
+    seconds = time.perf_counter() - start
+    _last_stats.clear()
+    _last_stats.update(samples=hist.n, seconds=seconds,
+                       samples_per_s=hist.n / max(seconds, 1e-9),
+                       bins=hist.n_bins, workers=workers)
+    return hist
+
+
+# ============================================================================
+# 2-D HISTOGRAMS AND HEXBINS
+# ============================================================================
+
+def _uniform_index(values, edges):
+    """Bin of each value (all inside the edges), as np.histogram assigns it."""
+    n_bins = len(edges) - 1
+    low, high = edges[0], edges[-1]
+    index = ((values - low) * (n_bins / (high - low))).astype(np.intp)
+    index[index == n_bins] -= 1
+    index[values < edges[index]] -= 1
+    index[(values >= edges[index + 1]) & (index != n_bins - 1)] += 1
+    return index
+
+
+def _finite_pairs(x, y):
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        return x[finite], y[finite], len(x) - int(np.count_nonzero(finite))
+    return x, y, 0
+
+
+class Histogram2DAccumulator:
+    """
+    Counts of (x, y) pairs on a rectangular grid of equal bins, updated
+    chunk by chunk, with the bins of np.histogram2d.
+
+    Parameters
+    ----------
+    bins : int or (int, int)
+        Number of bins along x and y.
+    range : ((xmin, xmax), (ymin, ymax)), optional
+        Taken from the first chunk if not given.
+    """
+
+    def __init__(self, bins=100, range=None):
+        self.shape = (int(bins), int(bins)) if np.ndim(bins) == 0 else \
+            tuple(int(b) for b in bins)
+        self.edges = None
+        if range is not None:
+            self._set_range(range)
+        self.counts = np.zeros(self.shape, dtype=np.int64)   # [x bin, y bin]
+        self.n = self.outside = self.nan_count = 0
+
+    def _set_range(self, range):
+        edges = []
+        for (low, high), n_bins in zip(range, self.shape):
+            low, high = float(low), float(high)
+            if low == high:
+                low, high = low - 0.5, high + 0.5
+            edges.append(np.linspace(low, high, n_bins + 1))
+        self.edges = tuple(edges)
+
+    def add(self, x, y):
+        """Fold one chunk of (x, y) pairs into the counts."""
+        x, y, invalid = _finite_pairs(x, y)
+        self.nan_count += invalid
+        if len(x) == 0:
+            return self
+        if self.edges is None:
+            self._set_range(((x.min(), x.max()), (y.min(), y.max())))
+        self.n += len(x)
+        (x_edges, y_edges) = self.edges
+        inside = ((x >= x_edges[0]) & (x <= x_edges[-1]) &
+                  (y >= y_edges[0]) & (y <= y_edges[-1]))
+        if not inside.all():
+            self.outside += len(x) - int(np.count_nonzero(inside))
+            x, y = x[inside], y[inside]
+        flat = (_uniform_index(x, x_edges) * self.shape[1] +
+                _uniform_index(y, y_edges))
+        self.counts += np.bincount(flat, minlength=self.counts.size
+                                   ).reshape(self.shape)
+        return self
+
+    def merge(self, other):
+        """Add the counts of another accumulator with the same bins."""
+        if self.edges is None:
+            self.edges = other.edges
+        elif other.edges is not None and not all(
+                np.array_equal(a, b) for a, b in zip(self.edges, other.edges)):
+            raise ValueError('Only 2-D histograms with the same bins can be '
+                             'merged; give both the same bins and range.')
+        self.counts += other.counts
+        self.n += other.n
+        self.outside += other.outside
+        self.nan_count += other.nan_count
+        return self
+
+    def __add__(self, other):
+        return Histogram2DAccumulator(self.shape).merge(self).merge(other)
+
+    def draw(self, ax, mincnt=1, **kwargs):
+        """
+        Draw the counts as one image (grid_heatmap.py, shading='nearest');
+        bins with fewer than *mincnt* counts are left transparent, like
+        ax.hist2d(..., cmin=mincnt). Returns the image.
+        """
+        from grid_heatmap import grid_heatmap
+
+        x_edges, y_edges = self.edges
+        counts = np.ma.masked_less(self.counts.T, mincnt)
+        return grid_heatmap(ax, (x_edges[:-1] + x_edges[1:]) / 2,
+                            (y_edges[:-1] + y_edges[1:]) / 2, counts,
+                            shading='nearest', **kwargs)
+
+
+class HexbinAccumulator:
+    """
+    Counts of (x, y) pairs in the hexagons of ax.hexbin(gridsize, extent),
+    updated chunk by chunk (same hexagon assignment as ax.hexbin).
+
+    Parameters
+    ----------
+    gridsize : int or (int, int)
+        Hexagons along x (and y), as in ax.hexbin.
+    extent : (xmin, xmax, ymin, ymax), optional
+        Taken from the first chunk if not given.
+    """
+
+    def __init__(self, gridsize=100, extent=None):
+        import math
+
+        self.gridsize = gridsize
+        if np.ndim(gridsize) == 0:
+            self.nx, self.ny = int(gridsize), int(gridsize / math.sqrt(3))
+        else:
+            self.nx, self.ny = (int(g) for g in gridsize)
+        self.extent = None
+        if extent is not None:
+            self._set_extent(extent)
+        # Two interleaved lattices of hexagon centers, as in ax.hexbin
+        self.counts1 = np.zeros((self.nx + 1) * (self.ny + 1), dtype=np.int64)
+        self.counts2 = np.zeros(self.nx * self.ny, dtype=np.int64)
+        self.n = self.outside = self.nan_count = 0
+
+    def _set_extent(self, extent):
+        xmin, xmax, ymin, ymax = (float(v) for v in extent)
+        self.extent = (xmin, xmax, ymin, ymax)
+        padding = 1.e-9 * (xmax - xmin)   # Same padding as ax.hexbin
+        self._xmin = xmin - padding
+        self._ymin = ymin
+        self._sx = (xmax + padding - self._xmin) / self.nx
+        self._sy = (ymax - ymin) / self.ny
+
+    def add(self, x, y):
+        """Fold one chunk of (x, y) pairs into the hexagon counts."""
+        from matplotlib.transforms import nonsingular
+
+        x, y, invalid = _finite_pairs(x, y)
+        self.nan_count += invalid
+        if len(x) == 0:
+            return self
+        if self.extent is None:
+            # As ax.hexbin without extent (singular ranges expanded)
+            self._set_extent(nonsingular(x.min(), x.max(), expander=0.1) +
+                             nonsingular(y.min(), y.max(), expander=0.1))
+        self.n += len(x)
+        nx1, ny1, nx2, ny2 = self.nx + 1, self.ny + 1, self.nx, self.ny
+        ix = (x - self._xmin) / self._sx
+        iy = (y - self._ymin) / self._sy
+        ix1 = np.round(ix).astype(np.intp)
+        iy1 = np.round(iy).astype(np.intp)
+        ix2 = np.floor(ix).astype(np.intp)
+        iy2 = np.floor(iy).astype(np.intp)
+        first = ((ix - ix1)**2 + 3.0 * (iy - iy1)**2 <
+                 (ix - ix2 - 0.5)**2 + 3.0 * (iy - iy2 - 0.5)**2)
+        # Flat indices plus one; out-of-range pairs go to position 0
+        i1 = np.where((0 <= ix1) & (ix1 < nx1) & (0 <= iy1) & (iy1 < ny1),
+                      ix1 * ny1 + iy1 + 1, 0)[first]
+        i2 = np.where((0 <= ix2) & (ix2 < nx2) & (0 <= iy2) & (iy2 < ny2),
+                      ix2 * ny2 + iy2 + 1, 0)[~first]
+        counts1 = np.bincount(i1, minlength=1 + len(self.counts1))
+        counts2 = np.bincount(i2, minlength=1 + len(self.counts2))
+        self.outside += int(counts1[0] + counts2[0])
+        self.counts1 += counts1[1:]
+        self.counts2 += counts2[1:]
+        return self
+
+    def merge(self, other):
+        """Add the counts of another accumulator with the same hexagons."""
+        if self.extent is None and other.extent is not None:
+            self._set_extent(other.extent)
+        elif other.extent is not None and (
+                other.extent != self.extent or
+                (other.nx, other.ny) != (self.nx, self.ny)):
+            raise ValueError('Only hexbins with the same gridsize and extent '
+                             'can be merged.')
+        self.counts1 += other.counts1
+        self.counts2 += other.counts2
+        self.n += other.n
+        self.outside += other.outside
+        self.nan_count += other.nan_count
+        return self
+
+    def __add__(self, other):
+        return HexbinAccumulator(self.gridsize).merge(self).merge(other)
+
+    def centers(self):
+        """(x, y, counts) of the hexagons holding at least one pair."""
+        nx1, ny1 = self.nx + 1, self.ny + 1
+        x1 = np.repeat(np.arange(nx1), ny1).astype(float)
+        y1 = np.tile(np.arange(ny1), nx1).astype(float)
+        x2 = np.repeat(np.arange(self.nx) + 0.5, self.ny)
+        y2 = np.tile(np.arange(self.ny) + 0.5, self.nx)
+        x = np.r_[x1, x2] * self._sx + self._xmin
+        y = np.r_[y1, y2] * self._sy + self._ymin
+        counts = np.r_[self.counts1, self.counts2]
+        keep = counts > 0
+        return x[keep], y[keep], counts[keep]
+
+    def draw(self, ax, mincnt=1, **kwargs):
+        """
+        Draw the counts like ax.hexbin(x, y, gridsize, extent, mincnt) with
+        all the pairs: ax.hexbin receives one point per non-empty hexagon,
+        weighted by its count. Returns the PolyCollection.
+        """
+        x, y, counts = self.centers()
+        keep = counts >= max(mincnt, 1)
+        return ax.hexbin(x[keep], y[keep], C=counts[keep],
+                         reduce_C_function=np.sum, gridsize=self.gridsize,
+                         extent=self.extent, mincnt=1, **kwargs)
+
+
+def array_chunks(*arrays, chunk=2**22):
+    """
+    Yield aligned slices of *arrays* (e.g. np.memmap or np.load(...,
+    mmap_mode='r') columns), *chunk* rows at a time: only one chunk is read
+    into memory at once.
+    """
+    for start in np.arange(0, len(arrays[0]), chunk):
+        yield tuple(np.asarray(a[start:start + chunk]) for a in arrays)
+
+
+def accumulate_2d(source, bins=100, range=None, hexagonal=False,
+                  accumulator=None):
+    """
+    2-D histogram (or hexbin with hexagonal=True; *bins* is then the
+    gridsize) of all the (x, y) chunks of *source*: a pair of arrays, an
+    iterable of (x, y) pairs (e.g. array_chunks of memory-mapped columns),
+    or a function returning one. Without *range* ((xmin, xmax), (ymin,
+    ymax)), it is found first if *source* is a function (read twice), else
+    taken from the first chunk.
+    """
+    start = time.perf_counter()
+    if isinstance(source, tuple) and len(source) == 2 and \
+            np.ndim(source[0]) > 0 and np.isscalar(source[0][0]):
+        source = array_chunks(*source)
+    if range is None and callable(source) and accumulator is None:
+        low, high = np.full(2, np.inf), np.full(2, -np.inf)
+        for x, y in source():
+            x, y, _ = _finite_pairs(x, y)
+            if len(x):
+                low = np.minimum(low, (x.min(), y.min()))
+                high = np.maximum(high, (x.max(), y.max()))
+        if np.isfinite(low).all():
+            range = ((low[0], high[0]), (low[1], high[1]))
+    if accumulator is not None:
+        hist = accumulator
+    elif hexagonal:
+        hist = HexbinAccumulator(bins, None if range is None else
+                                 tuple(range[0]) + tuple(range[1]))
+    else:
+        hist = Histogram2DAccumulator(bins, range)
+    outside = hist.outside
+    for x, y in (source() if callable(source) else source):
+        hist.add(x, y)
+    if range is None and hist.outside > outside:
+        warnings.warn(f'{hist.outside - outside} pairs fell outside the '
+                      'range taken from the first chunk; give range='
+                      '((xmin, xmax), (ymin, ymax)) to include them.')
+
+    seconds = time.perf_counter() - start
+    _last_stats.clear()
+    _last_stats.update(samples=hist.n, seconds=seconds,
+                       samples_per_s=hist.n / max(seconds, 1e-9))
+    return hist
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _normal_chunks(seed, n=50_000_000, chunk=2**22):
+    """Chunks of normal samples (mean 5, sigma 2) from one random stream."""
+    rng = np.random.default_rng(seed)
+    for begin in np.arange(0, n, chunk):
+        yield rng.normal(5.0, 2.0, min(chunk, n - begin))
+
+
+if __name__ == '__main__':
+    n = 50_000_000
+    data = np.concatenate(list(_normal_chunks(0, n)))
+    print(f'{n / 1e6:.0f} M samples, 30 bins:')
+
+    start = time.perf_counter()
+    counts, edges = np.histogram(data, bins=30)
+    mean, std = np.mean(data), np.std(data)
+    seconds = time.perf_counter() - start
+    print(f'  np.histogram + np.mean + np.std (in memory): {seconds:5.2f} s')
+
+    hist = accumulate((data[i:i + 2**22] for i in range(0, n, 2**22)),
+                      bins=30, range=(data.min(), data.max()))
+    print(f'  accumulate, chunks of 4 M samples:            '
+          f'{stats()["seconds"]:5.2f} s '
+          f'({stats()["samples_per_s"] / 1e6:.0f} M samples/s)')
+    assert np.array_equal(hist.counts, counts)
+    print(f'  same counts; mean {hist.mean:.12f} vs {mean:.12f}, '
+          f'std {hist.std:.12f} vs {std:.12f}')
+    del data
+
+    hist = parallel_accumulate(_normal_chunks, range(4), bins=30,
+                               range=(-5.0, 15.0))
+    print(f'  4 streams of {n / 1e6:.0f} M samples on '
+          f'{stats()["workers"]} process(es): {stats()["seconds"]:5.2f} s '
+          f'(generation included), mean {hist.mean:.4f}, std '
+          f'{hist.std:.4f}, {hist.underflow + hist.overflow} outside')
+
+    x, y = np.random.default_rng(1).normal(0.0, 1.0, (2, 1_000_000))
+    extent = (-4.0, 4.0, -4.0, 4.0)
+    pairs = array_chunks(x, y, chunk=100_000)
+    hist2d = accumulate_2d(pairs, bins=(80, 60), range=((-4, 4), (-4, 4)))
+    reference, _, _ = np.histogram2d(x, y, bins=(80, 60),
+                                     range=((-4, 4), (-4, 4)))
+    assert np.array_equal(hist2d.counts, reference)
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    hexbin = accumulate_2d(array_chunks(x, y, chunk=100_000), bins=50,
+                           range=((-4, 4), (-4, 4)), hexagonal=True)
+    drawn = hexbin.draw(ax).get_array()
+    expected = ax.hexbin(x, y, gridsize=50, extent=extent,
+                         mincnt=1).get_array()
+    assert np.array_equal(np.sort(drawn), np.sort(expected))
+    print('  2-D histogram and hexbin in chunks: same counts as '
+          'np.histogram2d and ax.hexbin')
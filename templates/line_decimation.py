@@ -0,0 +1,257 @@
+"""
+================================================================================
+PIXEL-AWARE DECIMATION OF VERY LONG LINE SERIES
+================================================================================
+A trace with 10^7 - 10^8 samples is drawn as a few thousand pixel columns:
+ax.plot(x, y) with all samples is slow to draw and makes huge PDF files,
+although most samples cannot change a single pixel.
+
+This module keeps only the samples that can:
+    - 'm4' (default): in every pixel column, the first, last, minimum and
+      maximum sample. The line drawn through them covers the same pixels
+      as the full line, up to a few edge pixels (see TOLERANCE below).
+    - 'lttb': Largest-Triangle-Three-Buckets, a fixed number of points that
+      keeps the visual shape. Smaller, but not pixel exact.
+
+The number of pixel columns is taken from the figure size, the axes position,
+the save DPI (300 by default, as in the templates) and the x-axis limits, so
+the number of points drawn, and the render time, no longer depends on the
+length of the input.
+
+USAGE:
+    from line_decimation import plot_decimated
+    plot_decimated(ax, x, y, 'r-', linewidth=2.0, label=r'sin($x$)',
+                   xlim=(0.0, 10.0))
+    # then style the axes as usual (same Line2D as ax.plot returns)
+
+TOLERANCE:
+    Pixel columns are aligned on the pixels of the saved image. Compared
+    with ax.plot of all samples at 300 DPI (10^6 noisy samples, linewidth 2):
+        m4,   no antialiasing:  ~0.03% of the line pixels differ
+        m4,   antialiasing:     ~0.5% of the line pixels differ (edge pixels)
+        lttb:                   ~4-5% of the line pixels differ
+    The differing pixels are isolated pixels on the line edges; Agg itself
+    simplifies long paths, so the full line is not an exact reference
+    either. Run `python line_decimation.py` to measure the difference and
+    the render times on your machine.
+
+NOTES:
+    - x must be sorted (time series); otherwise the data are drawn unchanged.
+    - NaN values still break the line, as with ax.plot: both methods keep
+      the first NaN of each pixel column or bucket.
+    - Zooming in an interactive window shows the decimated data: call
+      plot_decimated again with the new limits if you need the detail.
+================================================================================
+"""
+
+import numpy as np
+
+SAVE_DPI = 300
+
+
+# ============================================================================
+# NUMBER OF PIXEL COLUMNS
+# ============================================================================
+
+def pixel_columns(ax, dpi=SAVE_DPI):
+    """
+    Return (width, offset) of *ax* in pixels when the figure is saved at
+    *dpi*: the width, and where the left edge falls inside its first pixel.
+    """
+    fig = ax.get_figure()
+    position = ax.get_position()
+    left = position.x0 * fig.get_figwidth() * dpi
+    return position.width * fig.get_figwidth() * dpi, left - np.floor(left)
+
+
+# ============================================================================
+# DECIMATION METHODS (return indices of the samples to keep)
+# ============================================================================
+
+def _first_index(groups, mask):
+    """For each group, the index of the first sample where mask is True."""
+    where = np.flatnonzero(mask)
+    _, first = np.unique(groups[where], return_index=True)
+    return where[first]
+
+
+def column_extrema(column, y):
+    """
+    For samples already grouped by pixel column (*column* non-decreasing),
+    return the index of the first, last, minimum and maximum sample of each
+    column, the first NaN sample of each column that has one, and the
+    column number of each group.
+    """
+    starts = np.flatnonzero(np.r_[True, column[1:] != column[:-1]])
+    ends = np.r_[starts[1:], len(y)] - 1
+    ymin = np.fmin.reduceat(y, starts)
+    ymax = np.fmax.reduceat(y, starts)
+    group = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    return (starts, ends, _first_index(group, y == ymin[group]),
+            _first_index(group, y == ymax[group]),
+            _first_index(group, np.isnan(y)), column[starts])
+
+
+def m4_indices(x, y, width, xlim, offset=0.0):
+    """
+    Indices of the first, last, minimum and maximum sample of every pixel
+    column in *xlim*, plus the nearest sample outside each side of *xlim*
+    (so the line still leaves the axes at the right place). *width* is the
+    width of xlim in pixels, and *offset* the position of xlim[0] inside its
+    pixel, so that the columns match the pixels of the output.
+    """
+    x0, x1 = xlim
+    lo = int(np.searchsorted(x, x0, side='left'))
+    hi = int(np.searchsorted(x, x1, side='right'))
+    keep = [np.arange(max(lo - 1, 0), lo), np.arange(hi, min(hi + 1, len(x)))]
+    if hi > lo:
+        column = np.floor(offset + (x[lo:hi] - x0) * (width / (x1 - x0)))
+        # The last item is the column numbers, not sample indices
+        keep += [lo + i for i in column_extrema(column, y[lo:hi])[:-1]]
+    return np.unique(np.concatenate(keep))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: keep the first and last sample and, in
+    each of n_out - 2 buckets, the sample forming the largest triangle with
+    the sample kept in the previous bucket and the mean of the next bucket.
+    The first NaN of each bucket is kept too, so gaps are not bridged.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = bounds[i], bounds[i + 1]
+        if i + 2 < len(bounds):
+            nxt = slice(bounds[i + 1], bounds[i + 2])
+            cx, cy = np.mean(x[nxt]), np.nanmean(y[nxt])
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[start:stop] - y[a]) -
+                      (x[a] - x[start:stop]) * (cy - y[a]))
+        a = start + int(np.nanargmax(area)) if np.any(area == area) else start
+        kept[i + 1] = a
+    gaps = np.flatnonzero(np.isnan(y))
+    if len(gaps):
+        # The first NaN of each bucket, as in m4: the line still breaks
+        _, first = np.unique(np.searchsorted(bounds, gaps, side='right'),
+                             return_index=True)
+        kept = np.union1d(kept, gaps[first])
+    return kept
+
+
+def decimation_indices(x, y, width, xlim=None, method='m4', offset=0.0):
+    """
+    Return the indices of the samples of (x, y) that can be seen when
+    xlim[0]..xlim[1] (default: the data range) spans *width* pixels.
+    All samples are kept for short or unsorted series.
+    """
+    n_columns = int(np.ceil(width + offset))
+    if len(x) <= 4 * n_columns or np.any(np.diff(x) < 0):
+        return np.arange(len(x))   # Already small enough, or not a series
+    if xlim is None:
+        xlim = (x[0], x[-1])
+    if method == 'm4':
+        return m4_indices(x, y, width, xlim, offset)
+    if method == 'lttb':
+        lo, hi = np.searchsorted(x, xlim)
+        lo, hi = max(lo - 1, 0), min(hi + 1, len(x))
+        return lo + lttb_indices(x[lo:hi], y[lo:hi], 2 * n_columns)
+    raise ValueError(f"method must be 'm4' or 'lttb', not {method!r}")
+
+
+def decimate(x, y, width, xlim=None, method='m4'):
+    """Return (x, y) reduced with decimation_indices()."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    keep = decimation_indices(x, y, width, xlim, method)
+    return x[keep], y[keep]
+
+
+# ============================================================================
+# PLOTTING
+# ============================================================================
+
+def plot_decimated(ax, x, y, *args, xlim=None, dpi=SAVE_DPI, method='m4',
+                   **kwargs):
+    """
+    ax.plot(x, y, *args, **kwargs) with only the samples visible at *dpi*.
+
+    *xlim* is the x range the figure will show (default: the data range).
+    For a logarithmic x axis, call ax.set_xscale('log') first: pixel columns
+    are then equally spaced in log(x). Returns the list of Line2D.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(x) == 0:
+        return ax.plot(x, y, *args, **kwargs)
+    if xlim is None:
+        xlim = (np.nanmin(x), np.nanmax(x))
+    # Pixel columns are equally spaced in the axis scale (e.g. log10(x))
+    transform = ax.xaxis.get_transform()
+    tx = transform.transform(x.reshape(-1, 1)).ravel()
+    tlim = transform.transform(np.reshape(xlim, (-1, 1))).ravel()
+    width, offset = pixel_columns(ax, dpi)
+    keep = decimation_indices(tx, y, width, tlim, method, offset)
+    return ax.plot(x[keep], y[keep], *args, **kwargs)
+
+
+# ============================================================================
+# DEMO: PIXEL DIFFERENCE AND RENDER TIME
+# ============================================================================
+
+def _render(x, y, decimated, method='m4', antialiased=True):
+    """Save a line_plot-like figure to PNG at 300 DPI; return (pixels, s)."""
+    import io
+    import time
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(6.2, 6.0), dpi=50)
+    plot = plot_decimated if decimated else (
+        lambda ax, x, y, *a, xlim=None, method=None, **k: ax.plot(x, y, *a,
+                                                                   **k))
+    plot(ax, x, y, 'r-', linewidth=2.0, xlim=(0.0, 10.0), method=method,
+         antialiased=antialiased)
+    ax.set_xlim(0.0, 10.0)
+    ax.set_ylim(-1.5, 1.5)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=SAVE_DPI)
+    plt.close(fig)
+    seconds = time.perf_counter() - start
+    buffer.seek(0)
+    return plt.imread(buffer), seconds
+
+
+if __name__ == '__main__':
+    import matplotlib
+    matplotlib.use('Agg')
+    rng = np.random.default_rng(0)
+
+    def series(n):
+        x = np.linspace(0, 10, n)
+        return x, np.sin(x) + 0.3 * rng.standard_normal(n)
+
+    print('Pixel difference with the full line (10^6 samples, 300 DPI):')
+    x, y = series(10**6)
+    for antialiased in (False, True):
+        full, _ = _render(x, y, False, antialiased=antialiased)
+        for method in ('m4', 'lttb'):
+            small, _ = _render(x, y, True, method, antialiased)
+            diff = np.abs(full - small).max(axis=-1)
+            line = (full[..., :3] < 0.999).any(axis=-1)
+            print(f'  {method:4s} antialiased={antialiased!s:5s}: '
+                  f'{100 * (diff > 0).sum() / line.sum():6.2f}% of the line '
+                  f'pixels differ, max difference {100 * diff.max():5.1f}%')
+
+    print('Render time (decimation + savefig at 300 DPI):')
+    for n in (10**5, 10**6, 10**7):
+        x, y = series(n)
+        _, decimated = _render(x, y, True)
+        full = _render(x, y, False)[1] if n <= 10**6 else float('nan')
+        print(f'  n = {n:>9d}: m4 {decimated:6.2f} s   full {full:6.2f} s')
@@ -0,0 +1,185 @@
+"""
+================================================================================
+SHARED PUBLICATION STYLE (TICKS, TICK LABELS, FONTS)
+================================================================================
+The templates used to style every axis by hand:
+
+    for tick in ax.get_xticklabels():
+        tick.set_fontsize(r * fs)
+    ...
+    ax.tick_params(which='major', direction='in', length=10, width=1.5, ...)
+    ax.tick_params(which='minor', direction='in', length=5, width=1.5, ...)
+    ax.tick_params(which='both', top=True, right=True)
+
+The loops create every tick label and change them one by one, so the cost
+grows with the number of axes AND ticks (and the labels are set only for the
+ticks that exist at that moment).
+
+This module replaces them with two cheaper options:
+    - use(fs, r):  load publication.mplstyle (+ your font sizes) into
+                   rcParams BEFORE creating the figure. New axes are born
+                   styled: no styling call at all afterwards.
+    - apply_style(fig, fs, r):  style a figure that already exists with a few
+                   Axis-level settings per axis, whatever the number of ticks.
+                   Later ticks (zooming, new limits) inherit the settings.
+
+USAGE:
+    from publication_style import apply_style
+    fig, ax = plt.subplots()
+    ...
+    apply_style(fig, fs=fs, r=r)
+
+    Micro-benchmark on a 10x10 grid of subplots:
+    python publication_style.py
+================================================================================
+"""
+
+from pathlib import Path
+
+import matplotlib as mpl
+
+STYLE_FILE = Path(__file__).resolve().with_name('publication.mplstyle')
+
+
+# ============================================================================
+# STYLE BEFORE CREATING THE FIGURE (rcParams)
+# ============================================================================
+
+def style_params(fs=24.0, r=0.9, major_length=10, minor_length=5, width=1.5,
+                 colors='k', top=True, right=True, minor=True):
+    """Return the rcParams equivalent of apply_style() with these settings."""
+    params = {'font.size': fs, 'axes.labelsize': fs,
+              'legend.fontsize': r * fs}
+    for axis in ('xtick', 'ytick'):
+        params.update({
+            f'{axis}.labelsize': r * fs,
+            f'{axis}.direction': 'in',
+            f'{axis}.color': colors,
+            f'{axis}.major.size': major_length,
+            f'{axis}.minor.size': minor_length,
+            f'{axis}.major.width': width,
+            f'{axis}.minor.width': width,
+            f'{axis}.minor.visible': minor})
+    params['xtick.top'] = top
+    params['ytick.right'] = right
+    return params
+
+
+def use(fs=24.0, r=0.9, **kwargs):
+    """
+    Load publication.mplstyle and the font sizes into rcParams. Every figure
+    created afterwards gets the template style without any further call.
+    Keyword arguments are those of apply_style().
+    """
+    mpl.style.use(STYLE_FILE)
+    mpl.rcParams.update(style_params(fs, r, **kwargs))
+
+
+def context(fs=24.0, r=0.9, **kwargs):
+    """Same as use(), limited to a with-block."""
+    return mpl.rc_context(style_params(fs, r, **kwargs), fname=STYLE_FILE)
+
+
+# ============================================================================
+# STYLE AN EXISTING FIGURE
+# ============================================================================
+
+def apply_style(fig, fs=24.0, r=0.9, major_length=10, minor_length=5,
+                width=1.5, colors='k', top=True, right=True, minor=True,
+                axes=None):
+    """
+    Give the axes of *fig* the template tick style.
+
+    Each axis gets three tick_params calls, which update the Axis defaults
+    used by every tick (existing and future ones). No tick label is created
+    or visited, so the cost does not depend on the number of ticks.
+
+    Parameters
+    ----------
+    fig : Figure
+    fs, r : float
+        Font size and tick-label ratio of the templates (labels = r * fs).
+    major_length, minor_length, width : float
+        Tick sizes in points.
+    colors : color
+        Tick and tick-label color.
+    top, right : bool
+        Also draw ticks on the top / right spines.
+    minor : bool
+        Turn minor ticks on.
+    axes : list of Axes, optional
+        Only style these axes. Colorbars are skipped by default since the
+        templates size their labels separately (cbar.ax.tick_params(...)).
+    """
+    if axes is None:
+        axes = [ax for ax in fig.axes if not hasattr(ax, '_colorbar')]
+    for ax in axes:
+        ax.tick_params(which='both', direction='in', width=width,
+                       colors=colors, labelsize=r * fs, top=top, right=right)
+        ax.tick_params(which='major', length=major_length)
+        ax.tick_params(which='minor', length=minor_length)
+        if minor:
+            ax.minorticks_on()
+
+
+# ============================================================================
+# MICRO-BENCHMARK: 10 x 10 SUBPLOT GRID
+# ============================================================================
+
+def _style_with_loops(fig, fs, r):
+    """The per-tick styling formerly repeated in every template."""
+    for ax in fig.axes:
+        ax.minorticks_on()
+        ax.tick_params(which='major', direction='in', length=8, width=1.2)
+        ax.tick_params(which='minor', direction='in', length=4, width=1.2)
+        ax.tick_params(which='both', top=True, right=True)
+        for tick in ax.get_xticklabels():
+            tick.set_fontsize(r * fs)
+        for tick in ax.get_yticklabels():
+            tick.set_fontsize(r * fs)
+
+
+def benchmark(rows=10, cols=10, repeat=5):
+    """
+    Return the best time (s) of creating and styling a rows x cols grid of
+    subplots with each method, and of creating it without any styling.
+    """
+    import time
+    import matplotlib.pyplot as plt
+
+    fs, r = 24.0, 0.9
+    sizes = dict(major_length=8, minor_length=4, width=1.2)
+    methods = {
+        'no styling (reference)': (None, None),
+        'per-tick loops (before)': (None,
+                                    lambda fig: _style_with_loops(fig, fs, r)),
+        'apply_style(fig)': (None, lambda fig: apply_style(fig, fs, r,
+                                                            **sizes)),
+        'use() before subplots': (lambda: use(fs, r, **sizes), None),
+    }
+    timings = {}
+    for name, (before, after) in methods.items():
+        best = float('inf')
+        for _ in range(repeat):
+            with mpl.rc_context():
+                start = time.perf_counter()
+                if before is not None:
+                    before()
+                fig, axes = plt.subplots(rows, cols, figsize=(3 * cols,
+                                                              3 * rows))
+                if after is not None:
+                    after(fig)
+                best = min(best, time.perf_counter() - start)
+            plt.close(fig)
+        timings[name] = best
+    return timings
+
+
+if __name__ == '__main__':
+    mpl.use('Agg')
+    timings = benchmark()
+    reference = timings.pop('no styling (reference)')
+    print('Styling cost of a 10 x 10 subplot grid (best of 5, without the '
+          f'{1000 * reference:.0f} ms needed to create the axes):')
+    for name, seconds in timings.items():
+        print(f'  {name:26s} {1000 * (seconds - reference):8.1f} ms')
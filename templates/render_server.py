@@ -0,0 +1,429 @@
+"""
+================================================================================
+WARM RENDER SERVER FOR FIGURE JOBS
+================================================================================
+Running a template as a script pays for the matplotlib import, the font
+manager setup, the LaTeX warm-up and the backend initialization before a
+single line is drawn. For a few figures this does not matter; for thousands
+of figures per night, startup dominates.
+
+This module keeps a pool of worker processes in which all of that is already
+done, and accepts figure jobs over a local UNIX socket.
+
+A JOB is a JSON object:
+    {
+        "template":  "template_contour_plot",      # name or path
+        "data":      "/path/to/data.csv",          # optional
+        "overrides": {"lines.linewidth": 3},       # optional rcParams
+        "output":    "/path/to/contour.pdf"        # where to save
+    }
+The data file path is passed to the template through the TEMPLATE_DATA_FILE
+environment variable, read by data_file() (columnar_loader.py). A job with
+"data" for a template that never calls data_file() (its data_file lines
+still commented out) is rejected instead of drawing the sample data.
+rcParams overrides are applied when the template
+creates its figure, i.e. after the template's own rc setup. The template's
+plt.savefig() call is redirected to "output" (a second figure of the same
+template is saved as <output>_2.<ext>, and so on).
+
+The REPLY is a JSON object:
+    {"status": "ok", "outputs": [...], "seconds": 0.41, "worker": 12345}
+or  {"status": "error", "error": "...", "traceback": "..."}
+
+USAGE:
+    Start the server (pre-warms 4 workers):
+    python render_server.py serve --socket /tmp/figures.sock --workers 4
+
+    Submit a job:
+    python render_server.py submit template_contour_plot -o contour.pdf \\
+        --socket /tmp/figures.sock --rc lines.linewidth=3
+
+    From Python:
+    from render_server import submit
+    reply = submit({'template': 'template_heatmap', 'output': 'a.pdf'},
+                   socket_path='/tmp/figures.sock')
+
+Protocol: one JSON object per line. Besides jobs, a line may hold
+{"jobs": [...]} (answered with a list of replies, rendered in parallel),
+{"cmd": "ping"}, {"cmd": "stats"} or {"cmd": "shutdown"}.
+================================================================================
+"""
+
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import tokenize
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+TEMPLATE_DIR = Path(__file__).resolve().parent
+DEFAULT_SOCKET = '/tmp/template_render.sock'
+
+# Options given to the server, forwarded to every worker at start-up
+WARM_OPTIONS = {'tex_cache': False, 'tex_batch': False, 'tex_format': False}
+
+_compiled_templates = {}   # path -> (mtime, code, reads data), per worker
+
+
+# ============================================================================
+# WORKER SIDE
+# ============================================================================
+
+def _warm_worker(options):
+    """
+    Initialize a worker process: import matplotlib, load the font manager,
+    initialize the Agg backend and (if available) warm up LaTeX.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib import font_manager
+    import numpy  # noqa: F401  (imported once, used by every template)
+
+    sys.path.insert(0, str(TEMPLATE_DIR))
+    if options.get('tex_cache'):
+        import tex_cache
+        tex_cache.install()
+    if options.get('tex_format'):
+        import tex_format
+        tex_format.install()
+    if options.get('tex_batch'):
+        import tex_batch
+        tex_batch.install()
+
+    font_manager.findfont('Times New Roman')   # Loads the font list
+    fig, ax = plt.subplots()
+    ax.plot([0, 1], [0, 1])
+    fig.canvas.draw()                           # Backend initialization
+    plt.close(fig)
+
+    if options.get('warm_latex', True):
+        try:
+            with matplotlib.rc_context({
+                    'text.usetex': True,
+                    'text.latex.preamble': '\\usepackage{times}\n'
+                                           '\\usepackage{newtxmath}\n'
+                                           '\\usepackage{siunitx}\n',
+                    'font.family': 'serif'}):
+                fig, ax = plt.subplots()
+                ax.set_xlabel(r'$x$ variable (units)')
+                fig.canvas.draw()
+                plt.close(fig)
+        except RuntimeError:
+            pass   # No LaTeX installed: templates will report it themselves
+
+
+def _ping(hold=0.0):
+    time.sleep(hold)   # Keep this worker busy so the next ping starts another
+    return os.getpid()
+
+
+def _calls_data_file(source):
+    """True if *source* calls data_file() outside comments and strings."""
+    tokens = [t for t in tokenize.generate_tokens(io.StringIO(source).readline)
+              if t.type not in (tokenize.COMMENT, tokenize.NL,
+                                tokenize.NEWLINE, tokenize.INDENT,
+                                tokenize.DEDENT)]
+    return any(a.type == tokenize.NAME and a.string == 'data_file' and
+               b.string == '(' for a, b in zip(tokens, tokens[1:]))
+
+
+def _template_code(path):
+    """
+    Return the compiled code of a template (recompiled when it changes)
+    and whether it calls data_file().
+    """
+    mtime = os.path.getmtime(path)
+    cached = _compiled_templates.get(path)
+    if cached is None or cached[0] != mtime:
+        source = Path(path).read_text(encoding='utf-8')
+        cached = (mtime, compile(source, str(path), 'exec'),
+                  _calls_data_file(source))
+        _compiled_templates[path] = cached
+    return cached[1:]
+
+
+def resolve_template(name):
+    """Return the path of a template given as a name or a path."""
+    path = Path(name)
+    if path.suffix != '.py':
+        path = path.with_suffix('.py')
+    if not path.is_absolute() and not path.exists():
+        path = TEMPLATE_DIR / path
+    if not path.exists():
+        raise FileNotFoundError(f'template not found: {name}')
+    return path.resolve()
+
+
+def run_job(job):
+    """
+    Run one template headlessly and return the reply dictionary.
+
+    Besides the keys documented at the top of this file, *job* may contain
+    "workdir": the folder the template runs in. Without "output", the files
+    keep the names chosen by the template and are written to "workdir".
+    With "thumbnail_dir", every saved figure is also written there as a PNG
+    thumbnail at "thumbnail_dpi" (default 40), from the same figure object.
+    """
+    import matplotlib
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    try:
+        path = resolve_template(job['template'])
+        code, reads_data = _template_code(path)
+        if job.get('data') and not reads_data:
+            raise ValueError(f'{path.name} does not read a data file: '
+                             'uncomment its data_file() lines (see '
+                             'columnar_loader.py) or leave out "data".')
+        output = job.get('output')
+        if output is not None:
+            output = os.path.abspath(output)   # Same file for any workdir
+        overrides = job.get('overrides') or {}
+        workdir = job.get('workdir') or (
+            os.path.dirname(output) if output else os.getcwd())
+        os.makedirs(workdir, exist_ok=True)
+
+        outputs = []
+        thumbnails = []
+        thumbnail_dir = job.get('thumbnail_dir')
+        saved = {name: getattr(plt, name) for name in ('savefig', 'show',
+                                                       'figure')}
+
+        def savefig(fname, *args, **kwargs):
+            if output is not None:
+                base, ext = os.path.splitext(output)
+                fname = output if not outputs else \
+                    f'{base}_{len(outputs) + 1}{ext}'
+            fname = os.path.abspath(os.path.join(workdir, fname))
+            saved['savefig'](fname, *args, **kwargs)
+            outputs.append(fname)
+            if thumbnail_dir is not None:
+                os.makedirs(thumbnail_dir, exist_ok=True)
+                stem = os.path.splitext(os.path.basename(fname))[0]
+                thumb = os.path.join(thumbnail_dir, stem + '.png')
+                layout = {key: kwargs[key] for key in ('bbox_inches',
+                                                       'pad_inches')
+                          if key in kwargs}
+                plt.gcf().savefig(thumb, dpi=job.get('thumbnail_dpi', 40),
+                                  **layout)
+                thumbnails.append(thumb)
+
+        def figure(*args, **kwargs):
+            # Overrides win over the template's own rc setup
+            matplotlib.rcParams.update(overrides)
+            return saved['figure'](*args, **kwargs)
+
+        env_before = os.environ.get('TEMPLATE_DATA_FILE')
+        if job.get('data'):
+            os.environ['TEMPLATE_DATA_FILE'] = os.path.abspath(job['data'])
+        cwd = os.getcwd()
+        plt.savefig = savefig
+        plt.show = lambda *args, **kwargs: None   # Never block a worker
+        plt.figure = figure
+        try:
+            with matplotlib.rc_context():
+                os.chdir(workdir)
+                exec(code, {'__name__': '__main__', '__file__': str(path)})
+        finally:
+            os.chdir(cwd)
+            for name, function in saved.items():
+                setattr(plt, name, function)
+            plt.close('all')
+            if env_before is None:
+                os.environ.pop('TEMPLATE_DATA_FILE', None)
+            else:
+                os.environ['TEMPLATE_DATA_FILE'] = env_before
+    except Exception as exc:
+        return {'status': 'error', 'error': f'{type(exc).__name__}: {exc}',
+                'traceback': traceback.format_exc(),
+                'seconds': time.perf_counter() - start, 'worker': os.getpid()}
+    return {'status': 'ok', 'outputs': outputs, 'thumbnails': thumbnails,
+            'seconds': time.perf_counter() - start, 'worker': os.getpid()}
+
+
+# ============================================================================
+# SERVER SIDE
+# ============================================================================
+
+class RenderServer(socketserver.ThreadingMixIn,
+                   socketserver.UnixStreamServer):
+    """
+    UNIX socket server dispatching figure jobs to pre-warmed workers.
+
+    Parameters
+    ----------
+    socket_path : str
+        Path of the UNIX socket to create.
+    workers : int, optional
+        Number of worker processes (default: number of CPUs).
+    options : dict, optional
+        Worker options: tex_cache, tex_batch, tex_format (install the
+        corresponding helper modules) and warm_latex (default True).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, workers=None,
+                 options=None):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _JobHandler)
+        self.socket_path = socket_path
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=get_context('spawn'),
+            initializer=_warm_worker,
+            initargs=(dict(WARM_OPTIONS, **(options or {})),))
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Start all workers now, so the first jobs do not pay for it."""
+        futures = [self.pool.submit(_ping, 0.5) for _ in range(self.workers)]
+        return sorted({f.result() for f in futures})
+
+    def render(self, jobs):
+        """Run *jobs* on the pool and return the replies in order."""
+        start = time.perf_counter()
+        futures = [self.pool.submit(run_job, job) for job in jobs]
+        replies = [f.result() for f in futures]
+        with self._lock:
+            for reply in replies:
+                if reply['status'] == 'ok':
+                    self.jobs_done += 1
+                else:
+                    self.jobs_failed += 1
+        for reply in replies:
+            reply['wall_seconds'] = time.perf_counter() - start
+        return replies
+
+    def stats(self):
+        return {'workers': self.workers, 'jobs_done': self.jobs_done,
+                'jobs_failed': self.jobs_failed,
+                'uptime': time.time() - self.started}
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as exc:
+                self._reply({'status': 'error', 'error': f'bad JSON: {exc}'})
+                continue
+            command = request.get('cmd')
+            if command == 'ping':
+                self._reply({'status': 'ok'})
+            elif command == 'stats':
+                self._reply(dict(self.server.stats(), status='ok'))
+            elif command == 'shutdown':
+                self._reply({'status': 'ok'})
+                threading.Thread(target=self.server.shutdown).start()
+                return
+            elif 'jobs' in request:
+                self._reply(self.server.render(request['jobs']))
+            else:
+                self._reply(self.server.render([request])[0])
+
+    def _reply(self, message):
+        self.wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+def serve(socket_path=DEFAULT_SOCKET, workers=None, options=None):
+    """Start a RenderServer and serve until a shutdown command arrives."""
+    server = RenderServer(socket_path, workers, options)
+    pids = server.warm_up()
+    print(f'Render server on {socket_path} with {len(pids)} warm workers')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+# ============================================================================
+# CLIENT SIDE
+# ============================================================================
+
+def submit(request, socket_path=DEFAULT_SOCKET, timeout=None):
+    """
+    Send one job (or {"jobs": [...]}, or a command) and return the reply.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as reply:
+            return json.loads(reply.readline())
+
+
+def _parse_rc(items):
+    overrides = {}
+    for item in items:
+        key, _, value = item.partition('=')
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return overrides
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_serve = sub.add_parser('serve', help='start the render server')
+    p_serve.add_argument('--socket', default=DEFAULT_SOCKET)
+    p_serve.add_argument('--workers', type=int, default=None)
+    p_serve.add_argument('--tex-cache', action='store_true',
+                         help='install tex_cache.py in every worker')
+    p_serve.add_argument('--tex-batch', action='store_true',
+                         help='install tex_batch.py in every worker')
+    p_serve.add_argument('--tex-format', action='store_true',
+                         help='install tex_format.py in every worker')
+
+    p_submit = sub.add_parser('submit', help='submit one figure job')
+    p_submit.add_argument('template')
+    p_submit.add_argument('-o', '--output', required=True)
+    p_submit.add_argument('--data', default=None)
+    p_submit.add_argument('--rc', nargs='*', default=[],
+                          help='rcParams overrides as key=value')
+    p_submit.add_argument('--socket', default=DEFAULT_SOCKET)
+
+    p_stop = sub.add_parser('shutdown', help='stop the render server')
+    p_stop.add_argument('--socket', default=DEFAULT_SOCKET)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args.socket, args.workers,
+              {'tex_cache': args.tex_cache, 'tex_batch': args.tex_batch,
+               'tex_format': args.tex_format})
+    elif args.command == 'submit':
+        job = {'template': args.template,
+               'output': os.path.abspath(args.output),
+               'data': os.path.abspath(args.data) if args.data else None,
+               'overrides': _parse_rc(args.rc)}
+        print(json.dumps(submit(job, args.socket), indent=2))
+    else:
+        print(json.dumps(submit({'cmd': 'shutdown'}, args.socket)))
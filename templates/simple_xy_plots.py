@@ -31,6 +31,9 @@ import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+from publication_style import apply_style  # Shared tick style (this folder)
+from columnar_loader import load_columns, data_file  # Fast loader (this folder)
+from line_decimation import plot_decimated  # Long series (this folder)
 
 # ============================================================================
 # SETUP: LaTeX rendering and fonts for publication-quality figures
@@ -48,15 +51,19 @@ matplotlib.rcParams['font.family'] = "serif"
 directory = os.getcwd()
 
 # Option 1: Load from file
-fname = 'your_data_file.dat'  # Update this path
-
-# Try to load data from file
-try:
-    A = np.genfromtxt(fname, delimiter=',')
+# (data_file() returns the file given to render_server.py/build_gallery.py,
+# if any, and this path otherwise)
+fname = data_file('your_data_file.dat')  # Update this path
+
+# Load data from file: only the plotted columns are read, in parallel for
+# large files. Empty/invalid fields become NaN (dropna=True removes them).
+# Add header=True to skip a header line (and select columns by name),
+# or dtype=np.float32 to halve the memory of very large files.
+if os.path.exists(fname):
+    x_data, y_data = load_columns(fname, usecols=(0, 1), delimiter=',',
+                                  verbose=True)
     print(f"Loaded data from {fname}")
-    x_data = A[:, 0]  # First column as x
-    y_data = A[:, 1]  # Second column as y
-except:
+else:
     # Option 2: Generate sample data if file not found
     print(f"Warning: {fname} not found. Generating example data...")
     x_data = np.linspace(0, 10, 100)
@@ -76,8 +83,9 @@ lwidth = 2.0  # Line width
 # Create figure
 fig, ax = plt.subplots(figsize=(6.5, 6.0), dpi=100)
 
-# Plot x vs y
-ax.plot(x_data, y_data, 'b', linewidth=lwidth)
+# Plot x vs y (for long files, only the samples that can change a pixel
+# at 300 DPI are drawn; same as ax.plot(x_data, y_data, 'b', ...))
+plot_decimated(ax, x_data, y_data, 'b', linewidth=lwidth)
 
 # Set axis limits (adjust based on your data)
 ax.set_xlim(x_data.min(), x_data.max())
@@ -90,19 +98,12 @@ ax.set_ylabel(r'Y variable (units)', color='k', fontsize=fs)
 # Enable minor ticks
 ax.minorticks_on()
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Tick parameters: inward pointing, major=10pt, minor=5pt
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=False, right=False)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt) and
+# minor ticks: see publication_style.py
+apply_style(fig, fs=fs, r=r, top=False, right=False)
 
 # if you want ticks on both right and top axis as well.
-# ax.tick_params(which='both', top=True, right=True)
+# apply_style(fig, fs=fs, r=r)
 
 # Save figure
 plt.savefig(figname, bbox_inches='tight', dpi=300)
@@ -125,9 +126,9 @@ y_data2 = np.cos(x_data)
 y_data3 = np.sin(x_data) * 0.5
 
 # Plot multiple lines with different colors
-ax.plot(x_data, y_data1, 'r', linewidth=lwidth, label=r'Data 1')
-ax.plot(x_data, y_data2, 'b', linewidth=lwidth, label=r'Data 2')
-ax.plot(x_data, y_data3, 'g', linewidth=lwidth, label=r'Data 3')
+plot_decimated(ax, x_data, y_data1, 'r', linewidth=lwidth, label=r'Data 1')
+plot_decimated(ax, x_data, y_data2, 'b', linewidth=lwidth, label=r'Data 2')
+plot_decimated(ax, x_data, y_data3, 'g', linewidth=lwidth, label=r'Data 3')
 
 # Set axis limits
 ax.set_xlim(x_data.min(), x_data.max())
@@ -139,16 +140,9 @@ ax.set_ylabel(r'Y variable (units)', color='k', fontsize=fs)
 # Enable minor ticks
 ax.minorticks_on()
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Tick parameters
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=False, right=False)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt) and
+# minor ticks: see publication_style.py
+apply_style(fig, fs=fs, r=r, top=False, right=False)
 
 # Add legend
 ax.legend(loc='upper right', shadow=False, fontsize=r*fs, frameon=False,
@@ -184,16 +178,9 @@ ax.set_ylabel(r'Y variable (units)', color='k', fontsize=fs)
 # Enable minor ticks
 ax.minorticks_on()
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Tick parameters
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=False, right=False)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt) and
+# minor ticks: see publication_style.py
+apply_style(fig, fs=fs, r=r, top=False, right=False)
 
 # Add legend
 ax.legend(loc='best', shadow=False, fontsize=r*fs, frameon=False)
@@ -235,16 +222,9 @@ ax.set_ylabel(r'Y variable (units)', color='k', fontsize=fs)
 # Enable minor ticks
 ax.minorticks_on()
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Tick parameters
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=False, right=False)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt) and
+# minor ticks: see publication_style.py
+apply_style(fig, fs=fs, r=r, top=False, right=False)
 
 # Add legend
 ax.legend(loc='best', shadow=False, fontsize=r*fs, frameon=False)
@@ -267,7 +247,7 @@ figname = 'xy_custom_ticks.pdf'
 fig, ax = plt.subplots(figsize=(6.5, 6.0), dpi=100)
 
 # Plot data
-ax.plot(x_data, y_data, 'k', linewidth=lwidth)
+plot_decimated(ax, x_data, y_data, 'k', linewidth=lwidth, xlim=(0, 10))
 
 # Custom tick positions
 x_ticks = np.linspace(x_data.min(), x_data.max(), 6)
@@ -287,16 +267,9 @@ ax.set_ylabel(r'Y variable (units)', color='k', fontsize=fs)
 # Enable minor ticks
 ax.minorticks_on()
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Tick parameters
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=False, right=False)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt) and
+# minor ticks: see publication_style.py
+apply_style(fig, fs=fs, r=r, top=False, right=False)
 
 # Add reference lines (optional)
 ax.axhline(y=0, color='gray', linestyle='--', linewidth=1, alpha=0.5)
@@ -317,9 +290,7 @@ TO CUSTOMIZE FOR YOUR DATA:
 1. LOAD YOUR DATA:
    Option A - From file:
    fname = 'your_data.csv'
-   A = np.genfromtxt(fname, delimiter=',')
-   x_data = A[:, 0]
-   y_data = A[:, 1]
+   x_data, y_data = load_columns(fname, usecols=(0, 1))
    
    Option B - Create arrays:
    x_data = np.array([1, 2, 3, 4, 5])
@@ -0,0 +1,273 @@
+"""
+================================================================================
+OUT-OF-CORE LINE PLOTS FROM FILES LARGER THAN RAM
+================================================================================
+The line templates need the full x and y arrays in memory before calling
+ax.plot. Long recordings do not fit.
+
+This module reads the data chunk by chunk (a generator) and folds every
+chunk into a per-pixel envelope: for each pixel column of the final axes,
+the first, last, minimum and maximum sample. Only the envelope is kept and
+drawn, so the memory used depends on the output resolution, not on the size
+of the file. The drawn line covers the same pixels as ax.plot with all the
+samples (same method as line_decimation.py).
+
+USAGE:
+    from streaming_lines import stream_plot, iter_file
+    fig, ax = plt.subplots(figsize=(fig_width, fig_height), dpi=dpi)
+    stream_plot(ax, iter_file('recording.csv', usecols=(0, 1)),
+                'r-', linewidth=linewidth, label=r'Signal',
+                xlim=(0.0, 3600.0))
+    # then style the axes as in template_line_plot.py
+
+    Any iterable of (x, y) chunks works, e.g. a generator reading an HDF5
+    file or a socket. Without xlim, pass a function returning a new iterator
+    (e.g. lambda: iter_file(...)): the data are then read twice, once to find
+    the x range.
+
+    Peak memory and rows/s on one of your files:
+    python streaming_lines.py recording.csv 0 1
+================================================================================
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from columnar_loader import _parse, _read, byte_ranges
+from line_decimation import SAVE_DPI, column_extrema, pixel_columns
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+_last_stats = {}
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None if unknown)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def stats():
+    """Return rows, time, rows/s and peak memory of the last stream_plot()."""
+    return dict(_last_stats)
+
+
+# ============================================================================
+# READING A FILE CHUNK BY CHUNK
+# ============================================================================
+
+def iter_file(fname, usecols=(0, 1), dtype=float, delimiter=',', skiprows=0,
+              comments='#', chunk_mb=8.0):
+    """
+    Yield the columns *usecols* of a delimited file, about *chunk_mb* of text
+    at a time (a tuple of 1-D arrays per chunk). Reading a chunk needs a few
+    times *chunk_mb* of memory, whatever the size of the file.
+    """
+    start = 0
+    with open(fname, 'rb') as f:
+        for _ in range(skiprows):
+            f.readline()
+        start = f.tell()
+    usecols = list(usecols)
+    dtypes = [np.dtype(dtype)] * len(usecols)
+    for begin, end in byte_ranges(fname, start, int(chunk_mb * 2**20)):
+        yield tuple(_parse(_read(fname, begin, end), usecols, dtypes,
+                           delimiter, comments))
+
+
+# ============================================================================
+# PER-PIXEL ENVELOPE
+# ============================================================================
+
+class PixelEnvelope:
+    """
+    First, last, minimum and maximum sample of every pixel column between
+    xlim[0] and xlim[1], updated chunk by chunk.
+
+    Parameters
+    ----------
+    width : float
+        Width of xlim in pixels.
+    xlim : (float, float)
+        x range of the axes (in the axis scale, e.g. log10(x) for log axes).
+    offset : float
+        Position of xlim[0] inside its pixel.
+    """
+
+    def __init__(self, width, xlim, offset=0.0):
+        self.width = width
+        self.xlim = tuple(float(v) for v in xlim)
+        self.offset = offset
+        n = int(np.ceil(width + offset))
+        # Per column: x and y of the first, last, min and max samples
+        self.x = np.full((4, n), np.nan)
+        self.y = np.full((4, n), np.nan)
+        self.seen = np.zeros(n, dtype=bool)
+        # Nearest samples left and right of the axes, and NaN gaps
+        self.outside = [(-np.inf, np.nan), (np.inf, np.nan)]
+        self.gaps = set()
+        self.rows = 0
+
+    def add(self, x, y):
+        """Fold one chunk of samples into the envelope."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.rows += len(x)
+        x0, x1 = self.xlim
+        inside = (x >= x0) & (x <= x1)
+        for side, mask in ((0, x < x0), (1, x > x1)):
+            if mask.any():
+                i = (np.argmax if side == 0 else np.argmin)(
+                    np.where(mask, x, -np.inf if side == 0 else np.inf))
+                best = self.outside[side][0]
+                if (x[i] > best) if side == 0 else (x[i] < best):
+                    self.outside[side] = (x[i], y[i])
+        x, y = x[inside], y[inside]
+        if len(x) == 0:
+            return
+        column = np.floor(self.offset + (x - x0) * (self.width / (x1 - x0)))
+        column = column.astype(np.int64)
+        np.clip(column, 0, len(self.seen) - 1, out=column)
+        if np.any(np.diff(x) < 0):
+            order = np.lexsort((x, column))   # Chunks of unsorted samples
+            x, y, column = x[order], y[order], column[order]
+        first, last, imin, imax, inan, cols = column_extrema(column, y)
+        self.gaps.update(column[inan].tolist())
+
+        # First / last sample: smallest / largest x seen in the column
+        for row, index, better in ((0, first, np.less),
+                                   (1, last, np.greater),
+                                   (2, imin, np.less), (3, imax, np.greater)):
+            c = column[index]   # imin/imax are missing in all-NaN columns
+            new = x[index] if row < 2 else y[index]
+            old = self.x[row, c] if row < 2 else self.y[row, c]
+            update = np.isnan(old) | better(new, old)
+            self.x[row, c[update]] = x[index[update]]
+            self.y[row, c[update]] = y[index[update]]
+        self.seen[cols] = True
+
+    def vertices(self):
+        """Return the (x, y) line through the envelope, in x order."""
+        cols = np.flatnonzero(self.seen)
+        xs = self.x[:, cols].T.ravel()
+        ys = self.y[:, cols].T.ravel()
+        # Order the four samples of each column by x (min/max in time order)
+        group = np.repeat(np.arange(len(cols)), 4)
+        order = np.lexsort((xs, group))
+        xs, ys = xs[order], ys[order]
+        valid = ~np.isnan(xs)
+        xs, ys = xs[valid], ys[valid]
+        if self.gaps:
+            # A NaN in a column breaks the line there, as with ax.plot
+            gap_x = np.array([self.x[1, c] for c in sorted(self.gaps)])
+            at = np.searchsorted(xs, gap_x, side='right')
+            xs = np.insert(xs, at, gap_x)
+            ys = np.insert(ys, at, np.nan)
+        left, right = self.outside
+        if np.isfinite(left[0]):
+            xs, ys = np.r_[left[0], xs], np.r_[left[1], ys]
+        if np.isfinite(right[0]):
+            xs, ys = np.r_[xs, right[0]], np.r_[ys, right[1]]
+        return xs, ys
+
+
+# ============================================================================
+# PLOTTING
+# ============================================================================
+
+def stream_plot(ax, source, *args, xlim=None, dpi=SAVE_DPI, **kwargs):
+    """
+    Draw the line through all (x, y) chunks of *source* like
+    ax.plot(x, y, *args, **kwargs), keeping only a per-pixel envelope.
+
+    *source* is an iterable of (x, y) chunks, or a function returning one.
+    *xlim* is the x range the figure will show; it is required unless
+    *source* is a function (the data are then read twice). The samples may
+    arrive in any order; the line is drawn in x order, like a time series.
+    Returns the list of Line2D.
+    """
+    start = time.perf_counter()
+    transform = ax.xaxis.get_transform()
+
+    def scaled(values):
+        return transform.transform(np.reshape(values, (-1, 1))).ravel()
+
+    if xlim is None:
+        if not callable(source):
+            raise ValueError('Give xlim, or a function returning the chunks '
+                             'so that the x range can be found first.')
+        low, high = np.inf, -np.inf
+        for x, _ in source():
+            if len(x):
+                low, high = min(low, np.nanmin(x)), max(high, np.nanmax(x))
+        xlim = (low, high)
+    chunks = source() if callable(source) else source
+
+    width, offset = pixel_columns(ax, dpi)
+    envelope = PixelEnvelope(width, scaled(xlim), offset)
+    for x, y in chunks:
+        envelope.add(scaled(x), y)
+    xs, ys = envelope.vertices()
+    xs = transform.inverted().transform(xs.reshape(-1, 1)).ravel()
+    lines = ax.plot(xs, ys, *args, **kwargs)
+
+    seconds = time.perf_counter() - start
+    _last_stats.clear()
+    _last_stats.update(rows=envelope.rows, seconds=seconds,
+                       rows_per_s=envelope.rows / max(seconds, 1e-9),
+                       vertices=len(xs), peak_rss_mb=peak_rss_mb())
+    return lines
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import tempfile
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    parser = argparse.ArgumentParser(
+        description='Stream a line plot from a large file; report memory '
+                    'and rows/s. Without a file, a test file is written.')
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('columns', nargs='*', type=int, default=[0, 1])
+    parser.add_argument('--rows', type=int, default=5_000_000,
+                        help='rows of the test file')
+    parser.add_argument('--chunk-mb', type=float, default=8.0)
+    args = parser.parse_args()
+
+    fname = args.file
+    if fname is None:
+        fname = os.path.join(tempfile.mkdtemp(), 'recording.csv')
+        print(f'Writing {args.rows} rows to {fname} ...')
+        rng = np.random.default_rng(0)
+        with open(fname, 'w') as f:
+            for begin in range(0, args.rows, 500_000):
+                t = np.arange(begin, min(begin + 500_000, args.rows)) * 1e-3
+                np.savetxt(f, np.c_[t, np.sin(t / 50) +
+                                    0.2 * rng.standard_normal(len(t))],
+                           delimiter=',', fmt='%.6f')
+
+    baseline = peak_rss_mb()
+    fig, ax = plt.subplots(figsize=(6.2, 6.0), dpi=50)
+    stream_plot(ax, lambda: iter_file(fname, args.columns,
+                                      chunk_mb=args.chunk_mb),
+                'r-', linewidth=2.0)
+    fig.savefig(os.path.splitext(fname)[0] + '.png', dpi=SAVE_DPI)
+    result = stats()
+    size = os.path.getsize(fname) / 2**20
+    print(f'{result["rows"]} rows ({size:.0f} MB) in {result["seconds"]:.1f} s'
+          f' = {result["rows_per_s"] / 1e6:.2f} M rows/s (read twice)')
+    print(f'{result["vertices"]} vertices drawn')
+    if baseline is not None:
+        print(f'Peak RSS {result["peak_rss_mb"]:.0f} MB '
+              f'(+{result["peak_rss_mb"] - baseline:.0f} MB over the '
+              f'{baseline:.0f} MB used before streaming)')
@@ -9,6 +9,9 @@ import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
+from publication_style import apply_style  # Shared tick style (this folder)
+from fast_errorbar import fast_errorbar  # Error bars as few artists (this folder)
+from fast_bars import fast_bar, grouped_bars, stacked_bars  # Bars as one collection per series (this folder)
 
 # ============================================================================
 # FONT AND TEXT CONFIGURATION
@@ -42,6 +45,26 @@ errors_group1 = [3, 4, 2, 5, 3]
 errors_group2 = [2, 3, 4, 3, 4]
 errors_group3 = [4, 2, 3, 4, 2]
 
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# values_single, errors_single = load_columns(data_file('your_data.csv'),
+#                                             usecols=(1, 2), header=True)
+# ----------------------------------------------------------------------------
+# Or aggregate raw measurement rows (one row per sample: integer group and
+# category codes and a value) into the bar values and errors, with count,
+# mean, std, SEM and quantiles of every cell in a few vectorized passes
+# (group_stats.py, in this folder; encode() turns string labels into codes):
+# from group_stats import group_stats
+# group, category, value = load_columns(data_file('raw_rows.csv'),
+#                                       usecols=(0, 1, 2), header=True)
+# cells = group_stats(group.astype(int), category.astype(int), value,
+#                     n_groups=3, n_categories=n_categories)
+# values_group1, values_group2, values_group3 = cells.mean
+# errors_group1, errors_group2, errors_group3 = cells.sem
+# ----------------------------------------------------------------------------
+
 # ============================================================================
 # PLOT STYLING PARAMETERS
 # ============================================================================
@@ -65,10 +88,24 @@ bars = ax.bar(x_pos, values_single, width=bar_width,
               color='steelblue', edgecolor='black', linewidth=1.5,
               alpha=0.8)
 
+# Many categories (thousands of bars): fast_bar (fast_bars.py, in this
+# folder) takes the same arguments and draws all bars as one collection,
+# seconds instead of minutes to save. It returns one PolyCollection, not a
+# list of bars: the value labels and bar-by-bar tips below need ax.bar.
+# bars = fast_bar(ax, x_pos, values_single, width=bar_width,
+#                 color='steelblue', edgecolor='black', linewidth=1.5,
+#                 alpha=0.8)
+
 # Add error bars (optional)
-ax.errorbar(x_pos, values_single, yerr=errors_single, 
-           fmt='none', ecolor='black', capsize=5, capthick=1.5,
-           linewidth=1.5)
+# fast_errorbar (fast_errorbar.py, in this folder) takes the arguments of
+# ax.errorbar and draws all bars as one path and all caps as one artist;
+# above 10^4 bars, bars overlapping at 300 DPI are merged (pass xlim/ylim).
+fast_errorbar(ax, x_pos, values_single, yerr=errors_single,
+              fmt='none', ecolor='black', capsize=5, capthick=1.5,
+              linewidth=1.5)
+# ax.errorbar(x_pos, values_single, yerr=errors_single,
+#            fmt='none', ecolor='black', capsize=5, capthick=1.5,
+#            linewidth=1.5)
 
 # Alternative: Different color for each bar
 # colors = ['red', 'green', 'blue', 'orange', 'purple']
@@ -88,7 +125,22 @@ ax.errorbar(x_pos, values_single, yerr=errors_single,
 # x_pos = np.arange(n_categories)
 # offset = bar_width
 # 
-# # Create bars for each group
+# # Create bars for each group, side by side (fast_bars.py, in this folder):
+# bars = grouped_bars(ax, x_pos, [values_group1, values_group2, values_group3],
+#                     width=n_groups * bar_width,
+#                     labels=[r'Group 1', r'Group 2', r'Group 3'],
+#                     colors=['steelblue', 'coral', 'lightgreen'],
+#                     yerr=[errors_group1, errors_group2, errors_group3],
+#                     edgecolor='black', linewidth=1.2, capsize=4,
+#                     error_kw=dict(linewidth=1.2))
+# 
+# # With cells = group_stats(...) above, the same chart in one call:
+# # bars = cells.draw(ax, x_pos, err='sem', width=n_groups * bar_width,
+# #                   labels=[r'Group 1', r'Group 2', r'Group 3'],
+# #                   colors=['steelblue', 'coral', 'lightgreen'],
+# #                   edgecolor='black', linewidth=1.2, capsize=4)
+# 
+# # Same chart with ax.bar and ax.errorbar:
 # bars1 = ax.bar(x_pos - offset, values_group1, width=bar_width,
 #               label=r'Group 1', color='steelblue', edgecolor='black',
 #               linewidth=1.2)
@@ -115,6 +167,15 @@ ax.errorbar(x_pos, values_single, yerr=errors_single,
 # 
 # x_pos = np.arange(n_categories)
 # 
+# # Each group starts where the previous ones end (fast_bars.py, in this
+# # folder; negative values are stacked downwards from zero):
+# bars = stacked_bars(ax, x_pos, [values_group1, values_group2, values_group3],
+#                     width=bar_width,
+#                     labels=[r'Group 1', r'Group 2', r'Group 3'],
+#                     colors=['steelblue', 'coral', 'lightgreen'],
+#                     edgecolor='black')
+# 
+# # Same chart with ax.bar:
 # bars1 = ax.bar(x_pos, values_group1, width=bar_width,
 #               label=r'Group 1', color='steelblue', edgecolor='black')
 # bars2 = ax.bar(x_pos, values_group2, width=bar_width,
@@ -134,12 +195,35 @@ ax.errorbar(x_pos, values_single, yerr=errors_single,
 # 
 # bars = ax.barh(y_pos, values_single, height=bar_width,
 #               color='steelblue', edgecolor='black', linewidth=1.5)
+# # Many categories, as one collection (fast_bars.py, in this folder):
+# # bars = fast_bar(ax, y_pos, values_single, width=bar_width,
+# #                 orientation='horizontal', color='steelblue',
+# #                 edgecolor='black', linewidth=1.5)
 # 
 # ax.set_yticks(y_pos)
 # ax.set_yticklabels(categories)
 # ax.set_xlabel(r'Value (units)', fontsize=fs)
 # ax.set_ylabel(r'Category', fontsize=fs)
 
+# ============================================================================
+# TOP-K BAR CHART (Millions of categories) - Alternative
+# ============================================================================
+
+# Category counts from logs: raw keys (or (keys, values) pairs to sum) in
+# chunks, the k largest shown and all other keys in one "other" bar
+# (topk_bars.py, in this folder). Memory stays bounded whatever the number
+# of distinct keys; counts.error is the largest possible undercount (0 while
+# there are fewer than 10^6 distinct keys).
+# from topk_bars import accumulate_keys
+# from streaming_lines import iter_file
+# fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+# 
+# counts = accumulate_keys(lambda: iter_file('events.csv', usecols=(0,),
+#                                            dtype='U64'))   # Text keys
+# counts.draw(ax, k=10, orientation='horizontal', width=bar_width,
+#             color='steelblue', edgecolor='black', linewidth=1.5)
+# ax.set_xlabel(r'Count', fontsize=fs)
+
 # ============================================================================
 # AXIS CONFIGURATION
 # ============================================================================
@@ -161,16 +245,9 @@ ax.minorticks_on()
 # TICK FORMATTING
 # ============================================================================
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Customize tick appearance
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=True, right=True)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
 
 # For horizontal bars, adjust:
 # ax.tick_params(axis='x', which='both', top=True, bottom=True)
@@ -10,6 +10,11 @@ import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
 import matplotlib.cm as cm
+from publication_style import apply_style  # Shared tick style (this folder)
+from multires_contour import multires_contourf, multires_contour, TileExtrema  # Large grids (this folder)
+from export_policy import apply_policy, print_report  # Vector/raster (this folder)
+from contour_labels import fast_clabel  # Label placement (this folder)
+from field_eval import evaluate_field  # Tiled Z (this folder)
 
 # ============================================================================
 # FONT AND TEXT CONFIGURATION
@@ -33,15 +38,35 @@ N = 150  # Resolution in x-direction
 x = np.linspace(-3, 3, N)
 y = np.linspace(-3, 3, M)
 
-# Create 2D meshgrid
+# Create 2D meshgrid (for the plotting calls below; Z does not need it)
 X, Y = np.meshgrid(x, y)
 
 # Generate 2D data
 # Example: Multiple Gaussian peaks creating a landscape
-Z = (2.0 * np.exp(-((X-1)**2 + (Y-1)**2)/0.5) + 
-     1.5 * np.exp(-((X+1)**2 + (Y+1)**2)/0.8) +
-     1.0 * np.exp(-((X-0.5)**2 + (Y+0.5)**2)/0.3) -
-     0.5 * np.exp(-((X)**2 + (Y)**2)/2))
+def landscape(X, Y):
+    return (2.0 * np.exp(-((X-1)**2 + (Y-1)**2)/0.5) + 
+            1.5 * np.exp(-((X+1)**2 + (Y+1)**2)/0.8) +
+            1.0 * np.exp(-((X-0.5)**2 + (Y+0.5)**2)/0.3) -
+            0.5 * np.exp(-((X)**2 + (Y)**2)/2))
+
+# Z[i, j] = landscape(x[j], y[i]), computed in tiles of a few MB on all cores
+# without full-size temporaries (field_eval.py, in this folder).
+# Parameter sweeps of slow models: out='sweep.npy' writes to disk, and
+# executor='process' suits functions that do not release the GIL.
+Z = evaluate_field(landscape, x, y)
+# from field_eval import stats as field_stats
+# print(field_stats())   # Throughput (Mpoints/s) and peak memory
+
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# Grid data stored as x, y, z columns (x varying fastest):
+# xs, ys, zs = load_columns(data_file('your_data.csv'), usecols=(0, 1, 2))
+# x, y = np.unique(xs), np.unique(ys)
+# X, Y = np.meshgrid(x, y)
+# Z = zs.reshape(len(y), len(x))
+# ----------------------------------------------------------------------------
 
 # ============================================================================
 # PLOT STYLING PARAMETERS
@@ -50,6 +75,7 @@ Z = (2.0 * np.exp(-((X-1)**2 + (Y-1)**2)/0.5) +
 fs = 24.0           # Font size
 r = 0.9             # Tick label font ratio
 linewidth = 1.5     # Contour line width
+multires_threshold = 4_000_000  # Above this many grid points, contour by tiles
 
 # ============================================================================
 # CREATE FIGURE
@@ -80,8 +106,19 @@ levels = np.linspace(Z.min(), Z.max(), n_levels)
 # extend options: 'neither', 'both', 'min', 'max'
 #   'both' adds triangular extensions for values outside level range
 
-contourf = ax.contourf(X, Y, Z, levels=levels, cmap='coolwarm', 
-                       extend='both', alpha=0.9)
+# multires_contourf / multires_contour (multires_contour.py, in this folder)
+# work like ax.contourf / ax.contour. Up to multires_threshold grid points,
+# each level of a field is traced only once (contour_cache.py): the lines
+# below and any later overlay of the same Z reuse the geometry. Set
+# CONTOUR_CACHE_DIR to also keep it on disk between runs (re-styling).
+# Above, only the tiles crossed by a contour are traced at full resolution,
+# and the paths are thinned to the 300 DPI pixel grid (error < 0.35 px);
+# tiles (per-tile min and max of Z) lets the lines below skip the pass over
+# Z. Build them again if Z changes.
+tiles = TileExtrema(Z) if np.size(Z) > multires_threshold else None
+contourf = multires_contourf(ax, X, Y, Z, levels=levels, cmap='coolwarm',
+                             extend='both', alpha=0.9,
+                             threshold=multires_threshold, tiles=tiles)
 
 # For smooth interpolation:
 # contourf = ax.contourf(X, Y, Z, levels=100, cmap='viridis', extend='both')
@@ -94,12 +131,17 @@ contourf = ax.contourf(X, Y, Z, levels=levels, cmap='coolwarm',
 # Choose subset of levels for lines (every 2nd or 3rd level)
 line_levels = levels[::2]  # Every other level
 
-contours = ax.contour(X, Y, Z, levels=line_levels, colors='k', 
-                     linewidths=linewidth, linestyles='solid')
+contours = multires_contour(ax, X, Y, Z, levels=line_levels, colors='k',
+                            linewidths=linewidth, linestyles='solid',
+                            threshold=multires_threshold, tiles=tiles)
 
-# Add labels to contour lines
-ax.clabel(contours, inline=True, fontsize=0.6*fs, fmt='%0.1f',
-          inline_spacing=5)
+# Add labels to contour lines, without overlaps and in linear time even for
+# thousands of contour pieces (contour_labels.py, in this folder)
+fast_clabel(ax, contours, inline=True, fontsize=0.6*fs, fmt='%0.1f',
+            inline_spacing=5)
+# Matplotlib's own placement (one label per long enough piece):
+# ax.clabel(contours, inline=True, fontsize=0.6*fs, fmt='%0.1f',
+#           inline_spacing=5)
 
 # For specific line styles at different levels:
 # contours_pos = ax.contour(X, Y, Z, levels=[0.5, 1.0, 1.5], 
@@ -160,16 +202,9 @@ ax.set_ylabel(r'$y$ coordinate (units)', color='k', fontsize=fs)
 # TICK FORMATTING
 # ============================================================================
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Customize tick appearance
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=True, right=True)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
 
 # ============================================================================
 # ANNOTATIONS (Optional)
@@ -200,6 +235,14 @@ ax.set_aspect(1.0/ax.get_data_ratio() * ratio)
 # SAVE AND DISPLAY
 # ============================================================================
 
+# Filled bands or contour lines of fine grids (above max_vertices) are
+# saved as images at the save DPI; the contour labels, axes and colorbar
+# stay vector (export_policy.py, in this folder). A noisy field can be as
+# large as an image as it is as vectors: max_bytes=500_000 measures both
+# and keeps the smaller one until the file fits.
+decisions = apply_policy(fig, max_vertices=20_000)
+# print_report(decisions)   # Mode and bytes in the PDF of bands and lines
+
 output_filename = 'contour_plot.pdf'
 plt.savefig(output_filename, bbox_inches='tight', dpi=300)
 plt.show()
@@ -213,10 +256,10 @@ plt.show()
 #                          hatches=['/', '\\', '|', '-', '+', 'x', 'o', 'O', '.', '*'],
 #                          cmap='Blues', alpha=0.5)
 
-# 2. Tricontour for irregular data:
-#    from matplotlib.tri import Triangulation
+# 2. Tricontour for irregular data: see template_tricontour_plot.py
+#    from triangulation_cache import cached_triangulation
 #    # Assuming x, y, z are 1D arrays of scattered points
-#    triangulation = Triangulation(x, y)
+#    triangulation = cached_triangulation(x, y)   # Once per point set
 #    ax.tricontourf(triangulation, z, levels=levels, cmap='viridis')
 
 # 3. Custom colormap with discrete levels:
@@ -9,6 +9,7 @@ import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
+from publication_style import apply_style  # Shared tick style (this folder)
 
 # ============================================================================
 # FONT AND TEXT CONFIGURATION
@@ -36,6 +37,14 @@ y1_line3 = 1.5 * x**2
 # Right y-axis data (second dataset with different scale)
 y2_data = 100 * np.exp(-0.3 * x)
 
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# x, y1_line1, y1_line2, y1_line3, y2_data = load_columns(
+#     data_file('your_data.csv'), usecols=(0, 1, 2, 3, 4))
+# ----------------------------------------------------------------------------
+
 # ============================================================================
 # PLOT STYLING PARAMETERS
 # ============================================================================
@@ -79,16 +88,9 @@ ax1.minorticks_on()
 ax1.set_xlabel(r'$x$ variable (units)', color='k', fontsize=fs)
 ax1.set_ylabel(r'Left $y$ variable (units)', color='k', fontsize=fs)
 
-# Format tick labels
-for tick in ax1.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax1.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Customize tick appearance
-ax1.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax1.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax1.tick_params(which='both', top=True, right=True)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
 
 # ============================================================================
 # CREATE SECOND Y-AXIS (RIGHT SIDE)
@@ -128,14 +130,8 @@ ax2.set_ylabel(r'Right $y$ variable (different units)', color='b', fontsize=fs)
 # Enable minor ticks
 ax2.minorticks_on()
 
-# Format tick labels
-for tick in ax2.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Customize tick appearance (note: colors match the data)
-ax2.tick_params(which='major', direction='in', length=10, width=1.5, colors='b')
-ax2.tick_params(which='minor', direction='in', length=5, width=1.5, colors='b')
-ax2.tick_params(which='both', top=True, right=True)
+# Same tick style as the left axis (note: colors match the data)
+apply_style(fig, fs=fs, r=r, colors='b', axes=[ax2])
 
 # ============================================================================
 # ANNOTATIONS (Optional)
@@ -10,6 +10,7 @@ import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle, Circle, Ellipse, Polygon, FancyBboxPatch
 from matplotlib.ticker import MultipleLocator
+from publication_style import apply_style  # Shared tick style (this folder)
 
 # ============================================================================
 # FONT AND TEXT CONFIGURATION
@@ -34,6 +35,14 @@ y_lower = y - 0.3 - 0.1 * np.random.randn(len(x))
 # Additional data for demonstrations
 y2 = np.cos(x) * 0.7
 
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# x, y, y_lower, y_upper = load_columns(data_file('your_data.csv'),
+#                                       usecols=(0, 1, 2, 3))
+# ----------------------------------------------------------------------------
+
 # ============================================================================
 # PLOT STYLING PARAMETERS
 # ============================================================================
@@ -196,15 +205,9 @@ ax.set_ylabel(r'$y$ variable (units)', fontsize=fs)
 # TICK FORMATTING
 # ============================================================================
 
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-ax.minorticks_on()
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=True, right=True)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
 
 # ============================================================================
 # LEGEND
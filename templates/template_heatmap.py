@@ -9,6 +9,11 @@ import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
+from publication_style import apply_style  # Shared tick style (this folder)
+from export_policy import apply_policy, print_report  # Vector/raster (this folder)
+from grid_heatmap import grid_heatmap  # Image path for regular grids (this folder)
+from contour_cache import cached_contour  # Traced once (this folder)
+from field_eval import evaluate_field  # Tiled Z (this folder)
 import copy
 
 # ============================================================================
@@ -34,14 +39,28 @@ N = 100  # Number of points in x-direction
 x = np.linspace(0, 10, N)
 y = np.linspace(0, 10, M)
 
-# Create 2D meshgrid
-X, Y = np.meshgrid(x, y)
-
 # Generate 2D data (z-values)
 # Example: Gaussian peaks
-Z = (np.exp(-((X-3)**2 + (Y-3)**2)/2) + 
-     0.5 * np.exp(-((X-7)**2 + (Y-7)**2)/3) +
-     0.3 * np.exp(-((X-5)**2 + (Y-2)**2)/1))
+def peaks(X, Y):
+    return (np.exp(-((X-3)**2 + (Y-3)**2)/2) + 
+            0.5 * np.exp(-((X-7)**2 + (Y-7)**2)/3) +
+            0.3 * np.exp(-((X-5)**2 + (Y-2)**2)/1))
+
+# Z[i, j] = peaks(x[j], y[i]), evaluated tile by tile on all cores: X is a
+# (1, n) row and Y an (m, 1) column of each tile, so neither full 2-D
+# coordinate arrays nor full-size temporaries are allocated
+# (field_eval.py, in this folder; out='field.npy' for fields larger than RAM)
+Z = evaluate_field(peaks, x, y)
+
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# Grid data stored as x, y, z columns (x varying fastest):
+# xs, ys, zs = load_columns(data_file('your_data.csv'), usecols=(0, 1, 2))
+# x, y = np.unique(xs), np.unique(ys)
+# Z = zs.reshape(len(y), len(x))
+# ----------------------------------------------------------------------------
 
 # ============================================================================
 # PLOT STYLING PARAMETERS
@@ -73,14 +92,23 @@ cmap = copy.copy(matplotlib.colormaps["autumn_r"])
 # Add '_r' to reverse: 'autumn_r', 'viridis_r', etc.
 
 # ============================================================================
-# CREATE HEATMAP - OPTION 1: PCOLORMESH (Recommended for irregular grids)
+# CREATE HEATMAP - OPTION 1: GRID_HEATMAP (Smooth, any grid)
 # ============================================================================
 
-# pcolormesh creates a pseudocolor plot with smooth interpolation
-# shading options: 'flat' (default), 'gouraud' (smooth), 'nearest', 'auto'
+# grid_heatmap (grid_heatmap.py, in this folder) takes the 1-D vectors x and y.
+# On evenly spaced grids (linspace, or logspace with a log axis) it draws Z as
+# one bilinear image with the look of pcolormesh(shading='gouraud'): fast and
+# light even for 8000 x 8000 grids. Other grids fall back to pcolormesh.
+# shading options: 'gouraud' (smooth), 'nearest' (flat cells)
+# For log-spaced coordinates, call ax.set_xscale('log') / ax.set_yscale('log')
+# before grid_heatmap.
+
+heatmap = grid_heatmap(ax, x, y, Z, cmap=cmap, shading='gouraud',
+                       vmin=0, vmax=1.5, alpha=1.0)
 
-heatmap = ax.pcolormesh(X, Y, Z, cmap=cmap, shading='gouraud', 
-                        vmin=0, vmax=1.5, alpha=1.0, edgecolors='none')
+# Direct pcolormesh (1-D x and y also work, no meshgrid needed):
+# heatmap = ax.pcolormesh(x, y, Z, cmap=cmap, shading='gouraud',
+#                         vmin=0, vmax=1.5, alpha=1.0, edgecolors='none')
 
 # Set colors for values outside the range
 heatmap.cmap.set_under('white')  # Color for values < vmin
@@ -107,14 +135,19 @@ heatmap.set_clim(0, 1.5)
 
 # Add contour lines on top of heatmap
 contour_levels = [0.3, 0.6, 0.9, 1.2]
-contours = ax.contour(X, Y, Z, levels=contour_levels, colors='k', 
-                     linewidths=linewidth, linestyles='solid')
+# cached_contour (contour_cache.py, in this folder) is ax.contour with the
+# geometry traced once per field and level, shared with other overlays
+contours = cached_contour(ax, x, y, Z, levels=contour_levels, colors='k',
+                          linewidths=linewidth, linestyles='solid')
 
 # Add labels to contour lines
 # ax.clabel(contours, inline=True, fontsize=0.7*fs, fmt='%.1f')
+# Many contour pieces (noisy data): fast, non-overlapping labels instead
+# from contour_labels import fast_clabel
+# fast_clabel(ax, contours, inline=True, fontsize=0.7*fs, fmt='%.1f')
 
 # For dashed contours at specific level:
-# contour_dashed = ax.contour(X, Y, Z, levels=[0.75], colors='k',
+# contour_dashed = ax.contour(x, y, Z, levels=[0.75], colors='k',
 #                            linewidths=linewidth, linestyles='dashed')
 
 # ============================================================================
@@ -157,16 +190,9 @@ ax.set_ylabel(r'$y$ variable (units)', color='k', fontsize=fs)
 # TICK FORMATTING
 # ============================================================================
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Customize tick appearance
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=True, right=True)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
 
 # ============================================================================
 # ANNOTATIONS (Optional)
@@ -195,6 +221,15 @@ ax.set_aspect(1.0/ax.get_data_ratio() * ratio)
 # SAVE AND DISPLAY
 # ============================================================================
 
+# grid_heatmap draws regular grids as an image already. On other grids it
+# falls back to pcolormesh: a mesh of more than about 140 x 140 corners
+# (above max_vertices) is then saved as an image at the save DPI instead of
+# one colored quadrilateral per cell; the colorbar, labels and ticks stay
+# vector (export_policy.py, in this folder). Use max_bytes=500_000 to
+# measure the mesh both ways against a file-size budget instead.
+decisions = apply_policy(fig, max_vertices=20_000)
+# print_report(decisions)   # Mode and bytes in the PDF of the mesh
+
 output_filename = 'heatmap.pdf'
 plt.savefig(output_filename, bbox_inches='tight', dpi=300)
 plt.show()
@@ -205,19 +240,19 @@ plt.show()
 
 # 1. Logarithmic color scale:
 #    import matplotlib.colors as colors
-#    heatmap = ax.pcolormesh(X, Y, Z, cmap=cmap,
+#    heatmap = ax.pcolormesh(x, y, Z, cmap=cmap,
 #                           norm=colors.LogNorm(vmin=0.1, vmax=100))
 
 # 2. Symmetric diverging colormap (centered at zero):
 #    vmax = np.abs(Z).max()
-#    heatmap = ax.pcolormesh(X, Y, Z, cmap='RdBu_r', 
+#    heatmap = ax.pcolormesh(x, y, Z, cmap='RdBu_r', 
 #                           vmin=-vmax, vmax=vmax)
 
 # 3. Discrete color levels:
 #    import matplotlib.colors as colors
 #    levels = [0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5]
 #    norm = colors.BoundaryNorm(levels, cmap.N)
-#    heatmap = ax.pcolormesh(X, Y, Z, cmap=cmap, norm=norm)
+#    heatmap = ax.pcolormesh(x, y, Z, cmap=cmap, norm=norm)
 
 # 4. Custom colormap:
 #    import matplotlib.colors as mcolors
@@ -240,7 +275,7 @@ plt.show()
 
 # 7. Masked values (hide certain regions):
 #    Z_masked = np.ma.masked_where(Z < 0.2, Z)
-#    heatmap = ax.pcolormesh(X, Y, Z_masked, cmap=cmap)
+#    heatmap = ax.pcolormesh(x, y, Z_masked, cmap=cmap)
 
 # 8. Transparency based on another variable:
 #    # Create alpha channel based on another 2D array
@@ -0,0 +1,211 @@
+"""
+TEMPLATE: 2D Histogram / Hexbin
+================================
+This template shows how to plot the joint distribution of two variables as
+a 2D histogram or a hexbin map, for millions of points.
+Suitable for: Joint distributions, correlations in large samples, event maps,
+              density of scatter data too large for a scatter plot
+"""
+
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import matplotlib.colors as colors
+from publication_style import apply_style  # Shared tick style (this folder)
+from export_policy import apply_policy, print_report  # Vector/raster (this folder)
+from histogram_accumulator import accumulate_2d  # Streaming 2D counts (this folder)
+import copy
+
+# ============================================================================
+# FONT AND TEXT CONFIGURATION
+# ============================================================================
+
+plt.rc('text', usetex=True)
+preamble = '\\usepackage{times}\n\\usepackage{newtxmath}\n\\usepackage{siunitx}\n'
+plt.rc('text.latex', preamble=preamble)
+
+matplotlib.rcParams['font.serif'] = "Times New Roman"
+matplotlib.rcParams['font.family'] = "serif"
+
+# ============================================================================
+# DATA GENERATION (Replace with your actual data)
+# ============================================================================
+
+# Example: two correlated Gaussian clusters, 2 million points generated in
+# chunks (a generator: the points never exist all at once)
+n_chunks = 20
+chunk_size = 100_000
+
+def data_chunks():
+    rng = np.random.default_rng(42)
+    for _ in range(n_chunks):
+        x1, y1 = rng.multivariate_normal([3.5, 4.0], [[1.2, 0.8], [0.8, 1.0]],
+                                         chunk_size // 2).T
+        x2, y2 = rng.multivariate_normal([6.5, 6.0], [[0.6, -0.3],
+                                                      [-0.3, 0.8]],
+                                         chunk_size // 2).T
+        yield np.r_[x1, x2], np.r_[y1, y2]
+
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own data instead. Memory-mapped arrays (.npy files
+# larger than RAM) are read chunk by chunk:
+# x_all = np.load('x.npy', mmap_mode='r')
+# y_all = np.load('y.npy', mmap_mode='r')
+# from histogram_accumulator import array_chunks
+# data_chunks = lambda: array_chunks(x_all, y_all, chunk=2**22)
+# Or two columns of a text file, streamed (streaming_lines.py, in this folder):
+# from streaming_lines import iter_file
+# data_chunks = lambda: iter_file('events.csv', usecols=(0, 1))
+# ----------------------------------------------------------------------------
+
+# ============================================================================
+# PLOT STYLING PARAMETERS
+# ============================================================================
+
+fs = 24.0           # Font size
+r = 0.9             # Tick label font ratio
+mode = 'hexbin'     # 'hexbin' or 'hist2d'
+gridsize = 40       # Hexagons along x (hexbin)
+bins = (60, 60)     # Bins along x and y (hist2d)
+data_range = ((0, 10), (0, 10))   # ((xmin, xmax), (ymin, ymax))
+log_scale = True    # Logarithmic color scale for counts spanning decades
+mincnt = 1          # Bins with fewer counts are left blank
+
+# ============================================================================
+# CREATE FIGURE
+# ============================================================================
+
+fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+
+# ============================================================================
+# ACCUMULATE AND DRAW COUNTS
+# ============================================================================
+
+# Same colormap as the heatmap template
+cmap = copy.copy(matplotlib.colormaps["autumn_r"])
+
+# Log color scale (counts of 1 to 10^4 in one map); None for a linear scale
+norm = colors.LogNorm() if log_scale else None
+
+# Counts are accumulated chunk by chunk (histogram_accumulator.py, in this
+# folder): memory depends only on the number of bins, not on the number of
+# points. Without data_range, a function source is read twice (range first);
+# points outside data_range are counted in counts.outside.
+# hexbin: same hexagons as ax.hexbin(x, y, gridsize, extent), drawn by
+# ax.hexbin from one weighted point per non-empty hexagon.
+# hist2d: same bins as np.histogram2d, drawn as one image (grid_heatmap.py).
+if mode == 'hexbin':
+    counts = accumulate_2d(data_chunks, bins=gridsize, range=data_range,
+                           hexagonal=True)
+    artist = counts.draw(ax, mincnt=mincnt, cmap=cmap, norm=norm,
+                         linewidths=0.2, edgecolors='face')
+else:
+    counts = accumulate_2d(data_chunks, bins=bins, range=data_range)
+    artist = counts.draw(ax, mincnt=mincnt, cmap=cmap, norm=norm)
+# from histogram_accumulator import stats as hist_stats
+# print(hist_stats())   # Points, time and throughput (points/s)
+
+# With all the points in memory, the same plots are:
+# artist = ax.hexbin(x, y, gridsize=gridsize, extent=(0, 10, 0, 10),
+#                    mincnt=1, cmap=cmap, norm=norm)
+# counts, xedges, yedges, artist = ax.hist2d(x, y, bins=bins,
+#                                            range=data_range, cmin=1,
+#                                            cmap=cmap, norm=norm)
+
+# ============================================================================
+# COLORBAR
+# ============================================================================
+
+# Add colorbar (same styling as the heatmap template)
+cbar = fig.colorbar(artist, shrink=0.85, pad=0.02)
+
+# Set colorbar label
+cbar.set_label(r'Counts', fontsize=fs, labelpad=10)
+
+# Customize colorbar ticks
+cbar.ax.tick_params(labelsize=r*fs)
+
+# ============================================================================
+# AXIS CONFIGURATION
+# ============================================================================
+
+# Set axis limits
+ax.set_xlim(*data_range[0])
+ax.set_ylim(*data_range[1])
+
+# Set tick positions
+ax.xaxis.set_ticks(np.arange(0, 11, 2))
+ax.yaxis.set_ticks(np.arange(0, 11, 2))
+
+# Enable minor ticks
+ax.minorticks_on()
+
+# Set labels
+ax.set_xlabel(r'$x$ variable (units)', color='k', fontsize=fs)
+ax.set_ylabel(r'$y$ variable (units)', color='k', fontsize=fs)
+
+# ============================================================================
+# TICK FORMATTING
+# ============================================================================
+
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
+
+# ============================================================================
+# ANNOTATIONS (Optional)
+# ============================================================================
+
+# Number of points in the plot
+# ax.text(0.05, 0.95, rf'$N = {counts.n:,}$'.replace(',', '{,}'),
+#         transform=ax.transAxes, fontsize=r*fs, va='top')
+
+# ============================================================================
+# ASPECT RATIO
+# ============================================================================
+
+ratio = 1.0
+ax.set_aspect(1.0/ax.get_data_ratio() * ratio)
+
+# For equal aspect (regular hexagons when x and y have the same units):
+# ax.set_aspect('equal')
+
+# ============================================================================
+# SAVE AND DISPLAY
+# ============================================================================
+
+# Dense data (hexagons, images) above max_vertices is rasterized at the save
+# DPI; axes, ticks, labels and colorbar stay vector (export_policy.py, in
+# this folder).
+decisions = apply_policy(fig, max_vertices=20_000)
+# print_report(decisions)   # Mode and bytes in the PDF of the counts
+
+output_filename = 'hist2d_hexbin.pdf'
+plt.savefig(output_filename, bbox_inches='tight', dpi=300)
+plt.show()
+
+# ============================================================================
+# ADDITIONAL TIPS FOR 2D HISTOGRAMS
+# ============================================================================
+
+# 1. Density instead of counts (integral of 1 over the plotted area):
+#    hist2d: density = counts.counts / (counts.n * bin width x * bin width y)
+
+# 2. Marginal histograms on the sides:
+#    from histogram_accumulator import accumulate
+#    ax_top = ax.inset_axes([0, 1.02, 1, 0.2], sharex=ax)
+#    hist_x = accumulate(lambda: (x for x, y in data_chunks()), bins=60,
+#                        range=data_range[0])
+#    hist_x.stairs(ax_top, fill=True)
+
+# 3. Merge counts from several files or processes (same bins and range):
+#    total = accumulate_2d(chunks_a, bins, data_range)
+#    total.merge(accumulate_2d(chunks_b, bins, data_range))
+
+# 4. Contours of the counts over the map:
+#    xc = (counts.edges[0][:-1] + counts.edges[0][1:]) / 2
+#    yc = (counts.edges[1][:-1] + counts.edges[1][1:]) / 2
+#    ax.contour(xc, yc, counts.counts.T, levels=[10, 100, 1000], colors='k')
+
+# 5. Linear scale with a cap on the colors: log_scale = False and
+#    artist.set_clim(0, np.percentile(counts.counts, 99))
@@ -9,6 +9,9 @@ import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
+from publication_style import apply_style  # Shared tick style (this folder)
+from histogram_accumulator import accumulate  # One-pass histogram (this folder)
+from fft_kde import FFTKDE  # Binned FFT KDE (this folder)
 
 # ============================================================================
 # FONT AND TEXT CONFIGURATION
@@ -31,12 +34,22 @@ data_normal = np.random.normal(loc=5, scale=2, size=1000)
 data_uniform = np.random.uniform(low=0, high=10, size=500)
 data_exponential = np.random.exponential(scale=2, size=1000)
 
-# Data for error bar plots
+# Data for error bar plots: raw replicates at each x position (their means
+# and bootstrap intervals are computed in the ERROR BAR PLOT section)
 x_err = np.linspace(0, 10, 20)
-y_err = 2 * x_err + 5 + np.random.randn(20) * 2
-y_error = np.abs(np.random.randn(20)) * 1.5  # Error magnitude
+replicates = (2 * x_err + 5)[:, None] + np.random.randn(20, 12) * 2
 x_error = np.abs(np.random.randn(20)) * 0.3  # Optional x errors
 
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# data_normal, = load_columns(data_file('samples.csv'), usecols=0, dropna=True)
+# x_err, y_err, y_error = load_columns('measurements.csv', usecols=(0, 1, 2))
+# Or raw replicates, one row per x position (errors as in ERROR BAR PLOT):
+# replicates = np.loadtxt('replicates.csv', delimiter=',')
+# ----------------------------------------------------------------------------
+
 # ============================================================================
 # PLOT STYLING PARAMETERS
 # ============================================================================
@@ -44,6 +57,7 @@ x_error = np.abs(np.random.randn(20)) * 0.3  # Optional x errors
 fs = 24.0           # Font size
 r = 0.9             # Tick label font ratio
 linewidth = 2.0     # Line width
+show_kde = False    # Overlay a kernel density estimate on the histogram
 
 # ============================================================================
 # SIMPLE HISTOGRAM
@@ -52,21 +66,40 @@ linewidth = 2.0     # Line width
 fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
 
 # Create histogram
-# bins: number of bins or array of bin edges
-# density: if True, normalize to probability density
-# cumulative: if True, create cumulative histogram
-# histtype: 'bar', 'barstacked', 'step', 'stepfilled'
+# Counts, mean and standard deviation in one pass over the samples, chunk by
+# chunk (histogram_accumulator.py, in this folder): data_normal may be an
+# array, or a generator of chunks for data that do not fit in memory.
+# bins: number of bins (range from the data, or range=(low, high)) or edges
+hist = accumulate(data_normal, bins=30)
 
-n, bins, patches = ax.hist(data_normal, bins=30, 
-                           density=False, 
-                           alpha=0.7, 
-                           color='steelblue',
-                           edgecolor='black',
-                           linewidth=1.2)
+# One StepPatch for all bins (instead of one Rectangle per bin)
+# density: if True, normalize to probability density
+patch = hist.stairs(ax, density=False,
+                    alpha=0.7,
+                    facecolor='steelblue',
+                    edgecolor='black',
+                    linewidth=1.2)
+n, bins = hist.counts, hist.edges
+
+# Chunks from a file, read twice (range first), or merged across processes:
+# from streaming_lines import iter_file
+# from histogram_accumulator import parallel_accumulate
+# hist = accumulate(lambda: (c for c, in iter_file('events.csv', usecols=(0,))),
+#                   bins=30)
+# hist = parallel_accumulate(read_run, ['run1.csv', 'run2.csv'], bins=30,
+#                            range=(0.0, 10.0))
+
+# Kernel density estimate, scaled to counts per bin (fft_kde.py, in this
+# folder): binned and convolved by FFT, near-linear time even for 10^8
+# samples; bw_method='scott' or 'silverman' and weights as in gaussian_kde
+if show_kde:
+    kde = FFTKDE(data_normal, bw_method='scott')
+    ax.plot(kde.grid, kde.density * hist.n * np.diff(bins).mean(), 'k-',
+            linewidth=linewidth, label='KDE')
 
 # Add mean and standard deviation lines
-mean_val = np.mean(data_normal)
-std_val = np.std(data_normal)
+mean_val = hist.mean
+std_val = hist.std
 
 ax.axvline(mean_val, color='red', linestyle='--', linewidth=2,
           label=f'Mean = {mean_val:.2f}')
@@ -186,6 +219,18 @@ ax.legend(loc='upper right', fontsize=r*fs, frameon=True)
 
 # Uncomment to create error bar plot instead of histogram
 
+# # Mean and 95% bootstrap interval at each x (bootstrap_errors.py, in this
+# # folder): all positions resampled at once in batches, on a process pool,
+# # reproducible from the seed whatever the number of processes. 10^4
+# # positions x 10^4 resamples take seconds.
+# # statistic='median' or a function; method='bca' for skewed statistics;
+# # rows may have different lengths (list of arrays, or NaN for missing).
+# from bootstrap_errors import bootstrap_errors  # Bootstrap error bars (this folder)
+# errors = bootstrap_errors(replicates, statistic='mean', n_resamples=10_000,
+#                           confidence=0.95, method='percentile', seed=42)
+# y_err = errors.value
+# y_error = errors.yerr('ci')   # [lower, upper]; errors.yerr('sem') for SEM
+# 
 # fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
 # 
 # # Plot with error bars
@@ -196,11 +241,21 @@ ax.legend(loc='upper right', fontsize=r*fs, frameon=True)
 # # capthick: thickness of error bar caps
 # # elinewidth: error bar line width
 # 
-# ax.errorbar(x_err, y_err, yerr=y_error, xerr=x_error,
-#            fmt='o', color='blue', markersize=8,
-#            ecolor='black', elinewidth=1.5,
-#            capsize=5, capthick=1.5,
-#            label='Data with errors')
+# # fast_errorbar (fast_errorbar.py, in this folder): same arguments as
+# # ax.errorbar, all bars in one path and all caps in one artist; for
+# # 10^5+ points, bars overlapping at 300 DPI are merged on the pixel grid
+# # of xlim/ylim (ax.errorbar takes minutes and writes ~100 MB at 10^6)
+# from fast_errorbar import fast_errorbar  # Error bars as few artists (this folder)
+# fast_errorbar(ax, x_err, y_err, yerr=y_error, xerr=x_error,
+#               fmt='o', color='blue', markersize=8,
+#               ecolor='black', elinewidth=1.5,
+#               capsize=5, capthick=1.5, xlim=(0, 10),
+#               label='Data with errors')
+# # ax.errorbar(x_err, y_err, yerr=y_error, xerr=x_error,
+# #            fmt='o', color='blue', markersize=8,
+# #            ecolor='black', elinewidth=1.5,
+# #            capsize=5, capthick=1.5,
+# #            label='Data with errors')
 # 
 # # Add trend line
 # z = np.polyfit(x_err, y_err, 1)
@@ -227,8 +282,11 @@ ax.legend(loc='upper right', fontsize=r*fs, frameon=True)
 # 
 # # Format: [lower_errors, upper_errors]
 # yerr_asym = [y_error_lower, y_error_upper]
+# # Bootstrap intervals are asymmetric too: yerr_asym = errors.yerr('ci')
+# # (errors from the ERROR BAR PLOT section above)
 # 
-# ax.errorbar(x_err, y_err, yerr=yerr_asym,
+# from fast_errorbar import fast_errorbar  # Error bars as few artists (this folder)
+# fast_errorbar(ax, x_err, y_err, yerr=yerr_asym,
 #            fmt='s', color='red', markersize=8,
 #            ecolor='black', elinewidth=1.5,
 #            capsize=5, capthick=1.5)
@@ -240,19 +298,9 @@ ax.legend(loc='upper right', fontsize=r*fs, frameon=True)
 # TICK FORMATTING
 # ============================================================================
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Enable minor ticks
-ax.minorticks_on()
-
-# Customize tick appearance
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=True, right=True)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
 
 # Optional: Add grid
 # ax.grid(True, which='major', alpha=0.3)
@@ -300,9 +348,10 @@ plt.show()
 #    ax.axvspan(q25, q75, alpha=0.2, color='gray',
 #              label='IQR')
 
-# 7. Kernel Density Estimate overlay:
-#    from scipy.stats import gaussian_kde
-#    kde = gaussian_kde(data)
+# 7. Kernel Density Estimate overlay (show_kde above for the count histogram):
+#    FFTKDE takes the same arguments as scipy.stats.gaussian_kde, in
+#    near-linear time instead of O(n * m)
+#    kde = FFTKDE(data)
 #    x_kde = np.linspace(data.min(), data.max(), 100)
 #    # For density=True histogram
 #    ax.hist(data, bins=30, density=True, alpha=0.5)
@@ -9,6 +9,7 @@ import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator, AutoMinorLocator
+from publication_style import apply_style  # Shared tick style (this folder)
 
 # ============================================================================
 # FONT AND TEXT CONFIGURATION
@@ -39,6 +40,13 @@ y1 = np.sin(x)
 y2 = np.cos(x)
 y3 = 0.5 * np.sin(2*x)
 
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# x, y1, y2, y3 = load_columns(data_file('your_data.csv'), usecols=(0, 1, 2, 3))
+# ----------------------------------------------------------------------------
+
 # ============================================================================
 # PLOT STYLING PARAMETERS
 # ============================================================================
@@ -78,6 +86,20 @@ ax.plot(x, y3, 'c-', linewidth=linewidth, label=r'0.5 sin($2x$)')
 # For line with markers:
 # ax.plot(x, y1, 'ro-', linewidth=linewidth, markersize=6, markevery=5, label='Data')
 
+# For very long series (10^6 samples and more), uncomment to draw only the
+# samples that can change a pixel at 300 DPI (line_decimation.py, in this
+# folder). Use it instead of ax.plot, with the x limits set below:
+# from line_decimation import plot_decimated
+# plot_decimated(ax, x, y1, 'r-', linewidth=linewidth, label=r'sin($x$)',
+#                xlim=(0.0, 10.0))
+# method='lttb' keeps fewer points, but is not pixel exact
+
+# For files larger than memory, uncomment to read the file chunk by chunk and
+# keep only a per-pixel envelope (streaming_lines.py, in this folder):
+# from streaming_lines import stream_plot, iter_file
+# stream_plot(ax, iter_file('recording.csv', usecols=(0, 1)), 'r-',
+#             linewidth=linewidth, label=r'Signal', xlim=(0.0, 10.0))
+
 # ============================================================================
 # AXIS LIMITS AND TICKS
 # ============================================================================
@@ -114,27 +136,18 @@ ax.set_ylabel(r'$y$ variable (units)', color='k', fontsize=fs)
 # TICK LABEL FORMATTING
 # ============================================================================
 
-# Set tick label font size
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# ============================================================================
-# TICK APPEARANCE
-# ============================================================================
-
-# Customize tick appearance
-# direction: 'in' (inside plot), 'out' (outside plot), 'inout' (both sides)
-# length: tick length in points
+# Tick label font size (r * fs) and tick appearance, set once per axis
+# (publication_style.py, in this folder)
+# major_length / minor_length: tick length in points
 # width: tick width in points
-# colors: tick color
+# colors: tick and tick label color
+# top / right: show ticks on all sides of the plot
 
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
+apply_style(fig, fs=fs, r=r, major_length=10, minor_length=5, width=1.5,
+            colors='k', top=True, right=True)
 
-# Show ticks on all sides of the plot
-ax.tick_params(which='both', top=True, right=True)
+# Tick direction other than 'in': 'out' (outside plot), 'inout' (both sides)
+# ax.tick_params(which='both', direction='out')
 
 # ============================================================================
 # LEGEND
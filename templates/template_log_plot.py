@@ -10,6 +10,7 @@ import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import LogLocator, LogFormatterMathtext
 import matplotlib.cm as cm
+from publication_style import apply_style  # Shared tick style (this folder)
 import copy
 
 # ============================================================================
@@ -40,6 +41,13 @@ x_lin = np.linspace(0.01, 100, 1000)
 y_lognormal = (1/(x_lin * 0.5 * np.sqrt(2*np.pi))) * \
               np.exp(-((np.log(x_lin) - 1)**2) / (2 * 0.5**2))
 
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# x_log, y_power_law = load_columns(data_file('your_data.csv'), usecols=(0, 1))
+# ----------------------------------------------------------------------------
+
 # ============================================================================
 # PLOT STYLING PARAMETERS
 # ============================================================================
@@ -78,16 +86,9 @@ ax.legend(loc='upper right', fontsize=r*fs, frameon=True)
 # Enable minor ticks (important for log scales)
 ax.minorticks_on()
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Customize tick appearance
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=True, right=True)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
 
 # Add grid (useful for log plots)
 ax.grid(True, which='major', linestyle='-', linewidth=0.8, alpha=0.3)
@@ -10,6 +10,9 @@ import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
 import matplotlib.cm as cm
+from publication_style import apply_style  # Shared tick style (this folder)
+from scatter_density import density_scatter  # Large point counts (this folder)
+from export_policy import apply_policy, print_report  # Vector/raster (this folder)
 
 # ============================================================================
 # FONT AND TEXT CONFIGURATION
@@ -38,6 +41,14 @@ y = np.random.randn(n_points) * 3 + 10
 # This could represent: temperature, magnitude, category, etc.
 color_values = x * y + np.random.randn(n_points) * 5
 
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# x, y, color_values = load_columns(data_file('your_data.csv'),
+#                                   usecols=(0, 1, 2), dropna=True)
+# ----------------------------------------------------------------------------
+
 # ============================================================================
 # PLOT STYLING PARAMETERS
 # ============================================================================
@@ -46,6 +57,7 @@ fs = 24.0               # Font size
 r = 0.9                 # Tick label font ratio
 marker_size = 50        # Marker size (50-200 typical for scatter)
 marker_alpha = 0.7      # Transparency (0=transparent, 1=opaque)
+density_threshold = 200_000  # Above this many points, draw a density image
 
 # ============================================================================
 # CREATE FIGURE
@@ -63,9 +75,16 @@ fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
 # cmap options: 'viridis', 'plasma', 'inferno', 'magma', 'coolwarm', 'RdYlBu',
 #               'autumn', 'winter', 'spring', 'summer', 'jet', 'rainbow'
 
-scatter = ax.scatter(x, y, c=color_values, cmap='autumn_r', 
-                    marker='s', s=marker_size, alpha=marker_alpha,
-                    edgecolors='none')
+# density_scatter (scatter_density.py, in this folder) is ax.scatter for up to
+# density_threshold points. Above, the points are binned on the pixels of the
+# saved figure and drawn as one image: reduce='mean' (or 'max') of the color
+# values per pixel, or reduce='count' for the number of points. Much faster
+# and much smaller PDFs for 10^6+ points; marker settings then do not apply.
+scatter = density_scatter(ax, x, y, c=color_values, cmap='autumn_r',
+                          reduce='mean', threshold=density_threshold,
+                          xlim=(0, 10), ylim=(0, 20),  # Final axis limits
+                          marker='s', s=marker_size, alpha=marker_alpha,
+                          edgecolors='none')
 
 # For scatter without colormap (single color):
 # ax.scatter(x, y, c='blue', marker='o', s=marker_size, alpha=0.6, edgecolors='black')
@@ -119,16 +138,9 @@ ax.set_ylabel(r'$y$ variable (units)', color='k', fontsize=fs)
 # TICK FORMATTING
 # ============================================================================
 
-# Format tick labels
-for tick in ax.get_xticklabels():
-    tick.set_fontsize(r * fs)
-for tick in ax.get_yticklabels():
-    tick.set_fontsize(r * fs)
-
-# Customize tick appearance
-ax.tick_params(which='major', direction='in', length=10, width=1.5, colors='k')
-ax.tick_params(which='minor', direction='in', length=5, width=1.5, colors='k')
-ax.tick_params(which='both', top=True, right=True)
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
 
 # ============================================================================
 # ADDITIONAL ELEMENTS (Optional)
@@ -168,6 +180,14 @@ ax.set_aspect(1.0/ax.get_data_ratio() * ratio)
 # SAVE AND DISPLAY
 # ============================================================================
 
+# A scatter of more than a few thousand markers (above max_vertices) is
+# saved as an image at the save DPI, so the PDF does not hold one path per
+# point; the axes, tick labels and colorbar stay vector (export_policy.py,
+# in this folder). With max_bytes=500_000 instead, the scatter is measured
+# both ways and rasterized only if the file would exceed the budget.
+decisions = apply_policy(fig, max_vertices=20_000)
+# print_report(decisions)   # Mode and bytes in the PDF of the scatter
+
 output_filename = 'scatter_plot.pdf'
 plt.savefig(output_filename, bbox_inches='tight', dpi=300)
 plt.show()
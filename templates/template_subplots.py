@@ -10,6 +10,7 @@ import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
 import matplotlib.gridspec as gridspec
+from publication_style import apply_style  # Shared tick style (this folder)
 
 # ============================================================================
 # FONT AND TEXT CONFIGURATION
@@ -36,6 +37,14 @@ y4 = np.exp(-0.3*x) * np.sin(x)
 X, Y = np.meshgrid(np.linspace(0, 5, 50), np.linspace(0, 5, 50))
 Z = np.sin(X) * np.cos(Y)
 
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# x, y1, y2, y3, y4 = load_columns(data_file('your_data.csv'),
+#                                   usecols=(0, 1, 2, 3, 4))
+# ----------------------------------------------------------------------------
+
 # ============================================================================
 # PLOT STYLING PARAMETERS
 # ============================================================================
@@ -115,17 +124,10 @@ cbar.set_label(r'$Z$ value', fontsize=0.8*fs)
 ax.text(0.05, 0.95, '(d)', transform=ax.transAxes,
        fontsize=fs, fontweight='bold', va='top', color='white')
 
-# Format all subplots
-for ax in axes.flat:
-    ax.minorticks_on()
-    ax.tick_params(which='major', direction='in', length=8, width=1.2)
-    ax.tick_params(which='minor', direction='in', length=4, width=1.2)
-    ax.tick_params(which='both', top=True, right=True)
-    
-    for tick in ax.get_xticklabels():
-        tick.set_fontsize(r * fs)
-    for tick in ax.get_yticklabels():
-        tick.set_fontsize(r * fs)
+# Format all subplots at once (tick labels, inward ticks, minor ticks):
+# one call per figure instead of one per tick label
+apply_style(fig, fs=fs, r=r, major_length=8, minor_length=4, width=1.2,
+            axes=axes.flat)
 
 # Adjust spacing between subplots
 plt.tight_layout()
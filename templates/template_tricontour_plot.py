@@ -0,0 +1,220 @@
+"""
+TEMPLATE: Filled Contour Plot of Scattered Samples
+===================================================
+This template shows how to create filled contour plots from scattered (x, y, z)
+measurements, without interpolating them onto a grid first.
+Suitable for: Sensor arrays, field measurements, unstructured simulation output
+"""
+
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.ticker import MultipleLocator
+from publication_style import apply_style  # Shared tick style (this folder)
+from triangulation_cache import cached_triangulation  # Triangulated once (this folder)
+from export_policy import apply_policy, print_report  # Vector/raster (this folder)
+from contour_labels import fast_clabel  # Label placement (this folder)
+
+# ============================================================================
+# FONT AND TEXT CONFIGURATION
+# ============================================================================
+
+plt.rc('text', usetex=True)
+preamble = '\\usepackage{times}\n\\usepackage{newtxmath}\n\\usepackage{siunitx}\n'
+plt.rc('text.latex', preamble=preamble)
+
+matplotlib.rcParams['font.serif'] = "Times New Roman"
+matplotlib.rcParams['font.family'] = "serif"
+
+# ============================================================================
+# DATA GENERATION (Replace with your actual data)
+# ============================================================================
+
+# Scattered sample positions (e.g. sensor layout)
+np.random.seed(42)
+n_points = 2000
+
+x = np.random.uniform(-3, 3, n_points)
+y = np.random.uniform(-3, 3, n_points)
+
+# Measured value at each position
+# Example: Multiple Gaussian peaks creating a landscape
+z = (2.0 * np.exp(-((x-1)**2 + (y-1)**2)/0.5) +
+     1.5 * np.exp(-((x+1)**2 + (y+1)**2)/0.8) +
+     1.0 * np.exp(-((x-0.5)**2 + (y+0.5)**2)/0.3) -
+     0.5 * np.exp(-((x)**2 + (y)**2)/2))
+
+# ----------------------------------------------------------------------------
+# Uncomment to plot your own file instead (columnar_loader.py, in this folder).
+# Only the listed columns are read, in parallel for multi-GB files:
+# from columnar_loader import load_columns, data_file
+# x, y, z = load_columns(data_file('your_data.csv'), usecols=(0, 1, 2),
+#                        dropna=True)
+# ----------------------------------------------------------------------------
+
+# ============================================================================
+# TRIANGULATION
+# ============================================================================
+
+# Delaunay triangulation of the sample positions, computed once per point set
+# and cached in memory and on disk (triangulation_cache.py, in this folder;
+# folder: $TRIANGULATION_CACHE_DIR or ~/.cache/triangulation_cache).
+# Every field measured on the same positions (time steps, other variables)
+# reuses it at no geometry cost.
+# min_circle_ratio masks the flat triangles along the border of the points,
+# which would draw spurious contours (None to keep all triangles).
+triangulation = cached_triangulation(x, y, min_circle_ratio=0.01)
+
+# For several fields on the same positions:
+# for step, z_step in enumerate(z_time_series):
+#     triangulation = cached_triangulation(x, y, min_circle_ratio=0.01)  # Cached
+#     ax.tricontourf(triangulation, z_step, levels=levels, cmap='coolwarm')
+
+# ============================================================================
+# PLOT STYLING PARAMETERS
+# ============================================================================
+
+fs = 24.0           # Font size
+r = 0.9             # Tick label font ratio
+linewidth = 1.5     # Contour line width
+show_points = False  # Mark the sample positions
+
+# ============================================================================
+# CREATE FIGURE
+# ============================================================================
+
+fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+
+# ============================================================================
+# DEFINE CONTOUR LEVELS
+# ============================================================================
+
+# Option 1: Automatic levels
+n_levels = 15
+levels = np.linspace(z.min(), z.max(), n_levels)
+
+# Option 2: Custom levels
+# levels = [-1, -0.5, 0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+
+# ============================================================================
+# CREATE FILLED CONTOURS
+# ============================================================================
+
+# Create filled contour plot from the triangulation
+# cmap options: 'viridis', 'plasma', 'coolwarm', 'RdBu', 'RdYlBu', 'jet', 'rainbow'
+# extend options: 'neither', 'both', 'min', 'max'
+
+contourf = ax.tricontourf(triangulation, z, levels=levels, cmap='coolwarm',
+                          extend='both', alpha=0.9)
+
+# ============================================================================
+# ADD CONTOUR LINES
+# ============================================================================
+
+# Choose subset of levels for lines (every 2nd or 3rd level)
+line_levels = levels[::2]  # Every other level
+
+contours = ax.tricontour(triangulation, z, levels=line_levels, colors='k',
+                         linewidths=linewidth, linestyles='solid')
+
+# Add labels to contour lines, without overlaps and in linear time even for
+# thousands of contour pieces (contour_labels.py, in this folder)
+fast_clabel(ax, contours, inline=True, fontsize=0.6*fs, fmt='%0.1f',
+            inline_spacing=5)
+# Matplotlib's own placement (one label per long enough piece):
+# ax.clabel(contours, inline=True, fontsize=0.6*fs, fmt='%0.1f',
+#           inline_spacing=5)
+
+# Mark the sample positions
+if show_points:
+    ax.plot(x, y, 'k.', markersize=2, alpha=0.5)
+
+# Show the triangulation itself (check coverage and masked border triangles):
+# ax.triplot(triangulation, color='gray', linewidth=0.3, alpha=0.5)
+
+# ============================================================================
+# COLORBAR
+# ============================================================================
+
+# Add colorbar
+cbar = fig.colorbar(contourf, shrink=0.85, pad=0.02,
+                    spacing='proportional', extend='both')
+
+# Set colorbar label
+cbar.set_label(r'$z$ value (units)', fontsize=fs, labelpad=10)
+
+# Customize colorbar ticks
+cbar.ax.tick_params(labelsize=r*fs)
+
+# ============================================================================
+# AXIS CONFIGURATION
+# ============================================================================
+
+# Set axis limits
+ax.set_xlim(-3, 3)
+ax.set_ylim(-3, 3)
+
+# Set tick positions
+ax.xaxis.set_ticks(np.arange(-3, 3.1, 1))
+ax.yaxis.set_ticks(np.arange(-3, 3.1, 1))
+
+# Enable minor ticks
+ax.minorticks_on()
+
+# Set labels
+ax.set_xlabel(r'$x$ coordinate (units)', color='k', fontsize=fs)
+ax.set_ylabel(r'$y$ coordinate (units)', color='k', fontsize=fs)
+
+# ============================================================================
+# TICK FORMATTING
+# ============================================================================
+
+# Tick labels (r * fs), inward ticks (major 10 pt, minor 5 pt), minor
+# ticks and ticks on all four sides: see publication_style.py
+apply_style(fig, fs=fs, r=r)
+
+# ============================================================================
+# ASPECT RATIO
+# ============================================================================
+
+ratio = 1.0
+ax.set_aspect(1.0/ax.get_data_ratio() * ratio)
+
+# ============================================================================
+# SAVE AND DISPLAY
+# ============================================================================
+
+# Dense data (tricontourf of many points) above max_vertices is rasterized at
+# the save DPI; axes, ticks, labels and colorbar stay vector
+# (export_policy.py, in this folder).
+decisions = apply_policy(fig, max_vertices=20_000)
+# print_report(decisions)   # Mode and bytes in the PDF of the bands
+
+output_filename = 'tricontour_plot.pdf'
+plt.savefig(output_filename, bbox_inches='tight', dpi=300)
+plt.show()
+
+# ============================================================================
+# ADDITIONAL TIPS FOR SCATTERED DATA
+# ============================================================================
+
+# 1. Smoother contours (refined triangulation, interpolated values):
+#    from matplotlib.tri import UniformTriRefiner
+#    refiner = UniformTriRefiner(triangulation)
+#    fine_triangulation, z_fine = refiner.refine_field(z, subdiv=2)
+#    ax.tricontourf(fine_triangulation, z_fine, levels=levels, cmap='coolwarm')
+
+# 2. Values at arbitrary positions (e.g. a line profile):
+#    from matplotlib.tri import LinearTriInterpolator
+#    interpolator = LinearTriInterpolator(triangulation, z)
+#    z_profile = interpolator(np.linspace(-3, 3, 200), np.zeros(200))
+
+# 3. Mask a region without samples (e.g. a hole in the layout):
+#    centers_x = x[triangulation.triangles].mean(axis=1)
+#    centers_y = y[triangulation.triangles].mean(axis=1)
+#    triangulation.set_mask(np.hypot(centers_x, centers_y) < 0.5)
+#    (cached_triangulation returns a new object on every call: other fields
+#    drawn from cached_triangulation(x, y) keep the full triangulation)
+
+# 4. Colored triangles without contour levels:
+#    ax.tripcolor(triangulation, z, cmap='coolwarm', shading='gouraud')
@@ -0,0 +1,360 @@
+"""
+================================================================================
+BATCHED LaTeX RENDERING: ONE LaTeX RUN PER FIGURE
+================================================================================
+With text.usetex=True, Matplotlib compiles every tick label, axis label,
+colorbar tick and legend entry as its own LaTeX document. A figure with ~60
+strings therefore starts ~60 LaTeX processes (and as many dvipng processes for
+PNG output) the first time it is saved.
+
+This module adds a pre-draw pass that:
+    1. collects every usetex string in the figure (after the ticks are known)
+    2. compiles all of them in ONE multi-page LaTeX document
+    3. splits the resulting DVI file into one single-page DVI per string
+       (and, for raster output, converts all pages with ONE dvipng call)
+    4. drops the results into Matplotlib's own tex.cache folder
+
+Matplotlib then finds every string already compiled and never starts LaTeX
+itself. If the batch fails (e.g. one string has a LaTeX error), nothing is
+prefetched and Matplotlib falls back to its usual per-string runs, which
+report the offending string.
+
+USAGE:
+    import tex_batch
+    tex_batch.install()          # every draw/savefig now prefetches in batch
+
+    # or explicitly, for one figure:
+    tex_batch.prefetch(fig)                  # DVI only (vector output)
+    tex_batch.prefetch(fig, dpi=300)         # DVI + PNG for raster output
+
+Works together with tex_cache.py: strings found in the shared label cache are
+not recompiled, and the batch results are stored there.
+================================================================================
+"""
+
+import logging
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import matplotlib as mpl
+from matplotlib.figure import Figure
+from matplotlib.text import Text
+from matplotlib.texmanager import TexManager
+from matplotlib.backends.backend_agg import RendererAgg
+
+_log = logging.getLogger(__name__)
+
+_original_methods = {}   # Figure methods replaced by install()
+_stats = {'batches': 0, 'strings': 0, 'failed_batches': 0}
+
+
+# ============================================================================
+# STEP 1: COLLECT THE TeX STRINGS OF A FIGURE
+# ============================================================================
+
+def collect_tex_strings(fig):
+    """
+    Return the set of (tex, fontsize) pairs Matplotlib will compile when
+    drawing *fig*, in the form passed to TexManager.
+    """
+    # Tick labels are created lazily; asking for them runs the locators and
+    # formatters, so their final strings are known before the draw.
+    for ax in fig.axes:
+        for axis in (ax.xaxis, ax.yaxis):
+            axis.get_majorticklabels()
+            axis.get_minorticklabels()
+
+    strings = set()
+    for text in fig.findobj(match=Text):
+        if not (text.get_visible() and text.get_usetex()):
+            continue
+        content = text._get_wrapped_text()
+        if not content:
+            continue
+        fontsize = text.get_fontproperties().get_size_in_points()
+        # Text layout measures "lp" to find the font's line height
+        strings.add(('lp', fontsize))
+        for line in content.split('\n'):
+            tex = r'\ ' if line == ' ' else line
+            if tex.strip():
+                strings.add((tex, fontsize))
+    return strings
+
+
+# ============================================================================
+# STEP 2: SPLIT A MULTI-PAGE DVI FILE INTO SINGLE-PAGE FILES
+# ============================================================================
+
+_BOP, _EOP, _POST, _POST_POST = 139, 140, 248, 249
+_FNT_DEF1, _FNT_DEF4 = 243, 246
+
+
+def _s4(data, pos):
+    return int.from_bytes(data[pos:pos + 4], 'big', signed=True)
+
+
+def _font_definitions(data, pos):
+    """Return the raw fnt_def commands found from *pos* up to post_post."""
+    defs = []
+    while data[pos] != _POST_POST:
+        op = data[pos]
+        if not _FNT_DEF1 <= op <= _FNT_DEF4:
+            raise ValueError(f'unexpected DVI opcode {op} in postamble')
+        k_len = op - _FNT_DEF1 + 1
+        a = data[pos + 1 + k_len + 12]
+        length = data[pos + 1 + k_len + 13]
+        end = pos + 1 + k_len + 14 + a + length
+        defs.append(data[pos:end])
+        pos = end
+    return b''.join(defs)
+
+
+def split_dvi(data):
+    """
+    Split the bytes of a multi-page DVI file into a list of valid single-page
+    DVI files (as bytes), one per page, in page order.
+
+    The pages are located through the back-pointer chain of the postamble.
+    Each output file gets the original preamble, all font definitions (before
+    the page, as allowed by the DVI format) and a fresh postamble.
+    """
+    end = len(data)
+    while data[end - 1] == 223:   # Trailing padding
+        end -= 1
+    if data[end - 6] != _POST_POST:
+        raise ValueError('not a DVI file (post_post not found)')
+    post = _s4(data, end - 5)
+    if data[post] != _POST:
+        raise ValueError('not a DVI file (postamble not found)')
+    identification = data[end - 1:end]
+
+    # Walk the bop back-pointers from the last page to the first one
+    bops = []
+    bop = _s4(data, post + 1)
+    while bop != -1:
+        bops.append(bop)
+        bop = _s4(data, bop + 41)
+    bops.reverse()
+
+    preamble = data[:15 + data[14]]
+    post_fields = data[post + 5:post + 27]   # num, den, mag, l, u, s
+    font_defs = _font_definitions(data, post + 29)
+
+    pages = []
+    for i, start in enumerate(bops):
+        stop = bops[i + 1] if i + 1 < len(bops) else post
+        page = bytearray(data[start:stop])
+        page[41:45] = (-1).to_bytes(4, 'big', signed=True)   # No previous page
+
+        out = bytearray(preamble)
+        out += font_defs
+        bop_pos = len(out)
+        out += page
+        post_pos = len(out)
+        out.append(_POST)
+        out += bop_pos.to_bytes(4, 'big', signed=True)
+        out += post_fields
+        out += (1).to_bytes(2, 'big')                         # Total pages
+        out += font_defs
+        out.append(_POST_POST)
+        out += post_pos.to_bytes(4, 'big', signed=True)
+        out += identification
+        out += bytes([223]) * (4 + (-(len(out) + 4)) % 4)
+        pages.append(bytes(out))
+    return pages
+
+
+# ============================================================================
+# STEP 3: COMPILE THE MISSING STRINGS IN ONE BATCH
+# ============================================================================
+
+def _split_source(tex, fontsize):
+    """Return (preamble, body) of Matplotlib's TeX source for one string."""
+    source = TexManager._get_tex_source(tex, fontsize)
+    preamble, rest = source.split(r'\begin{document}', 1)
+    body = rest.rsplit(r'\end{document}', 1)[0]
+    return preamble, body
+
+
+def _png_needed(renderer):
+    """True if *renderer* rasterizes TeX text through dvipng."""
+    if not isinstance(renderer, RendererAgg):
+        return False
+    # Matplotlib >= 3.11 can draw DVI glyphs directly without dvipng
+    if 'text.latex.engine' in mpl.rcParams:
+        return mpl.rcParams['text.latex.engine'] == 'latex+dvipng'
+    return True
+
+
+def _shared_cache():
+    """Return the tex_cache.py store if it is installed, else None."""
+    try:
+        import tex_cache
+    except ImportError:
+        return None
+    return tex_cache.active_cache()
+
+
+def prefetch(fig, dpi=None):
+    """
+    Compile all usetex strings of *fig* that are not cached yet in a single
+    LaTeX run (and a single dvipng run when *dpi* is given).
+
+    Return the number of strings that were compiled.
+    """
+    cache = _shared_cache()
+
+    jobs = []   # (tex, fontsize, preamble, body, dvipath, pngpath)
+    for tex, fontsize in sorted(collect_tex_strings(fig)):
+        dvipath = TexManager._get_base_path(tex, fontsize).with_suffix('.dvi')
+        pngpath = None
+        if dpi is not None:
+            pngpath = TexManager._get_base_path(
+                tex, fontsize, dpi).with_suffix('.png')
+        preamble, body = _split_source(tex, fontsize)
+
+        if cache is not None:
+            if not dvipath.exists():
+                key = cache.make_key(preamble, tex, fontsize, 'dvi')
+                cache.fetch(key, '.dvi', dvipath)
+            if pngpath is not None and not pngpath.exists():
+                key = cache.make_key(preamble, tex, fontsize, f'png@{dpi}')
+                cache.fetch(key, '.png', pngpath)
+
+        if dvipath.exists() and (pngpath is None or pngpath.exists()):
+            continue
+        jobs.append((tex, fontsize, preamble, body, dvipath, pngpath))
+
+    # All strings of a figure normally share one preamble; group to be safe
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job[2], []).append(job)
+    compiled = 0
+    for preamble, group in groups.items():
+        try:
+            _compile_batch(preamble, group, dpi, cache)
+        except (RuntimeError, ValueError, OSError) as exc:
+            _stats['failed_batches'] += 1
+            _log.warning('Batched LaTeX run failed (%s); falling back to one '
+                         'LaTeX run per string.', str(exc).splitlines()[0])
+            continue
+        compiled += len(group)
+    return compiled
+
+
+def _compile_batch(preamble, jobs, dpi, cache):
+    """Run LaTeX (and dvipng) once for *jobs* and distribute the pages."""
+    pages = [job[3] + '\n\\newpage\n' for job in jobs]
+    source = ''.join([preamble, '\\begin{document}', *pages,
+                      '\\end{document}\n'])
+    label = f'<batch of {len(jobs)} strings>'
+
+    with TemporaryDirectory(dir=TexManager._cache_dir) as tmpdir:
+        Path(tmpdir, 'file.tex').write_text(source, encoding='utf-8')
+        TexManager._run_checked_subprocess(
+            ['latex', '-interaction=nonstopmode', '-halt-on-error',
+             '-no-shell-escape', 'file.tex'], label, cwd=tmpdir)
+        if cache is not None:
+            cache.latex_runs += 1
+
+        dvi_pages = split_dvi(Path(tmpdir, 'file.dvi').read_bytes())
+        if len(dvi_pages) != len(jobs):
+            raise ValueError(f'expected {len(jobs)} DVI pages, '
+                             f'got {len(dvi_pages)}')
+
+        need_png = [j[5] is not None and not j[5].exists() for j in jobs]
+        if any(need_png):
+            TexManager._run_checked_subprocess(
+                ['dvipng', '-bg', 'Transparent', '-D', str(dpi), '-T', 'tight',
+                 '-o', 'page%d.png', 'file.dvi'], label, cwd=tmpdir)
+            if cache is not None:
+                cache.dvipng_runs += 1
+
+        for number, (job, page) in enumerate(zip(jobs, dvi_pages), start=1):
+            tex, fontsize, preamble, _, dvipath, pngpath = job
+            if not dvipath.exists():
+                tmp = Path(tmpdir, f'page{number}.dvi')
+                tmp.write_bytes(page)
+                if cache is not None:
+                    key = cache.make_key(preamble, tex, fontsize, 'dvi')
+                    cache.store(key, '.dvi', tmp)
+                os.replace(tmp, dvipath)
+            if need_png[number - 1]:
+                tmp = Path(tmpdir, f'page{number}.png')
+                if cache is not None:
+                    key = cache.make_key(preamble, tex, fontsize, f'png@{dpi}')
+                    cache.store(key, '.png', tmp)
+                os.replace(tmp, pngpath)
+
+    _stats['batches'] += 1
+    _stats['strings'] += len(jobs)
+
+
+# ============================================================================
+# STEP 4: HOOK THE PRE-DRAW PASS INTO MATPLOTLIB
+# ============================================================================
+
+def _batched_draw(self, renderer):
+    dpi = renderer.dpi if _png_needed(renderer) else None
+    prefetch(self, dpi=dpi)
+    return _original_methods['draw'](self, renderer)
+
+
+def _batched_tight_layout(self, *args, **kwargs):
+    # tight_layout measures all texts before the first draw
+    prefetch(self)
+    return _original_methods['tight_layout'](self, *args, **kwargs)
+
+
+def install():
+    """Prefetch all usetex strings of a figure in one batch before each draw."""
+    if _original_methods:
+        return
+    _original_methods['draw'] = Figure.draw
+    _original_methods['tight_layout'] = Figure.tight_layout
+    Figure.draw = _batched_draw
+    Figure.tight_layout = _batched_tight_layout
+
+
+def uninstall():
+    """Restore the original Figure methods."""
+    for name, method in _original_methods.items():
+        setattr(Figure, name, method)
+    _original_methods.clear()
+
+
+def stats():
+    """Return the number of batches, strings compiled and failed batches."""
+    return dict(_stats)
+
+
+# ============================================================================
+# COMMAND LINE: RUN A TEMPLATE WITH BATCHED LaTeX
+# ============================================================================
+
+if __name__ == '__main__':
+    import argparse
+    import runpy
+    import time
+
+    mpl.use('Agg')
+
+    parser = argparse.ArgumentParser(
+        description='Run a template with batched LaTeX rendering.')
+    parser.add_argument('template', help='template script, e.g. '
+                                         'template_log_plot.py')
+    args = parser.parse_args()
+
+    install()
+    template = os.path.abspath(args.template)
+    start = time.perf_counter()
+    with TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            runpy.run_path(template, run_name='__main__')
+        finally:
+            os.chdir(cwd)
+    elapsed = time.perf_counter() - start
+    print(f'{args.template}: {elapsed:.2f} s, {stats()}')
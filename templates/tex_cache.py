@@ -0,0 +1,357 @@
+"""
+================================================================================
+PERSISTENT LABEL CACHE FOR LaTeX-RENDERED TEXT
+================================================================================
+Every template renders its labels with text.usetex=True and the same
+times/newtxmath/siunitx preamble. Each distinct string costs one LaTeX run
+(and one dvipng run for raster output). Matplotlib keeps those results in
+~/.cache/matplotlib/tex.cache, but that folder is private to one machine and
+is never trimmed.
+
+This module adds a second cache layer in front of Matplotlib's TexManager:
+    - content addressed: key = (preamble, string, font size, backend)
+    - can live anywhere (a shared volume, a CI cache folder, ...)
+    - safe to share between processes and containers (atomic writes)
+    - size bounded, least-recently-used entries are evicted first
+    - hit/miss counters tell you how many LaTeX runs a figure really costs
+
+USAGE:
+    import tex_cache
+    tex_cache.install()                  # before creating any figure
+    ...                                  # plot as usual
+    print(tex_cache.stats())
+
+    Or from the command line, to count the LaTeX runs of a template:
+    python tex_cache.py template_subplots.py
+
+CONFIGURATION (environment variables, optional):
+    TEX_LABEL_CACHE_DIR     cache folder (default: ~/.cache/tex_label_cache)
+    TEX_LABEL_CACHE_MAX_MB  size budget in MB (default: 512)
+================================================================================
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+from matplotlib.texmanager import TexManager
+
+# ============================================================================
+# DEFAULT SETTINGS
+# ============================================================================
+
+DEFAULT_CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME',
+                                        Path.home() / '.cache'),
+                         'tex_label_cache')
+DEFAULT_MAX_MB = 512.0
+
+_active_cache = None     # Cache currently hooked into TexManager
+_original_methods = {}   # TexManager methods replaced by install()
+
+
+# ============================================================================
+# CACHE STORE
+# ============================================================================
+
+class TexLabelCache:
+    """
+    Content-addressed, size-bounded store of LaTeX output files.
+
+    Entries are plain files named after the SHA-256 of their key, so several
+    processes (or containers mounting the same folder) can read and write the
+    store at the same time. The file modification time records the last use
+    and drives the least-recently-used eviction.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        Folder holding the entries. Created if missing.
+    max_bytes : int, optional
+        Size budget. When exceeded, the oldest entries are removed until the
+        store is back under 90% of the budget.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        if cache_dir is None:
+            cache_dir = os.environ.get('TEX_LABEL_CACHE_DIR', DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_mb = float(os.environ.get('TEX_LABEL_CACHE_MAX_MB',
+                                          DEFAULT_MAX_MB))
+            max_bytes = int(max_mb * 1024**2)
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._size_estimate = None
+        self.reset_stats()
+
+    # ------------------------------------------------------------------------
+    # Keys and paths
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def make_key(preamble, tex, fontsize, backend):
+        """
+        Return the hex digest identifying one rendered string.
+
+        *backend* is 'dvi' for the layout used by the vector backends and by
+        all text measurements, or 'png@<dpi>' for dvipng raster output.
+        """
+        parts = [preamble, tex, repr(float(fontsize)), backend]
+        digest = hashlib.sha256('\0'.join(parts).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key, suffix):
+        return self.cache_dir / key[:2] / (key + suffix)
+
+    # ------------------------------------------------------------------------
+    # Lookup and store
+    # ------------------------------------------------------------------------
+
+    def fetch(self, key, suffix, destination):
+        """
+        Copy the entry *key* to *destination*. Return True on a hit.
+        """
+        entry = self._entry_path(key, suffix)
+        try:
+            _atomic_copy(entry, Path(destination))
+            os.utime(entry)  # Mark as recently used
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, suffix, source):
+        """Copy the file *source* into the store under *key*."""
+        entry = self._entry_path(key, suffix)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_copy(Path(source), entry)
+        with self._lock:
+            self.stores += 1
+            if self._size_estimate is None:
+                self._size_estimate = self.size_bytes()
+            else:
+                self._size_estimate += entry.stat().st_size
+            over_budget = self._size_estimate > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    # ------------------------------------------------------------------------
+    # Size management
+    # ------------------------------------------------------------------------
+
+    def _entries(self):
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.is_file() and not entry.name.startswith('.'):
+                    yield entry
+
+    def size_bytes(self):
+        """Return the total size of all entries in bytes."""
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def evict(self, target_bytes=None):
+        """
+        Remove least-recently-used entries until the store is below
+        *target_bytes* (default: 90% of the size budget).
+        """
+        if target_bytes is None:
+            target_bytes = int(0.9 * self.max_bytes)
+        entries = []
+        for entry in self._entries():
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Already evicted by another process
+            total -= size
+            removed += 1
+        with self._lock:
+            self.evictions += removed
+            self._size_estimate = total
+        return removed
+
+    def clear(self):
+        """Delete every entry."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._size_estimate = 0
+
+    # ------------------------------------------------------------------------
+    # Counters
+    # ------------------------------------------------------------------------
+
+    def reset_stats(self):
+        """Set all counters back to zero."""
+        self.hits = 0
+        self.misses = 0
+        self.local_hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.latex_runs = 0
+        self.dvipng_runs = 0
+
+    def stats(self):
+        """Return the counters as a dictionary."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'local_hits': self.local_hits,
+            'latex_runs': self.latex_runs,
+            'dvipng_runs': self.dvipng_runs,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'cache_dir': str(self.cache_dir),
+        }
+
+
+def _atomic_copy(source, destination):
+    """
+    Copy *source* to *destination* through a temporary file in the target
+    folder, so readers never see a partially written file.
+    """
+    fd, tmp = tempfile.mkstemp(dir=destination.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as dst, open(source, 'rb') as src:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, destination)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+# ============================================================================
+# TEXMANAGER HOOKS
+# ============================================================================
+
+def preamble_of(tex, fontsize):
+    """
+    Return the part of Matplotlib's TeX source that precedes the string,
+    i.e. the font setup plus the user's text.latex.preamble.
+    """
+    source = TexManager._get_tex_source(tex, fontsize)
+    return source.split(r'\begin{document}')[0]
+
+
+def _cached_make_dvi(cls, tex, fontsize):
+    dvipath = cls._get_base_path(tex, fontsize).with_suffix('.dvi')
+    cache = _active_cache
+    if cache is None or dvipath.exists():
+        if cache is not None:
+            cache.local_hits += 1
+        return _original_methods['make_dvi'].__func__(cls, tex, fontsize)
+    key = cache.make_key(preamble_of(tex, fontsize), tex, fontsize, 'dvi')
+    if cache.fetch(key, '.dvi', dvipath):
+        return str(dvipath)
+    result = _original_methods['make_dvi'].__func__(cls, tex, fontsize)
+    cache.latex_runs += 1
+    cache.store(key, '.dvi', result)
+    return result
+
+
+def _cached_make_png(cls, tex, fontsize, dpi):
+    pngpath = cls._get_base_path(tex, fontsize, dpi).with_suffix('.png')
+    cache = _active_cache
+    if cache is None or pngpath.exists():
+        if cache is not None:
+            cache.local_hits += 1
+        return _original_methods['make_png'].__func__(cls, tex, fontsize, dpi)
+    key = cache.make_key(preamble_of(tex, fontsize), tex, fontsize,
+                         f'png@{dpi}')
+    if cache.fetch(key, '.png', pngpath):
+        return str(pngpath)
+    result = _original_methods['make_png'].__func__(cls, tex, fontsize, dpi)
+    cache.dvipng_runs += 1
+    cache.store(key, '.png', result)
+    return result
+
+
+def install(cache_dir=None, max_bytes=None):
+    """
+    Put a TexLabelCache in front of Matplotlib's TexManager and return it.
+
+    Calling install() again replaces the active cache.
+    """
+    global _active_cache
+    if not _original_methods:
+        _original_methods['make_dvi'] = TexManager.__dict__['make_dvi']
+        _original_methods['make_png'] = TexManager.__dict__['make_png']
+        TexManager.make_dvi = classmethod(_cached_make_dvi)
+        TexManager.make_png = classmethod(_cached_make_png)
+    _active_cache = TexLabelCache(cache_dir, max_bytes)
+    return _active_cache
+
+
+def uninstall():
+    """Restore the original TexManager methods."""
+    global _active_cache
+    for name, method in _original_methods.items():
+        setattr(TexManager, name, method)
+    _original_methods.clear()
+    _active_cache = None
+
+
+def active_cache():
+    """Return the installed TexLabelCache, or None."""
+    return _active_cache
+
+
+def stats():
+    """Return the counters of the installed cache (empty dict if none)."""
+    return _active_cache.stats() if _active_cache is not None else {}
+
+
+# ============================================================================
+# COMMAND LINE: COUNT THE LaTeX RUNS OF A TEMPLATE
+# ============================================================================
+
+if __name__ == '__main__':
+    import argparse
+    import runpy
+
+    import matplotlib
+    matplotlib.use('Agg')   # Headless: plt.show() returns immediately
+
+    parser = argparse.ArgumentParser(
+        description='Run a template with the shared TeX label cache and '
+                    'report how many LaTeX/dvipng runs it triggered.')
+    parser.add_argument('template', help='template script, e.g. '
+                                         'template_subplots.py')
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--max-mb', type=float, default=None)
+    args = parser.parse_args()
+
+    max_bytes = None if args.max_mb is None else int(args.max_mb * 1024**2)
+    cache = install(args.cache_dir, max_bytes)
+    with tempfile.TemporaryDirectory() as workdir:
+        template = os.path.abspath(args.template)
+        cwd = os.getcwd()
+        os.chdir(workdir)   # Keep the template's output files out of the way
+        try:
+            runpy.run_path(template, run_name='__main__')
+        finally:
+            os.chdir(cwd)
+
+    for name, value in cache.stats().items():
+        print(f'{name:>12s}: {value}')
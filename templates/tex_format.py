@@ -0,0 +1,274 @@
+"""
+================================================================================
+PRECOMPILED LaTeX FORMAT FOR THE SHARED PREAMBLE
+================================================================================
+All templates load the same preamble:
+    \\usepackage{times}  \\usepackage{newtxmath}  \\usepackage{siunitx}
+and LaTeX re-reads these packages for every single label it compiles. Most of
+the time of a LaTeX run is spent there, not on the label itself.
+
+This module dumps the complete preamble Matplotlib generates (font setup +
+text.latex.preamble) into a custom LaTeX format file (.fmt). Every later
+LaTeX run started by Matplotlib loads that format instead of parsing the
+packages again.
+
+    - The format lives next to Matplotlib's font cache (matplotlib cache
+      folder / tex.fmt).
+    - Its name is a hash of the preamble AND of the TeX installation, so it is
+      rebuilt only when either one changes.
+    - If the format cannot be built, or a run with it fails, Matplotlib's
+      normal LaTeX call is used instead. The format is dropped for the rest
+      of the process only if that normal call succeeds: an error in one
+      label fails both ways and does not disable the format.
+
+USAGE:
+    import tex_format
+    tex_format.install()         # before saving any figure
+
+    Setup step and per-label latency report on the template set:
+    python tex_format.py                     # build the format
+    python tex_format.py --benchmark         # latency before/after
+================================================================================
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import matplotlib as mpl
+from matplotlib.texmanager import TexManager
+
+_log = logging.getLogger(__name__)
+
+# Preamble used by every template in this folder
+TEMPLATE_PREAMBLE = ('\\usepackage{times}\n\\usepackage{newtxmath}\n'
+                     '\\usepackage{siunitx}\n')
+
+FORMAT_DIR = Path(mpl.get_cachedir(), 'tex.fmt')
+
+_original_methods = {}   # TexManager methods replaced by install()
+_failed_formats = set()  # Formats that could not be built or used
+_stats = {'runs_with_format': 0, 'fallback_runs': 0, 'formats_built': 0}
+
+
+# ============================================================================
+# FORMAT NAMING AND BUILDING
+# ============================================================================
+
+@functools.lru_cache(maxsize=None)
+def tex_fingerprint():
+    """
+    Return a string identifying the TeX installation (latex version and the
+    stock latex.fmt it starts from), or None if LaTeX is not installed.
+    """
+    try:
+        version = subprocess.run(['latex', '--version'], capture_output=True,
+                                 text=True, check=True).stdout
+        base = subprocess.run(['kpsewhich', '-engine=pdftex', 'latex.fmt'],
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    parts = [version]
+    if base and os.path.exists(base):
+        st = os.stat(base)
+        parts += [base, str(st.st_size), str(int(st.st_mtime))]
+    return '\n'.join(parts)
+
+
+def format_name(preamble):
+    """Return the format name for *preamble* on this TeX installation."""
+    fingerprint = tex_fingerprint() or ''
+    digest = hashlib.sha256((preamble + '\0' + fingerprint).encode('utf-8'))
+    return 'mplfmt-' + digest.hexdigest()[:16]
+
+
+def ensure_format(preamble):
+    """
+    Return the name of the format containing *preamble*, building it first
+    if needed. Return None if no format can be used.
+    """
+    if tex_fingerprint() is None:
+        return None
+    name = format_name(preamble)
+    if name in _failed_formats:
+        return None
+    if (FORMAT_DIR / (name + '.fmt')).exists():
+        return name
+
+    FORMAT_DIR.mkdir(parents=True, exist_ok=True)
+    # Build in a private folder and move the result in place atomically, so
+    # concurrent processes never load a half-written format.
+    with TemporaryDirectory(dir=FORMAT_DIR) as tmpdir:
+        Path(tmpdir, name + '.tex').write_text(preamble + '\n\\dump\n',
+                                              encoding='utf-8')
+        try:
+            subprocess.run(
+                ['latex', '-ini', '-interaction=nonstopmode',
+                 '-halt-on-error', '-no-shell-escape', f'-jobname={name}',
+                 '&latex', name + '.tex'],
+                cwd=tmpdir, capture_output=True, check=True)
+            os.replace(Path(tmpdir, name + '.fmt'),
+                       FORMAT_DIR / (name + '.fmt'))
+        except (OSError, subprocess.CalledProcessError) as exc:
+            _log.warning('Could not build LaTeX format %s (%s); using the '
+                         'normal preamble instead.', name, exc)
+            _failed_formats.add(name)
+            return None
+    _stats['formats_built'] += 1
+    return name
+
+
+def current_preamble():
+    """Return the preamble Matplotlib generates for the current rcParams."""
+    source = TexManager._get_tex_source('', mpl.rcParams['font.size'])
+    return source.split(r'\begin{document}')[0]
+
+
+# ============================================================================
+# HOOK: RUN LaTeX WITH THE FORMAT
+# ============================================================================
+
+def _run_with_format(cls, command, tex, *, cwd=None):
+    original = _original_methods['_run_checked_subprocess'].__func__
+    if (command[0] != 'latex' or not command[-1].endswith('.tex')
+            or any(arg.startswith(('-ini', '-fmt')) for arg in command)):
+        return original(cls, command, tex, cwd=cwd)
+
+    texfile = Path(cwd if cwd is not None else cls._cache_dir, command[-1])
+    source = texfile.read_text(encoding='utf-8')
+    preamble, sep, body = source.partition(r'\begin{document}')
+    name = ensure_format(preamble) if sep else None
+    if name is None:
+        return original(cls, command, tex, cwd=cwd)
+
+    # The format already contains the preamble: only the body is compiled
+    texfile.write_text(sep + body, encoding='utf-8')
+    try:
+        report = original(cls, [command[0], f'-fmt={name}', *command[1:]],
+                          tex, cwd=cwd)
+    except RuntimeError:
+        _log.warning('LaTeX run with format %s failed; retrying without it.',
+                     name)
+        _stats['fallback_runs'] += 1
+        texfile.write_text(source, encoding='utf-8')
+        # A bad label raises here again and leaves the format in use
+        report = original(cls, command, tex, cwd=cwd)
+        # Only the format was at fault: stop using it
+        _failed_formats.add(name)
+        return report
+    _stats['runs_with_format'] += 1
+    return report
+
+
+def install():
+    """Make Matplotlib's LaTeX runs use the precompiled preamble format."""
+    if _original_methods:
+        return
+    # Let TeX find our formats; the trailing separator keeps the default path
+    search = os.environ.get('TEXFORMATS', '')
+    if str(FORMAT_DIR) not in search.split(os.pathsep):
+        os.environ['TEXFORMATS'] = str(FORMAT_DIR) + os.pathsep + search
+    _original_methods['_run_checked_subprocess'] = \
+        TexManager.__dict__['_run_checked_subprocess']
+    TexManager._run_checked_subprocess = classmethod(_run_with_format)
+
+
+def uninstall():
+    """Restore Matplotlib's normal LaTeX call."""
+    for name, method in _original_methods.items():
+        setattr(TexManager, name, method)
+    _original_methods.clear()
+
+
+def stats():
+    """Return how many LaTeX runs used the format."""
+    return dict(_stats)
+
+
+# ============================================================================
+# LATENCY REPORT ON THE TEMPLATE SET
+# ============================================================================
+
+def template_labels(template_paths):
+    """
+    Run each template without drawing and return the (tex, fontsize) pairs
+    of all figures it creates.
+    """
+    import runpy
+    import matplotlib.pyplot as plt
+    from tex_batch import collect_tex_strings
+
+    labels = set()
+    patched = ('savefig', 'show', 'tight_layout')
+    saved = [getattr(plt, name) for name in patched]
+    for name in patched:
+        # No drawing, and no layout pass (it would measure texts with LaTeX)
+        setattr(plt, name, lambda *args, **kwargs: None)
+    try:
+        for path in template_paths:
+            runpy.run_path(str(path), run_name='__main__')
+            for num in plt.get_fignums():
+                labels |= collect_tex_strings(plt.figure(num))
+            plt.close('all')
+    finally:
+        for name, function in zip(patched, saved):
+            setattr(plt, name, function)
+    return sorted(labels)
+
+
+def measure_latency(labels):
+    """Return the mean seconds per label for compiling *labels* from cold."""
+    import time
+
+    cache_dir = TexManager._cache_dir
+    with TemporaryDirectory() as tmpdir:
+        TexManager._cache_dir = Path(tmpdir)   # Cold Matplotlib tex cache
+        try:
+            start = time.perf_counter()
+            for tex, fontsize in labels:
+                TexManager.make_dvi(tex, fontsize)
+            elapsed = time.perf_counter() - start
+        finally:
+            TexManager._cache_dir = cache_dir
+    return elapsed / max(len(labels), 1)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    mpl.use('Agg')
+    parser = argparse.ArgumentParser(
+        description='Build the LaTeX format for the template preamble.')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='report the per-label latency before/after')
+    args = parser.parse_args()
+
+    mpl.rcParams['text.usetex'] = True
+    mpl.rcParams['text.latex.preamble'] = TEMPLATE_PREAMBLE
+    mpl.rcParams['font.serif'] = 'Times New Roman'
+    mpl.rcParams['font.family'] = 'serif'
+
+    if tex_fingerprint() is None or shutil.which('kpsewhich') is None:
+        raise SystemExit('LaTeX is not installed.')
+    name = ensure_format(current_preamble())
+    if name is None:
+        raise SystemExit('The format could not be built.')
+    print(f'Format: {FORMAT_DIR / (name + ".fmt")}')
+
+    if args.benchmark:
+        here = Path(__file__).resolve().parent
+        templates = [here / 'simple_xy_plots.py',
+                     *sorted(here.glob('template_*.py'))]
+        labels = template_labels(templates)
+        before = measure_latency(labels)
+        install()
+        after = measure_latency(labels)
+        print(f'{len(labels)} labels from {len(templates)} templates')
+        print(f'  per label without format: {1000 * before:7.1f} ms')
+        print(f'  per label with format:    {1000 * after:7.1f} ms')
+        print(f'  speed-up:                 {before / after:7.2f}x')
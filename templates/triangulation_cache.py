@@ -0,0 +1,210 @@
+"""
+================================================================================
+REUSABLE DELAUNAY TRIANGULATIONS FOR SCATTERED SAMPLES
+================================================================================
+ax.tricontourf(x, y, z) computes a Delaunay triangulation of the points on
+every call. Measurements from a fixed sensor layout (many time steps, many
+variables) triangulate the same points again and again: with 10^5 - 10^6
+points, most of the time goes into the triangulation, not the contours.
+
+This module triangulates each point set once:
+    - the point set is identified by a hash of its coordinates
+    - the triangles and mask are kept in memory (LRU); every call returns
+      a new Triangulation built from them (no Delaunay), so set_mask() or
+      refining one never changes what the next caller gets
+    - the triangles are also saved to disk (one small .npz per point set),
+      so the next run of the script skips Delaunay entirely
+    - optionally, the flat triangles along the hull of the points (slivers
+      that give spurious contours) are masked once and cached with it
+
+USAGE:
+    from triangulation_cache import cached_triangulation
+    triangulation = cached_triangulation(x, y, min_circle_ratio=0.01)
+    for z in fields:   # Same points, different values
+        ax.tricontourf(triangulation, z, levels=levels, cmap='coolwarm')
+
+    Triangulation time, cold and cached:
+    python triangulation_cache.py
+
+ENVIRONMENT:
+    TRIANGULATION_CACHE_DIR   cache folder (default: ~/.cache/triangulation_cache)
+================================================================================
+"""
+
+import collections
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME',
+                                        Path.home() / '.cache'),
+                         'triangulation_cache')
+DEFAULT_MAX_ENTRIES = 16
+
+
+def point_key(x, y, min_circle_ratio=None):
+    """Hex digest identifying the point set (and the hull masking)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{min_circle_ratio}'.encode())
+    for array in (x, y):
+        array = np.ascontiguousarray(array, dtype=float)
+        digest.update(f'{array.shape}'.encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def _fresh(x, y, triangles, mask):
+    """A new Triangulation from cached triangles and mask (no Delaunay)."""
+    from matplotlib.tri import Triangulation
+
+    triangulation = Triangulation(x, y, triangles)
+    if mask is not None:
+        triangulation.set_mask(mask)
+    return triangulation
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class TriangulationCache:
+    """
+    LRU cache of matplotlib Triangulations, backed by a folder of .npz files.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        Folder for the triangle files (default: $TRIANGULATION_CACHE_DIR or
+        ~/.cache/triangulation_cache). False keeps the cache in memory only.
+    max_entries : int
+        Triangulations kept in memory.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=DEFAULT_MAX_ENTRIES):
+        if cache_dir is None:
+            cache_dir = os.environ.get('TRIANGULATION_CACHE_DIR',
+                                       DEFAULT_CACHE_DIR)
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.loads = self.misses = 0
+
+    def _path(self, key):
+        return self.cache_dir / f'{key}.npz'
+
+    def get(self, x, y, min_circle_ratio=None):
+        """
+        Return a new Triangulation of (x, y), its triangles from the cache
+        if possible.
+        """
+        from matplotlib.tri import Triangulation
+
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        key = point_key(x, y, min_circle_ratio)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return _fresh(x, y, *self._entries[key])
+
+        triangulation = None
+        if self.cache_dir is not None and self._path(key).exists():
+            try:
+                with np.load(self._path(key)) as data:
+                    triangulation = Triangulation(x, y, data['triangles'])
+                    if data['mask'].any():
+                        triangulation.set_mask(data['mask'])
+                self.loads += 1
+            except (OSError, KeyError, ValueError):
+                triangulation = None   # Unreadable file: triangulate again
+        if triangulation is None:
+            triangulation = Triangulation(x, y)
+            if min_circle_ratio is not None:
+                from matplotlib.tri import TriAnalyzer
+                triangulation.set_mask(TriAnalyzer(triangulation)
+                                       .get_flat_tri_mask(min_circle_ratio))
+            self.misses += 1
+            if self.cache_dir is not None:
+                self._save(key, triangulation)
+
+        with self._lock:
+            self._entries[key] = (triangulation.triangles,
+                                  triangulation.mask)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return triangulation
+
+    def _save(self, key, triangulation):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        mask = triangulation.mask
+        if mask is None:
+            mask = np.zeros(len(triangulation.triangles), dtype=bool)
+        path = self._path(key)
+        tmp = path.with_name(f'{path.stem}.{os.getpid()}.tmp.npz')
+        np.savez(tmp, triangles=triangulation.triangles.astype(np.int32),
+                 mask=mask)
+        os.replace(tmp, path)   # Atomic: readers never see half a file
+
+    def clear(self):
+        """Forget the triangulations in memory (files on disk are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+
+_default_cache = None
+
+
+def cached_triangulation(x, y, min_circle_ratio=None, cache=None):
+    """
+    Triangulation of the points (x, y), computed once per point set. Each
+    call returns a new Triangulation object, free to mask or refine. With *min_circle_ratio* (e.g. 0.01), the flat triangles on the border
+    are masked (see matplotlib.tri.TriAnalyzer.get_flat_tri_mask).
+    """
+    global _default_cache
+    if cache is None:
+        if _default_cache is None:
+            _default_cache = TriangulationCache()
+        cache = _default_cache
+    return cache.get(x, y, min_circle_ratio)
+
+
+# ============================================================================
+# DEMO: TIME PER FIELD
+# ============================================================================
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    n, n_fields = 200_000, 5
+    x, y = rng.uniform(-3, 3, (2, n))
+    fields = [np.exp(-((x - t / 5)**2 + y**2)) for t in range(n_fields)]
+    levels = np.linspace(0, 1, 11)
+
+    def run(triangulate):
+        start = time.perf_counter()
+        fig, ax = plt.subplots(figsize=(7.0, 6.0), dpi=50)
+        for z in fields:
+            ax.tricontourf(triangulate(), z, levels=levels)
+        plt.close(fig)
+        return time.perf_counter() - start
+
+    from matplotlib.tri import Triangulation
+    print(f'{n} points, tricontourf of {n_fields} fields:')
+    print(f'  new triangulation each: {run(lambda: Triangulation(x, y)):6.2f} s')
+    folder = tempfile.mkdtemp()
+    cache = TriangulationCache(folder)
+    print(f'  cached, cold:           '
+          f'{run(lambda: cached_triangulation(x, y, cache=cache)):6.2f} s')
+    cache = TriangulationCache(folder)   # New session: from disk
+    print(f'  cached, from disk:      '
+          f'{run(lambda: cached_triangulation(x, y, cache=cache)):6.2f} s')